@@ -1,11 +1,23 @@
 # backend_api.py
 # uvicorn backend_api:app --host 0.0.0.0 --port 9000     으로 실행.
-from fastapi import FastAPI
+import asyncio
+import json
+import os
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Deque, Dict, Iterable, Optional, Set, Tuple
+
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Dict
 
 app = FastAPI()
 
+# SSE 연결 유지용 주석을 보내는 간격(초)
+SSE_KEEPALIVE_INTERVAL = 15
+# 재연결한 구독자에게 다시 보내 줄 수 있는 최근 상태 변경 이벤트 수 (Last-Event-ID)
+ORDER_EVENT_REPLAY = int(os.getenv("ORDER_EVENT_REPLAY", "1000"))
+
 # 가짜 주문 DB
 FAKE_ORDERS: Dict[str, Dict] = {
     "ORDER123": {
@@ -31,6 +43,139 @@ class OrderStatusResponse(BaseModel):
     tracking_number: str
     last_update: str
 
+
+class OrderStatusUpdate(BaseModel):
+    status: str
+    courier: Optional[str] = None  # 생략하면 기존 값 유지
+    tracking_number: Optional[str] = None
+    last_update: Optional[str] = None  # 생략하면 현재 시각
+
+
+class OrderSubscription:
+    """구독자 한 명의 수신함. 밀린 이벤트가 넘치면 비우고 reset을 보내 다시 조회하게 합니다."""
+
+    def __init__(self, order_ids: Optional[Set[str]], maxsize: int = 100):
+        self.order_ids = order_ids  # None이면 모든 주문
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    def put(self, event: Tuple[int, str, dict]):
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            event = (event[0], "reset", {})
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Tuple[int, str, dict]]:
+        """다음 이벤트 (id, 종류, 주문 상태). timeout 안에 없으면 None"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class OrderEventHub:
+    """주문 상태 변경을 주문별 구독자에게 전달합니다. 이벤트 id는 1부터 증가합니다."""
+
+    def __init__(self, replay_size: int = ORDER_EVENT_REPLAY):
+        self.last_id = 0
+        self._recent: Deque[Tuple[int, dict]] = deque(maxlen=replay_size)
+        self._by_order: Dict[str, Set[OrderSubscription]] = defaultdict(set)
+        self._all: Set[OrderSubscription] = set()
+
+    def subscribe(self, order_ids: Optional[Iterable[str]], last_event_id: Optional[int] = None) -> OrderSubscription:
+        """주문 상태 변경을 구독합니다. order_ids가 None이면 모든 주문.
+
+        last_event_id가 있으면 그 뒤의 변경을 다시 보내고, 이미 버려진 구간이면 reset을 보냅니다.
+        없으면 구독한 주문의 현재 상태를 먼저 보냅니다.
+        """
+        subscription = OrderSubscription(set(order_ids) if order_ids is not None else None)
+        if subscription.order_ids is None:
+            self._all.add(subscription)
+        else:
+            for order_id in subscription.order_ids:
+                self._by_order[order_id].add(subscription)
+
+        if last_event_id is not None:
+            oldest = self._recent[0][0] if self._recent else self.last_id + 1
+            if last_event_id < oldest - 1 or last_event_id > self.last_id:
+                subscription.put((self.last_id, "reset", {}))
+            else:
+                for event_id, order in self._recent:
+                    if event_id > last_event_id and self._wants(subscription, order["order_id"]):
+                        subscription.put((event_id, "status", order))
+        elif subscription.order_ids is not None:
+            for order_id in sorted(subscription.order_ids):
+                if order_id in FAKE_ORDERS:
+                    subscription.put((self.last_id, "status", dict(FAKE_ORDERS[order_id])))
+        return subscription
+
+    def unsubscribe(self, subscription: OrderSubscription):
+        if subscription.order_ids is None:
+            self._all.discard(subscription)
+            return
+        for order_id in subscription.order_ids:
+            subscribers = self._by_order.get(order_id)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._by_order[order_id]
+
+    @staticmethod
+    def _wants(subscription: OrderSubscription, order_id: str) -> bool:
+        return subscription.order_ids is None or order_id in subscription.order_ids
+
+    def publish(self, order: dict) -> int:
+        """상태 변경 하나를 해당 주문 구독자와 전체 구독자에게 보냅니다."""
+        self.last_id += 1
+        order = dict(order)
+        self._recent.append((self.last_id, order))
+        for subscription in list(self._by_order.get(order["order_id"], ())) + list(self._all):
+            subscription.put((self.last_id, "status", order))
+        return self.last_id
+
+    def subscriber_count(self) -> int:
+        return len(self._all) + sum(len(s) for s in self._by_order.values())
+
+
+order_events = OrderEventHub()
+
+
+@app.get("/api/orders/stream", summary="주문 상태 변경 스트림 (SSE)")
+async def stream_order_status(
+    request: Request,
+    order_ids: Optional[str] = Query(None, description="쉼표로 구분한 주문번호. 생략하면 모든 주문"),
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID"),
+):
+    """주문 상태가 바뀔 때마다 `event: status` 이벤트를 보냅니다.
+
+    재연결 시 `Last-Event-ID` 헤더를 보내면 놓친 변경을 이어서 받고, 놓친 구간이 너무 길면
+    `event: reset`을 받습니다. (이때는 주문 상태를 다시 조회해야 함)
+    """
+    ids = None
+    if order_ids is not None:
+        ids = [o.strip() for o in order_ids.split(",") if o.strip()]
+    subscription = order_events.subscribe(ids, last_event_id)
+
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                event = await subscription.get(timeout=SSE_KEEPALIVE_INTERVAL)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                event_id, kind, order = event
+                yield f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(order, ensure_ascii=False)}\n\n"
+        finally:
+            order_events.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
 @app.get("/api/order/{order_id}", response_model=OrderStatusResponse)
 async def get_order_status(order_id: str):
     if order_id not in FAKE_ORDERS:
@@ -43,3 +188,20 @@ async def get_order_status(order_id: str):
             last_update="-",
         )
     return OrderStatusResponse(**FAKE_ORDERS[order_id])
+
+
+@app.post("/api/order/{order_id}/status", response_model=OrderStatusResponse)
+async def update_order_status(order_id: str, update: OrderStatusUpdate):
+    """배송 상태를 갱신하고, 값이 바뀌었으면 구독자에게 알립니다. (택배사 연동 등에서 호출)"""
+    if order_id not in FAKE_ORDERS:
+        raise HTTPException(status_code=404, detail="주문을 찾을 수 없습니다")
+    order = FAKE_ORDERS[order_id]
+    changed = {
+        "status": update.status,
+        "courier": update.courier if update.courier is not None else order["courier"],
+        "tracking_number": update.tracking_number if update.tracking_number is not None else order["tracking_number"],
+    }
+    if any(order[k] != v for k, v in changed.items()):
+        order.update(changed, last_update=update.last_update or datetime.now().strftime("%Y-%m-%d %H:%M"))
+        order_events.publish(order)
+    return OrderStatusResponse(**order)
@@ -0,0 +1,160 @@
+"""
+거래 내역 백테스트
+trade_history의 매수/매도 시점을 그대로 두고 주문 수량 규칙만 바꿔, 일봉 기준으로 포트폴리오를 다시 계산합니다.
+
+주문 이벤트는 순서에 따라 잔고·평균 단가가 달라지므로 하나씩 처리하지만(거래 건수만큼),
+일별 보유 수량·현금·평가액은 (종목 × 일자) 배열의 누적합으로 한 번에 계산합니다.
+"""
+import math
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from indicators import TRADING_DAYS_PER_YEAR
+from storage import weighted_avg_price
+
+# 주문 수량 규칙
+#   as_traded: 실제 거래 수량 그대로
+#   fixed_qty: 매 거래 `size`주
+#   fixed_notional: 매 거래 `size`원어치 (체결가로 나눈 몫)
+SIZING_RULES = ("as_traded", "fixed_qty", "fixed_notional")
+
+# (거래일시 문자열, 종목 코드, "buy"/"sell", 수량)
+TradeSignal = Tuple[str, str, str, int]
+
+
+def build_price_matrix(prices: Dict[str, pd.Series]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """종목별 종가 시리즈를 (종목 목록, 거래일 배열, 종가 행렬[종목 × 일자])로 변환합니다.
+
+    거래일은 모든 종목 거래일의 합집합이며, 상장 후 비는 날은 직전 종가로 채우고 상장 전은 NaN입니다.
+    """
+    tickers = list(prices)
+    frame = pd.DataFrame({t: prices[t] for t in tickers}).sort_index().ffill()
+    dates = frame.index.to_numpy(dtype="datetime64[D]")
+    return tickers, dates, frame.to_numpy(dtype=float).T
+
+
+def simulate(
+    tickers: Sequence[str],
+    dates: np.ndarray,
+    closes: np.ndarray,
+    signals: Sequence[TradeSignal],
+    initial_cash: int,
+    sizing: str = "as_traded",
+    size: float = 0,
+) -> dict:
+    """거래 신호를 종가 행렬 위에서 재생하고 요약 통계를 반환합니다.
+
+    신호는 거래한 날의 종가(휴장일 거래는 다음 거래일 종가)로 체결되며,
+    현금이 부족하면 살 수 있는 만큼만, 보유 수량을 넘는 매도는 보유분만 체결합니다.
+    """
+    if sizing not in SIZING_RULES:
+        raise ValueError(f"sizing은 {', '.join(SIZING_RULES)} 중 하나여야 합니다.")
+
+    n_tickers, n_days = closes.shape
+    index = {t: i for i, t in enumerate(tickers)}
+
+    # 신호별 종목 행·거래일 열·체결가를 한 번에 조회
+    rows = np.array([index.get(s[1], -1) for s in signals], dtype=np.int64)
+    days = np.searchsorted(dates, np.array([s[0][:10] for s in signals], dtype="datetime64[D]"))
+    usable = (rows >= 0) & (days < n_days)
+    prices = np.full(len(signals), np.nan)
+    prices[usable] = closes[rows[usable], days[usable]]
+
+    held = [0] * n_tickers
+    avg = [0.0] * n_tickers
+    cash = float(initial_cash)
+    realized = 0.0
+    fills = []  # (행, 일자, 수량 변화, 현금 변화)
+    skipped = 0
+
+    for (_, _, side, qty), row, day, price in zip(signals, rows.tolist(), days.tolist(), prices.tolist()):
+        if price != price:  # 종목 데이터 없음, 마지막 거래일 이후, 상장 전
+            skipped += 1
+            continue
+        if sizing == "as_traded":
+            desired = int(qty)
+        elif sizing == "fixed_qty":
+            desired = int(size)
+        else:
+            desired = int(size // price)
+
+        if side == "buy":
+            q = min(desired, int(cash // price))
+            if q <= 0:
+                skipped += 1
+                continue
+            # buy_stock과 같은 가중 평균 단가 (DB처럼 원 단위로 반올림)
+            avg[row] = round(weighted_avg_price(held[row], avg[row], q, price))
+            held[row] += q
+            cash -= q * price
+            fills.append((row, day, q, -q * price))
+        else:
+            q = min(desired, held[row])
+            if q <= 0:
+                skipped += 1
+                continue
+            realized += (price - avg[row]) * q
+            held[row] -= q
+            if held[row] == 0:
+                avg[row] = 0.0
+            cash += q * price
+            fills.append((row, day, -q, q * price))
+
+    # 체결 수량 변화와 현금 변화를 (종목 × 일자), (일자) 배열에 기록
+    qty_delta = np.zeros((n_tickers, n_days), dtype=np.int64)
+    cash_delta = np.zeros(n_days)
+    executed = len(fills)
+    first_day = n_days
+    if fills:
+        fill_rows, fill_days, fill_qty, fill_cash = (np.array(col) for col in zip(*fills))
+        np.add.at(qty_delta, (fill_rows, fill_days), fill_qty)
+        np.add.at(cash_delta, fill_days, fill_cash)
+        first_day = int(fill_days.min())
+
+    # 일별 보유 수량·현금·평가액 (벡터화)
+    holdings = np.cumsum(qty_delta, axis=1, dtype=float)
+    cash_series = initial_cash + np.cumsum(cash_delta)
+    equity = cash_series + np.einsum("td,td->d", holdings, np.nan_to_num(closes))
+
+    stats = {
+        "initial_cash": int(initial_cash),
+        "final_equity": int(round(equity[-1])) if n_days else int(initial_cash),
+        "final_cash": int(round(cash)),
+        "realized_pnl": int(round(realized)),
+        "trades_executed": executed,
+        "trades_skipped": skipped,
+        "tickers": n_tickers,
+        "days": n_days,
+    }
+    stats["total_return_pct"] = round((stats["final_equity"] / initial_cash - 1) * 100, 2) if initial_cash else None
+
+    if first_day < n_days - 1:
+        window = equity[first_day:]
+        daily = window[1:] / window[:-1] - 1
+        years = len(daily) / TRADING_DAYS_PER_YEAR
+        std = daily.std(ddof=1) if len(daily) > 1 else 0.0
+        stats.update({
+            "start_date": str(dates[first_day]),
+            "end_date": str(dates[-1]),
+            "cagr_pct": round(((window[-1] / window[0]) ** (1 / years) - 1) * 100, 2) if window[0] > 0 else None,
+            "volatility_pct": round(std * math.sqrt(TRADING_DAYS_PER_YEAR) * 100, 2),
+            "sharpe": round(daily.mean() / std * math.sqrt(TRADING_DAYS_PER_YEAR), 2) if std > 0 else None,
+            "max_drawdown_pct": round(float((window / np.maximum.accumulate(window) - 1).min()) * 100, 2),
+        })
+
+    stats["holdings"] = {t: int(q) for t, q in zip(tickers, held) if q}
+    return stats
+
+
+def run_backtest(
+    signals: Sequence[TradeSignal],
+    prices: Dict[str, pd.Series],
+    initial_cash: int,
+    sizing: str = "as_traded",
+    size: float = 0,
+) -> dict:
+    """거래 신호(시간순)와 종목별 종가로 백테스트를 실행합니다."""
+    tickers, dates, closes = build_price_matrix(prices)
+    return simulate(tickers, dates, closes, signals, initial_cash, sizing, size)
@@ -0,0 +1,406 @@
+"""
+성능 측정 스크립트
+임시 디렉터리의 SQLite 파일을 사용하므로 stock_trading.db는 건드리지 않습니다.
+
+사용 예:
+    python benchmark.py orders --orders 2000 --accounts 4
+    python benchmark.py backends --orders 2000 --accounts 8   # MYSQL_* 환경변수로 MySQL 지정
+    python benchmark.py backtest --tickers 100 --days 2520 --trades 5000
+    python benchmark.py orderbook --orders 200000 --tickers 50
+    python benchmark.py serialize --rows 20000
+    python benchmark.py gateway --sessions 50,100,200,400 --llm-latency-ms 300 --think-ms 5000
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import socket
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from backtest import simulate
+from order_book import OrderBookEngine, OrderJournal
+from storage import MySQLTradeStore, SQLiteTradeStore, TradeStore
+
+_TMP_DIR = tempfile.mkdtemp(prefix="stock_bench_")
+
+
+def _sqlite_store(name: str, **kwargs) -> SQLiteTradeStore:
+    return SQLiteTradeStore(Path(_TMP_DIR) / f"{name}.db", **kwargs)
+
+
+def _mysql_store() -> MySQLTradeStore:
+    config = {
+        "host": os.getenv("MYSQL_HOST", "localhost"),
+        "user": os.getenv("MYSQL_USER", "root"),
+        "password": os.getenv("MYSQL_PASSWORD", ""),
+        "port": int(os.getenv("MYSQL_PORT", "3306")),
+        "db": os.getenv("MYSQL_DB", "stock_trading"),
+        "charset": "utf8mb4",
+    }
+    return MySQLTradeStore(config, pool_size=int(os.getenv("MYSQL_POOL_SIZE", "10")))
+
+
+async def _run_orders(store: TradeStore, orders: int, accounts: int, concurrency: int) -> float:
+    account_ids = [
+        await store.create_account("bench", "bench", cash_balance=orders * 1000)
+        for _ in range(accounts)
+    ]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            await store.buy(account_ids[i % len(account_ids)], "005930", "삼성전자", 1, 1000)
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(one(i) for i in range(orders)))
+    finally:
+        await store.close()
+    return time.perf_counter() - start
+
+
+def _report(label: str, orders: int, elapsed: float):
+    print(f"{label:>14}: {orders}건 {elapsed:.3f}초 → {orders / elapsed:,.0f} orders/s")
+
+
+def bench_orders(args):
+    """sync(주문마다 커밋)와 batch(그룹 커밋) 모드의 주문 처리량을 비교합니다."""
+    for mode in ("sync", "batch"):
+        store = _sqlite_store(f"orders_{mode}", shard_count=args.shards, ingest_mode=mode)
+        elapsed = asyncio.run(_run_orders(store, args.orders, args.accounts, args.concurrency))
+        _report(mode, args.orders, elapsed)
+
+
+def bench_backends(args):
+    """SQLite와 MySQL 저장소의 주문 처리량을 비교합니다."""
+    for mode in ("sync", "batch"):
+        store = _sqlite_store(f"backend_{mode}", shard_count=args.shards, ingest_mode=mode)
+        elapsed = asyncio.run(_run_orders(store, args.orders, args.accounts, args.concurrency))
+        _report(f"sqlite/{mode}", args.orders, elapsed)
+
+    try:
+        elapsed = asyncio.run(_run_orders(_mysql_store(), args.orders, args.accounts, args.concurrency))
+    except Exception as e:
+        print(f"{'mysql':>14}: 측정 불가 ({e})")
+    else:
+        _report("mysql", args.orders, elapsed)
+
+
+def bench_backtest(args):
+    """합성 일봉과 거래 신호로 백테스트 엔진의 처리 속도(종목·일/ms)를 측정합니다."""
+    rng = np.random.default_rng(0)
+    dates = np.arange(np.datetime64("2015-01-01"), np.datetime64("2015-01-01") + args.days)
+    closes = 10_000 * np.exp(np.cumsum(rng.normal(0, 0.02, (args.tickers, args.days)), axis=1))
+    tickers = [f"{i:06d}" for i in range(args.tickers)]
+    days = np.sort(rng.integers(0, args.days, args.trades))
+    signals = [
+        (str(dates[d]), tickers[rng.integers(args.tickers)], "buy" if rng.random() < 0.6 else "sell", int(rng.integers(1, 20)))
+        for d in days
+    ]
+
+    for sizing, size in (("as_traded", 0), ("fixed_qty", 5), ("fixed_notional", 500_000)):
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            stats = simulate(tickers, dates, closes, signals, 1_000_000_000, sizing, size)
+        elapsed = (time.perf_counter() - start) / args.repeat
+        ticker_days = args.tickers * args.days
+        print(
+            f"{sizing:>14}: {elapsed * 1000:.2f}ms, {ticker_days / (elapsed * 1000):,.0f} ticker-days/ms, "
+            f"체결 {stats['trades_executed']}건, 수익률 {stats['total_return_pct']}%"
+        )
+
+
+def bench_orderbook(args):
+    """지정가/스톱 주문 접수와 매칭 속도를 측정합니다. (DB 반영 제외, --journal 시 저널 기록 포함)"""
+    rng = np.random.default_rng(0)
+    journal = OrderJournal(Path(_TMP_DIR) / "order_book", compact_every=10 ** 9) if args.journal else None
+    engine = OrderBookEngine(store=None, journal=journal)
+    tickers = [f"{i:06d}" for i in range(args.tickers)]
+    base = 10_000
+
+    sides = rng.choice(["buy", "sell"], args.orders)
+    types = rng.choice(["limit", "stop"], args.orders, p=[0.8, 0.2])
+    offsets = rng.integers(-2_000, 2_000, args.orders)
+    owners = rng.integers(1, 1_000, args.orders)
+    ticker_idx = rng.integers(0, args.tickers, args.orders)
+
+    start = time.perf_counter()
+    for i in range(args.orders):
+        engine.place(int(owners[i]), tickers[ticker_idx[i]], "bench", sides[i], types[i], 1, base + int(offsets[i]))
+    elapsed = time.perf_counter() - start
+    print(f"접수: {args.orders:,}건 {elapsed:.3f}초 → {args.orders / elapsed:,.0f} orders/s (미체결 {len(engine.orders):,}건)")
+
+    # 모든 종목의 시세를 기준가 주변에서 랜덤 워크시키며 매칭
+    prices = np.full(args.tickers, base)
+    matched = 0
+    start = time.perf_counter()
+    for _ in range(args.ticks):
+        prices = prices + rng.integers(-100, 101, args.tickers)
+        matched += len(engine.match({t: int(p) for t, p in zip(tickers, prices)}))
+    elapsed = time.perf_counter() - start
+    print(
+        f"매칭: 시세 {args.ticks * args.tickers:,}건, 체결 {matched:,}건 {elapsed:.3f}초 → "
+        f"{matched / elapsed:,.0f} fills/s, 시세당 {elapsed / (args.ticks * args.tickers) * 1e6:.1f}µs "
+        f"(남은 미체결 {len(engine.orders):,}건)"
+    )
+
+
+def bench_serialize(args):
+    """/trades 응답의 행당 비용을 직렬화 방식별로 측정합니다. (HTTP 응답, MCP 도구 호출)"""
+    # stock_api는 import 시점에 저장소를 만들므로 임시 DB를 먼저 지정합니다.
+    os.environ["STOCK_DB_FILE"] = str(Path(_TMP_DIR) / "serialize.db")
+    os.environ["ORDER_BOOK_DIR"] = str(Path(_TMP_DIR) / "order_book")
+    os.environ["DB_SHARD_COUNT"] = "1"
+    import httpx
+    from fastmcp import Client, FastMCP
+
+    import stock_api
+    from my_server import skip_output_validation
+
+    async def run():
+        account_id = await stock_api.store.create_account("bench", "bench", 0)
+        conn = sqlite3.connect(stock_api.store.shard_file(0))
+        conn.executemany(
+            "INSERT INTO trade_history (account_id, trade_type, ticker, name, qty, price, avg_price) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(account_id, "buy" if i % 3 else "sell", f"{i % 50:06d}", "삼성전자", i % 7 + 1, 70_000 + i, 69_000) for i in range(args.rows)],
+        )
+        conn.commit()
+        conn.close()
+        headers = {"X-Account-Id": str(account_id), "X-Account-Password": "bench"}
+
+        async def timed(call) -> float:
+            await call()
+            best = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                await call()
+                best = min(best, time.perf_counter() - start)
+            return best / args.rows * 1e6
+
+        fetch = await timed(lambda: stock_api.store.get_trades(account_id, None, None))
+        print(f"{'DB 조회':>22}: {fetch:.2f}µs/row")
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=stock_api.app), base_url="http://bench", headers=headers) as client:
+            for fast in (False, True):
+                stock_api.API_FAST_JSON = fast
+                cost = await timed(lambda: client.get("/trades"))
+                label = "HTTP fast_json" if fast else "HTTP response_model"
+                print(f"{label:>22}: {cost:.2f}µs/row (직렬화 {cost - fetch:.2f}µs/row)")
+
+        stock_api.API_FAST_JSON = True
+        # 계좌 헤더는 MCP 도구의 필수 인자이므로 httpx 기본 헤더가 아니라 도구 인자로 넘겨야 합니다.
+        tool_args = {"X-Account-Id": account_id, "X-Account-Password": "bench"}
+
+        async def call_history(client):
+            result = await client.call_tool_mcp("get_trade_history", tool_args)
+            if result.isError:
+                raise RuntimeError(f"get_trade_history 호출 실패: {result.content[0].text if result.content else result}")
+
+        for skip in (False, True):
+            mcp = FastMCP.from_fastapi(
+                stock_api.app, httpx_client_kwargs={"headers": headers},
+                mcp_component_fn=skip_output_validation if skip else None,
+            )
+            async with Client(mcp) as client:
+                cost = await timed(lambda: call_history(client))
+            label = "MCP 출력 검증 생략" if skip else "MCP 출력 스키마 검증"
+            print(f"{label:>22}: {cost:.2f}µs/row")
+
+    asyncio.run(run())
+
+
+def _fake_llm_server(port: int, latency: float):
+    """OpenAI 호환 /chat/completions 가짜 서버 (별도 프로세스)
+
+    도구 목록이 오면 get_balance 호출을 요청하고, 도구 결과가 오면 답변을 돌려줍니다. 응답마다 `latency`초를 기다립니다.
+    """
+    import uvicorn
+    from fastapi import FastAPI
+
+    app = FastAPI()
+
+    @app.post("/v1/chat/completions")
+    async def completions(body: dict):
+        await asyncio.sleep(latency)
+        if body.get("tools"):
+            message = {
+                "role": "assistant", "content": None,
+                "tool_calls": [{"id": "call_1", "type": "function", "function": {"name": "get_balance", "arguments": "{}"}}],
+            }
+        else:
+            message = {"role": "assistant", "content": "현재 현금 잔고는 1,000,000원이며 보유 종목은 없습니다."}
+        return {"choices": [{"index": 0, "message": message, "finish_reason": "stop"}]}
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning", backlog=4096)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def bench_gateway(args):
+    """게이트웨이가 한 코어에서 동시에 처리할 수 있는 세션 수를 측정합니다.
+
+    가짜 LLM 서버와 MCP 서버(my_server)는 별도 프로세스로 띄우고, 게이트웨이는 이 프로세스에서
+    공유 MCP 연결 하나로 실행합니다. 세션마다 평균 `--think-ms`씩 쉬며 메시지를 `--turns`번 보내고,
+    세 번째 메시지마다 로컬 라우팅("잔고")이 됩니다. CPU는 이 프로세스(게이트웨이 + 부하 발생기)의 사용 시간이며,
+    세 서버가 같은 코어를 나눠 쓰는 경우에도 턴당 CPU로 게이트웨이 전용 코어의 수용량을 추정합니다.
+    """
+    import subprocess
+
+    import httpx
+    from fastmcp import Client
+    from fastmcp.client.transports import StreamableHttpTransport
+
+    import chat_gateway
+
+    db_file = Path(_TMP_DIR) / "gateway.db"
+    store = SQLiteTradeStore(db_file)
+    account_id = asyncio.run(store.create_account("bench", "1234", 1_000_000))
+    asyncio.run(store.close())
+
+    llm_port, mcp_port = _free_port(), _free_port()
+    llm = multiprocessing.Process(target=_fake_llm_server, args=(llm_port, args.llm_latency_ms / 1000), daemon=True)
+    llm.start()
+    env = {**os.environ, "STOCK_DB_FILE": str(db_file), "ORDER_BOOK_DIR": str(Path(_TMP_DIR) / "order_book"), "DB_SHARD_COUNT": "1"}
+    mcp_server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "my_server:app", "--port", str(mcp_port), "--log-level", "warning"],
+        cwd=Path(__file__).parent, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+    async def wait_ready(url: str):
+        async with httpx.AsyncClient() as probe:
+            for _ in range(300):
+                try:
+                    await probe.get(url)
+                    return
+                except httpx.HTTPError:
+                    await asyncio.sleep(0.1)
+        raise RuntimeError(f"{url} 서버가 뜨지 않았습니다.")
+
+    async def run():
+        await wait_ready(f"http://127.0.0.1:{llm_port}/docs")
+        await wait_ready(f"http://127.0.0.1:{mcp_port}/docs")
+
+        mcp = Client(StreamableHttpTransport(url=f"http://127.0.0.1:{mcp_port}/mcp/", httpx_client_factory=chat_gateway.mcp_http_client))
+        app = chat_gateway.create_app(mcp, llm_base_url=f"http://127.0.0.1:{llm_port}/v1")
+        gateway = app.state.gateway
+        await gateway.start()
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://gateway", limits=limits, timeout=120) as client:
+                think = args.think_ms / 1000
+                print(
+                    f"가짜 LLM 지연 {args.llm_latency_ms}ms, 세션당 {args.turns}턴, 평균 생각 시간 {args.think_ms}ms "
+                    f"(LLM 턴: LLM 호출 2회 + 도구 호출 1회)"
+                )
+                print(f"{'세션':>6} {'턴/s':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'503':>6} {'CPU':>5} {'CPU/턴':>8}")
+                cpu_per_turn = 0.0
+                for sessions in (int(n) for n in args.sessions.split(",")):
+                    ids = []
+                    for _ in range(sessions):
+                        response = await client.post("/sessions", json={"account_id": account_id, "password": "1234"})
+                        ids.append(response.json()["session_id"])
+                    latencies, rejected = [], 0
+
+                    async def converse(session_id: str):
+                        nonlocal rejected
+                        for turn in range(args.turns):
+                            if think:
+                                await asyncio.sleep(random.expovariate(1 / think))
+                            content = "잔고" if turn % 3 == 2 else "내 계좌 상황을 요약해줘"
+                            started = time.perf_counter()
+                            response = await client.post(f"/sessions/{session_id}/messages", json={"content": content})
+                            if response.status_code == 503:
+                                rejected += 1
+                                continue
+                            response.raise_for_status()
+                            latencies.append(time.perf_counter() - started)
+
+                    cpu, start = time.process_time(), time.perf_counter()
+                    await asyncio.gather(*(converse(i) for i in ids))
+                    cpu_per_turn = max(cpu_per_turn, (time.process_time() - cpu) / max(1, len(latencies)))
+                    elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu
+                    for session_id in ids:
+                        await client.delete(f"/sessions/{session_id}")
+
+                    latencies.sort()
+                    pct = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000  # noqa: E731
+                    print(
+                        f"{sessions:>6,} {len(latencies) / elapsed:>7,.0f} {pct(0.5):>6,.0f}ms {pct(0.95):>6,.0f}ms "
+                        f"{pct(0.99):>6,.0f}ms {rejected:>6,} {cpu / elapsed:>5.0%} {cpu / max(1, len(latencies)) * 1000:>6.2f}ms"
+                    )
+
+                # 게이트웨이 전용 코어 하나가 처리할 수 있는 턴/s와, 세션이 턴마다 (생각 시간 + 응답 시간)을 쓴다고 볼 때의 세션 수
+                turns_per_core = 1 / cpu_per_turn
+                cycle = think + 2 * args.llm_latency_ms / 1000
+                print(
+                    f"게이트웨이 전용 코어 추정: 턴당 CPU {cpu_per_turn * 1000:.1f}ms(측정 중 최대값) → {turns_per_core:,.0f}턴/s, "
+                    f"세션당 {cycle:.1f}초에 한 턴이면 동시 세션 약 {turns_per_core * cycle:,.0f}개"
+                )
+        finally:
+            await gateway.stop()
+
+    try:
+        asyncio.run(run())
+    finally:
+        mcp_server.terminate()
+        llm.terminate()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stock Trading API 성능 측정")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name, func, help_text in (
+        ("orders", bench_orders, "주문 반영 처리량 (sync vs batch)"),
+        ("backends", bench_backends, "저장소 백엔드 비교 (SQLite vs MySQL)"),
+    ):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("--orders", type=int, default=2000)
+        p.add_argument("--accounts", type=int, default=4)
+        p.add_argument("--concurrency", type=int, default=64)
+        p.add_argument("--shards", type=int, default=1)
+        p.set_defaults(func=func)
+
+    p = sub.add_parser("backtest", help="백테스트 엔진 처리 속도")
+    p.add_argument("--tickers", type=int, default=100)
+    p.add_argument("--days", type=int, default=2520)
+    p.add_argument("--trades", type=int, default=5000)
+    p.add_argument("--repeat", type=int, default=5)
+    p.set_defaults(func=bench_backtest)
+
+    p = sub.add_parser("orderbook", help="지정가/스톱 주문장 매칭 속도")
+    p.add_argument("--orders", type=int, default=200_000)
+    p.add_argument("--tickers", type=int, default=50)
+    p.add_argument("--ticks", type=int, default=200)
+    p.add_argument("--journal", action="store_true", help="저널 기록 포함")
+    p.set_defaults(func=bench_orderbook)
+
+    p = sub.add_parser("serialize", help="/trades 응답 직렬화 비용 (행당)")
+    p.add_argument("--rows", type=int, default=20_000)
+    p.add_argument("--repeat", type=int, default=5)
+    p.set_defaults(func=bench_serialize)
+
+    p = sub.add_parser("gateway", help="채팅 게이트웨이 동시 세션 부하 테스트 (가짜 LLM 서버)")
+    p.add_argument("--sessions", default="50,100,200,400", help="동시 세션 수 목록 (쉼표 구분)")
+    p.add_argument("--turns", type=int, default=3)
+    p.add_argument("--llm-latency-ms", type=int, default=300)
+    p.add_argument("--think-ms", type=int, default=5000, help="세션이 메시지 사이에 쉬는 평균 시간 (0이면 쉬지 않음)")
+    p.set_defaults(func=bench_gateway)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,400 @@
+"""
+멀티 세션 채팅 게이트웨이
+여러 사용자의 대화를 한 프로세스에서 동시에 처리합니다. MCP 서버 연결은 하나를 모든 세션이 함께 쓰고
+(JSON-RPC 요청 id로 다중화), 세션마다 대화 기록과 계좌 정보를 따로 가집니다.
+
+- LLM 호출과 도구 호출은 각각 동시 실행 수와 대기열 길이가 제한되며, 한도를 넘으면 503(Retry-After)을 반환합니다.
+- 같은 세션에 이전 메시지가 처리 중이면 409를 반환합니다.
+- "잔고", "005930 시세"처럼 분명한 요청은 intent_router로 LLM 없이 처리합니다.
+
+실행: uvicorn chat_gateway:app --port 8890  (my_server.py가 먼저 떠 있어야 함)
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, List, Optional
+
+import httpx
+from fastapi import FastAPI, HTTPException
+from fastmcp import Client
+from fastmcp.client.transports import StreamableHttpTransport
+from fastmcp.exceptions import ToolError
+from pydantic import BaseModel, Field
+
+from intent_router import STOCK_RULES, IntentRouter
+
+# MCP 서버와 LLM(OpenAI 호환 Chat Completions API) 주소
+MCP_SERVER_URL = os.getenv("MCP_SERVER_URL", "http://localhost:8888/mcp/")
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://api.openai.com/v1")
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-5-mini-2025-08-07")
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+
+# 동시에 진행할 수 있는 대화 턴 / LLM 호출 / 도구 호출 수와, 각각 기다릴 수 있는 요청 수
+GATEWAY_MAX_TURNS = int(os.getenv("GATEWAY_MAX_TURNS", "1024"))
+GATEWAY_LLM_CONCURRENCY = int(os.getenv("GATEWAY_LLM_CONCURRENCY", "256"))
+GATEWAY_TOOL_CONCURRENCY = int(os.getenv("GATEWAY_TOOL_CONCURRENCY", "64"))
+GATEWAY_MAX_QUEUE = int(os.getenv("GATEWAY_MAX_QUEUE", "512"))
+GATEWAY_QUEUE_TIMEOUT = float(os.getenv("GATEWAY_QUEUE_TIMEOUT", "10"))
+
+# 세션 수 상한, 유휴 세션 만료 시간(초), 세션마다 LLM에 다시 보내는 최근 대화 턴 수
+GATEWAY_MAX_SESSIONS = int(os.getenv("GATEWAY_MAX_SESSIONS", "10000"))
+GATEWAY_SESSION_TTL = float(os.getenv("GATEWAY_SESSION_TTL", "1800"))
+GATEWAY_HISTORY_TURNS = int(os.getenv("GATEWAY_HISTORY_TURNS", "10"))
+
+SYSTEM_PROMPT = (
+    "당신은 사용자 주식 거래를 돕는 AI 어시스턴트입니다. "
+    "매수·매도, 잔고 조회, 거래 내역 조회, 주가 조회를 처리하고 결과를 수치로 명확히 안내하세요. "
+    "이동평균·변동성·RSI·낙폭 같은 지표는 analyze_ticker 도구로 여러 종목을 한 번에 조회하세요. "
+    "잔고·수량 부족 등 거래가 불가능하면 이유를 숫자와 함께 설명하세요."
+)
+TOOL_RESULT_PROMPT = (
+    "아래 tool 결과를 기반으로 간결하게 최종 답변을 작성하세요. "
+    "'available_cash'는 현재 남은 현금 잔고, 'portfolio'는 종목별 보유 수량과 평균 단가입니다. "
+    "수치는 단위와 함께 명확하게 표현하세요. (예: 3주, 1,000원)"
+)
+
+
+class Overloaded(HTTPException):
+    """한도 초과로 요청을 받지 않음 (503, Retry-After)"""
+
+    def __init__(self, what: str, retry_after: int = 1):
+        super().__init__(
+            status_code=503,
+            detail=f"요청이 많아 {what}을(를) 처리할 수 없습니다. {retry_after}초 후 다시 시도하세요.",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+class Limiter:
+    """동시 실행 수와 대기열 길이를 제한합니다. 대기열이 가득 차거나 오래 기다리면 Overloaded를 올립니다."""
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        if not self._slots.locked():
+            await self._slots.acquire()
+        elif self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(self.name)
+        else:
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise Overloaded(self.name)
+            finally:
+                self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self._slots.release()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+
+class ChatSession:
+    """사용자 한 명의 대화 상태"""
+
+    def __init__(self, account_id: int, password: str, history_turns: int):
+        self.session_id = uuid.uuid4().hex
+        self.account_id = account_id
+        self.password = password
+        # (사용자 메시지, 최종 답변) 최근 대화
+        self.history: Deque[tuple] = deque(maxlen=history_turns)
+        self.busy = False
+        self.last_used = time.monotonic()
+
+    def tool_defaults(self) -> Dict[str, Any]:
+        """도구 인자로 넣을 계좌 헤더 값 (도구 입력 스키마에 있는 것만 사용)"""
+        return {"X-Account-Id": self.account_id, "X-Account-Password": self.password}
+
+
+def tools_spec_from(tools) -> List[Dict[str, Any]]:
+    """MCP 도구 목록을 Function calling 포맷으로 변환합니다. 계좌 헤더 인자는 게이트웨이가 채우므로 뺍니다."""
+    specs = []
+    for tool in tools:
+        schema = tool.inputSchema or {}
+        props = {k: p for k, p in schema.get("properties", {}).items() if not k.startswith("X-Account-")}
+        specs.append({
+            "type": "function",
+            "function": {
+                "name": tool.name,
+                "description": tool.description or "",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        k: {"type": p.get("type", "string"), "description": p.get("description", "")}
+                        for k, p in props.items()
+                    },
+                    "required": [k for k in schema.get("required", []) if k in props],
+                },
+            },
+        })
+    return specs
+
+
+def mcp_http_client(headers=None, timeout=None, auth=None) -> httpx.AsyncClient:
+    """MCP 연결용 httpx 클라이언트 (StreamableHttpTransport의 httpx_client_factory)
+
+    StreamableHttp는 진행 중인 요청마다 HTTP 연결을 하나씩 쓰는데, 기본 설정은 keep-alive 연결을 20개만
+    남겨 동시 호출이 많으면 연결을 계속 새로 맺습니다. 도구 호출 동시 실행 수만큼 연결을 유지합니다.
+    """
+    pool = GATEWAY_TOOL_CONCURRENCY + 4  # 서버 알림용 GET 스트림 등
+    return httpx.AsyncClient(
+        headers=headers,
+        timeout=timeout or httpx.Timeout(30, read=300),
+        auth=auth,
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=pool, max_keepalive_connections=pool),
+    )
+
+
+class ChatGateway:
+    """공유 MCP 연결, LLM HTTP 클라이언트, 세션 목록, 동시 실행 제한을 묶습니다."""
+
+    def __init__(self, mcp_client: Client, llm_base_url: str = LLM_BASE_URL, api_key: Optional[str] = None):
+        self.mcp = mcp_client
+        self.llm_base_url = llm_base_url.rstrip("/")
+        self.api_key = api_key if api_key is not None else os.getenv("OPENAI_API_KEY", "")
+        self.sessions: Dict[str, ChatSession] = {}
+        self.router = IntentRouter(STOCK_RULES)
+        self.turns = Limiter("대화", GATEWAY_MAX_TURNS, 0, 0)
+        self.llm_limiter = Limiter("LLM 호출", GATEWAY_LLM_CONCURRENCY, GATEWAY_MAX_QUEUE, GATEWAY_QUEUE_TIMEOUT)
+        self.tool_limiter = Limiter("도구 호출", GATEWAY_TOOL_CONCURRENCY, GATEWAY_MAX_QUEUE, GATEWAY_QUEUE_TIMEOUT)
+        self.tools_spec: List[Dict[str, Any]] = []
+        self._tool_params: Dict[str, set] = {}
+        self._http: Optional[httpx.AsyncClient] = None
+        self._reaper: Optional[asyncio.Task] = None
+
+    async def start(self):
+        await self.mcp.__aenter__()
+        tools = await self.mcp.list_tools()
+        self.tools_spec = tools_spec_from(tools)
+        self._tool_params = {t.name: set((t.inputSchema or {}).get("properties", {})) for t in tools}
+        limits = httpx.Limits(max_connections=self.llm_limiter.max_concurrency, max_keepalive_connections=self.llm_limiter.max_concurrency)
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        self._http = httpx.AsyncClient(base_url=self.llm_base_url, headers=headers, timeout=LLM_TIMEOUT, limits=limits)
+        self._reaper = asyncio.get_running_loop().create_task(self._expire_sessions())
+
+    async def stop(self):
+        if self._reaper is not None:
+            self._reaper.cancel()
+        if self._http is not None:
+            await self._http.aclose()
+        await self.mcp.__aexit__(None, None, None)
+
+    # ------------------------------------------------------------------
+    # 세션
+    # ------------------------------------------------------------------
+
+    def create_session(self, account_id: int, password: str) -> ChatSession:
+        if len(self.sessions) >= GATEWAY_MAX_SESSIONS:
+            raise Overloaded("새 세션", retry_after=5)
+        session = ChatSession(account_id, password, GATEWAY_HISTORY_TURNS)
+        self.sessions[session.session_id] = session
+        return session
+
+    def get_session(self, session_id: str) -> ChatSession:
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="세션을 찾을 수 없습니다. 새 세션을 만드세요.")
+        return session
+
+    async def _expire_sessions(self):
+        while True:
+            await asyncio.sleep(min(60.0, GATEWAY_SESSION_TTL))
+            cutoff = time.monotonic() - GATEWAY_SESSION_TTL
+            for session_id, session in list(self.sessions.items()):
+                if not session.busy and session.last_used < cutoff:
+                    del self.sessions[session_id]
+
+    # ------------------------------------------------------------------
+    # LLM / 도구 호출
+    # ------------------------------------------------------------------
+
+    async def call_llm(self, messages: List[Dict[str, Any]], with_tools: bool) -> Dict[str, Any]:
+        payload = {"model": LLM_MODEL, "messages": messages, "max_completion_tokens": 1024}
+        if with_tools and self.tools_spec:
+            payload["tools"] = self.tools_spec
+            payload["tool_choice"] = "auto"
+        async with self.llm_limiter.slot():
+            try:
+                response = await self._http.post("/chat/completions", json=payload)
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                raise HTTPException(status_code=502, detail=f"LLM 호출 실패: {e}")
+        return response.json()["choices"][0]["message"]
+
+    async def call_tool(self, session: ChatSession, name: str, args: Dict[str, Any]) -> Any:
+        params = self._tool_params.get(name, set())
+        # 계좌 헤더는 모델이 보낸 값을 버리고 항상 세션 값으로 채웁니다. (다른 계좌 접근 방지)
+        args = {k: v for k, v in args.items() if not k.lower().startswith("x-account-")}
+        args.update((k, v) for k, v in session.tool_defaults().items() if k in params)
+        async with self.tool_limiter.slot():
+            result = await self.mcp.call_tool_mcp(name, args)
+        if result.isError:
+            raise ToolError(result.content[0].text if result.content else f"{name} 호출 실패")
+        return result.structuredContent
+
+    # ------------------------------------------------------------------
+    # 대화 턴
+    # ------------------------------------------------------------------
+
+    async def chat(self, session: ChatSession, content: str) -> Dict[str, Any]:
+        if session.busy:
+            raise HTTPException(status_code=409, detail="이전 메시지를 처리 중입니다. 답변을 받은 뒤 다시 보내세요.")
+        session.busy = True
+        started = time.perf_counter()
+        try:
+            async with self.turns.slot():
+                route = self.router.route(content)
+                if route is not None:
+                    try:
+                        answer = route.render(await self.call_tool(session, route.tool, route.args))
+                    except HTTPException:
+                        raise
+                    except Exception as e:
+                        answer = f"요청을 처리하지 못했습니다: {e}"
+                    path = "routed"
+                else:
+                    answer = await self._answer_with_llm(session, content)
+                    path = "fallback"
+        finally:
+            session.busy = False
+            session.last_used = time.monotonic()
+        self.router.record(path, started)
+        session.history.append((content, answer))
+        return {"answer": answer, "path": path, "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+    async def _answer_with_llm(self, session: ChatSession, content: str) -> str:
+        history = []
+        for user_text, answer in session.history:
+            history += [{"role": "user", "content": user_text}, {"role": "assistant", "content": answer}]
+        user_msg = {"role": "user", "content": content}
+
+        first = await self.call_llm([{"role": "system", "content": SYSTEM_PROMPT}, *history, user_msg], with_tools=True)
+        tool_calls = first.get("tool_calls") or []
+        if not tool_calls:
+            return first.get("content") or ""
+
+        async def run(tool_call) -> Dict[str, Any]:
+            function = tool_call["function"]
+            try:
+                args = json.loads(function.get("arguments") or "{}")
+                result = await self.call_tool(session, function["name"], args)
+            except json.JSONDecodeError as e:
+                # 모델이 만든 인자가 JSON이 아니면 도구를 호출하지 않고 오류를 도구 결과로 돌려줍니다.
+                result = {"error": f"도구 인자가 올바른 JSON이 아닙니다: {e}"}
+            except HTTPException:
+                raise
+            except Exception as e:
+                result = {"error": str(e)}
+            return {
+                "role": "tool",
+                "tool_call_id": tool_call["id"],
+                "name": function["name"],
+                "content": json.dumps(result, ensure_ascii=False),
+            }
+
+        tool_messages = await asyncio.gather(*(run(tc) for tc in tool_calls))
+        second = await self.call_llm(
+            [
+                {"role": "system", "content": TOOL_RESULT_PROMPT},
+                *history,
+                user_msg,
+                {"role": "assistant", "content": None, "tool_calls": tool_calls},
+                *tool_messages,
+            ],
+            with_tools=False,
+        )
+        return second.get("content") or ""
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self.sessions),
+            "busy_sessions": sum(1 for s in self.sessions.values() if s.busy),
+            "turns": self.turns.status(),
+            "llm": self.llm_limiter.status(),
+            "tools": self.tool_limiter.status(),
+            "router": self.router.stats.summary(),
+        }
+
+
+def create_app(mcp_client: Optional[Client] = None, llm_base_url: str = LLM_BASE_URL) -> FastAPI:
+    """게이트웨이 앱. 기본값은 MCP_SERVER_URL의 my_server에 StreamableHttp로 연결합니다."""
+    if mcp_client is None:
+        mcp_client = Client(StreamableHttpTransport(url=MCP_SERVER_URL, httpx_client_factory=mcp_http_client))
+    gateway = ChatGateway(mcp_client, llm_base_url)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        await gateway.start()
+        try:
+            yield
+        finally:
+            await gateway.stop()
+
+    app = FastAPI(title="Stock Trading Chat Gateway", lifespan=lifespan)
+    app.state.gateway = gateway
+
+    class SessionCreateRequest(BaseModel):
+        """채팅 세션 생성"""
+
+        account_id: int = Field(1, ge=1, description="이 세션에서 사용할 계좌 번호")
+        password: str = Field(..., min_length=1, description="계좌 비밀번호 (계좌를 다루는 모든 도구 호출에 X-Account-Password로 사용)")
+
+    class MessageRequest(BaseModel):
+        """사용자 메시지"""
+
+        content: str = Field(..., min_length=1, description="사용자 요청")
+
+    @app.post("/sessions", summary="채팅 세션 생성")
+    async def create_session(request: SessionCreateRequest) -> Dict[str, Any]:
+        session = gateway.create_session(request.account_id, request.password)
+        return {"session_id": session.session_id}
+
+    @app.post("/sessions/{session_id}/messages", summary="메시지 전송")
+    async def send_message(session_id: str, request: MessageRequest) -> Dict[str, Any]:
+        """메시지를 처리하고 답변, 처리 경로(routed/fallback), 처리 시간을 반환합니다."""
+        return await gateway.chat(gateway.get_session(session_id), request.content)
+
+    @app.delete("/sessions/{session_id}", summary="채팅 세션 종료")
+    async def delete_session(session_id: str) -> Dict[str, str]:
+        gateway.sessions.pop(session_id, None)
+        return {"message": "세션을 종료했습니다."}
+
+    @app.get("/status", summary="게이트웨이 상태")
+    async def status() -> Dict[str, Any]:
+        """세션 수, 대화/LLM/도구 호출의 동시 실행·대기·거절 건수, 라우터 통계"""
+        return gateway.status()
+
+    return app
+
+
+app = create_app()
@@ -0,0 +1,107 @@
+"""
+기술적 지표 계산
+여러 종목의 종가를 (종목 × 일자) 행렬 하나로 맞춘 뒤 NumPy 연산으로 한 번에 계산합니다.
+"""
+import math
+import warnings
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+def right_aligned_matrix(series: Sequence[pd.Series]) -> np.ndarray:
+    """각 종목의 유효 종가를 오른쪽(최근) 끝에 맞춰 쌓은 행렬. 앞쪽 빈칸은 NaN
+
+    거래일이 서로 다른 종목(국내/해외)을 섞어도 각 종목의 최근 N개 봉이 같은 열에 오도록 합니다.
+    """
+    values = [s.dropna().to_numpy(dtype=float) for s in series]
+    width = max((len(v) for v in values), default=0)
+    matrix = np.full((len(values), width), np.nan)
+    for row, v in enumerate(values):
+        if len(v):
+            matrix[row, width - len(v):] = v
+    return matrix
+
+
+def _trailing_valid(matrix: np.ndarray, window: int) -> np.ndarray:
+    """각 행의 마지막 `window`칸이 모두 유효한지"""
+    if window > matrix.shape[1]:
+        return np.zeros(matrix.shape[0], dtype=bool)
+    return ~np.isnan(matrix[:, -window:]).any(axis=1)
+
+
+def wilder_rsi(matrix: np.ndarray, period: int = 14) -> np.ndarray:
+    """행별 마지막 시점의 RSI (Wilder 평활)"""
+    diff = np.diff(matrix, axis=1)
+    gains = pd.DataFrame(np.where(diff > 0, diff, 0.0).T)
+    losses = pd.DataFrame(np.where(diff < 0, -diff, 0.0).T)
+    # 앞쪽 NaN(상장 전 구간)은 평활에서 제외
+    gains[np.isnan(diff.T)] = np.nan
+    losses[np.isnan(diff.T)] = np.nan
+    avg_gain = gains.ewm(alpha=1 / period, adjust=False, min_periods=period).mean().iloc[-1].to_numpy()
+    avg_loss = losses.ewm(alpha=1 / period, adjust=False, min_periods=period).mean().iloc[-1].to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+    return np.where(avg_loss == 0, np.where(avg_gain > 0, 100.0, np.nan), rsi)
+
+
+def compute_indicators(matrix: np.ndarray, windows: Sequence[int], rsi_period: int = 14) -> Dict[str, np.ndarray]:
+    """종가 행렬에서 지표를 계산합니다. 각 값은 종목 수 길이의 배열이며, 계산할 수 없으면 NaN
+
+    - sma_{w}: w일 이동평균
+    - return_{w}: w거래일 수익률(%)
+    - volatility_{w}: w일 로그수익률 표준편차의 연율화(%)
+    - rsi: RSI(rsi_period)
+    - max_drawdown: 조회 기간 최대 낙폭(%)
+    """
+    result: Dict[str, np.ndarray] = {}
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        log_returns = np.diff(np.log(matrix), axis=1)
+        last = matrix[:, -1] if matrix.shape[1] else np.full(matrix.shape[0], np.nan)
+
+        for w in windows:
+            valid = _trailing_valid(matrix, w)
+            result[f"sma_{w}"] = np.where(valid, np.nanmean(matrix[:, -w:], axis=1), np.nan)
+
+            valid_ret = _trailing_valid(matrix, w + 1)
+            base = matrix[:, -(w + 1)] if matrix.shape[1] > w else last
+            result[f"return_{w}"] = np.where(valid_ret, (last / base - 1) * 100, np.nan)
+
+            if log_returns.shape[1] >= w and w >= 2:
+                vol = np.std(log_returns[:, -w:], axis=1, ddof=1) * math.sqrt(TRADING_DAYS_PER_YEAR) * 100
+            else:
+                vol = np.full(matrix.shape[0], np.nan)
+            result[f"volatility_{w}"] = np.where(valid_ret, vol, np.nan)
+
+        result["rsi"] = wilder_rsi(matrix, rsi_period) if matrix.shape[1] > rsi_period else np.full(matrix.shape[0], np.nan)
+
+        running_max = np.fmax.accumulate(matrix, axis=1)
+        result["max_drawdown"] = np.nanmin(matrix / running_max - 1, axis=1) * 100
+    return result
+
+
+def summarize(tickers: List[str], frames: List[pd.DataFrame], windows: Sequence[int], rsi_period: int = 14) -> Dict[str, dict]:
+    """종목별 지표를 LLM이 바로 읽을 수 있는 작은 dict로 정리합니다."""
+    matrix = right_aligned_matrix([df["Close"] for df in frames])
+    values = compute_indicators(matrix, windows, rsi_period)
+
+    def number(x) -> float:
+        return None if x is None or np.isnan(x) else round(float(x), 2)
+
+    summary = {}
+    for row, (ticker, df) in enumerate(zip(tickers, frames)):
+        closes = df["Close"].dropna()
+        summary[ticker] = {
+            "date": closes.index[-1].strftime("%Y-%m-%d"),
+            "close": int(closes.iloc[-1]),
+            "sma": {str(w): number(values[f"sma_{w}"][row]) for w in windows},
+            "return_pct": {str(w): number(values[f"return_{w}"][row]) for w in windows},
+            "volatility_pct": {str(w): number(values[f"volatility_{w}"][row]) for w in windows},
+            "rsi": number(values["rsi"][row]),
+            "max_drawdown_pct": number(values["max_drawdown"][row]),
+        }
+    return summary
@@ -37,6 +37,7 @@ def init_database():
                 account_id INT PRIMARY KEY AUTO_INCREMENT,
                 account_name VARCHAR(100) DEFAULT 'main',
                 cash_balance BIGINT NOT NULL DEFAULT 10000000,
+                password VARCHAR(255),
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
             )
@@ -76,11 +77,45 @@ def init_database():
                 trade_datetime TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (account_id) REFERENCES accounts(account_id),
                 INDEX idx_trade_datetime (trade_datetime),
-                INDEX idx_ticker (ticker)
+                INDEX idx_ticker (ticker),
+                INDEX idx_trade_account_datetime (account_id, trade_datetime)
             )
         """)
         print("✓ trade_history 테이블 생성 완료")
         
+        # 6-1. trade_daily_rollup 테이블 생성 (계좌·일자·종목별 거래 집계)
+        print("trade_daily_rollup 테이블 생성 중...")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS trade_daily_rollup (
+                account_id INT NOT NULL,
+                trade_date DATE NOT NULL,
+                ticker VARCHAR(20) NOT NULL,
+                name VARCHAR(100),
+                buy_count INT NOT NULL DEFAULT 0,
+                buy_qty BIGINT NOT NULL DEFAULT 0,
+                buy_notional BIGINT NOT NULL DEFAULT 0,
+                sell_count INT NOT NULL DEFAULT 0,
+                sell_qty BIGINT NOT NULL DEFAULT 0,
+                sell_notional BIGINT NOT NULL DEFAULT 0,
+                PRIMARY KEY (account_id, trade_date, ticker)
+            )
+        """)
+        cursor.execute("SELECT COUNT(*) FROM trade_daily_rollup")
+        if cursor.fetchone()[0] == 0:
+            # 기존 거래 내역으로 집계를 한 번 채웁니다.
+            cursor.execute("""
+                INSERT INTO trade_daily_rollup (account_id, trade_date, ticker, name,
+                    buy_count, buy_qty, buy_notional, sell_count, sell_qty, sell_notional)
+                SELECT account_id, DATE(trade_datetime), ticker, MAX(name),
+                    SUM(trade_type = 'buy'), SUM(IF(trade_type = 'buy', qty, 0)),
+                    SUM(IF(trade_type = 'buy', qty * price, 0)),
+                    SUM(trade_type = 'sell'), SUM(IF(trade_type = 'sell', qty, 0)),
+                    SUM(IF(trade_type = 'sell', qty * price, 0))
+                FROM trade_history
+                GROUP BY account_id, DATE(trade_datetime), ticker
+            """)
+        print("✓ trade_daily_rollup 테이블 생성 완료")
+        
         # 7. 기본 계좌 생성
         print("기본 계좌 생성 중...")
         cursor.execute("""
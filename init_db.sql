@@ -8,6 +8,7 @@ CREATE TABLE IF NOT EXISTS accounts (
     account_id INT PRIMARY KEY AUTO_INCREMENT,
     account_name VARCHAR(100) DEFAULT 'main',
     cash_balance BIGINT NOT NULL DEFAULT 10000000,
+    password VARCHAR(255),  -- hash_password 결과 (pbkdf2_sha256$...)
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 );
@@ -39,7 +40,23 @@ CREATE TABLE IF NOT EXISTS trade_history (
     trade_datetime TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (account_id) REFERENCES accounts(account_id),
     INDEX idx_trade_datetime (trade_datetime),
-    INDEX idx_ticker (ticker)
+    INDEX idx_ticker (ticker),
+    INDEX idx_trade_account_datetime (account_id, trade_datetime)
+);
+
+-- 일별 거래 집계 테이블 (계좌·일자·종목별, 거래마다 누적 갱신)
+CREATE TABLE IF NOT EXISTS trade_daily_rollup (
+    account_id INT NOT NULL,
+    trade_date DATE NOT NULL,
+    ticker VARCHAR(20) NOT NULL,
+    name VARCHAR(100),
+    buy_count INT NOT NULL DEFAULT 0,
+    buy_qty BIGINT NOT NULL DEFAULT 0,
+    buy_notional BIGINT NOT NULL DEFAULT 0,
+    sell_count INT NOT NULL DEFAULT 0,
+    sell_qty BIGINT NOT NULL DEFAULT 0,
+    sell_notional BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (account_id, trade_date, ticker)
 );
 
 -- 기본 계좌 생성 (초기 현금 1천만원)
@@ -8,6 +8,90 @@ from pathlib import Path
 
 DB_FILE = Path(__file__).parent / "stock_trading.db"
 
+def create_tables(cursor):
+    """accounts, portfolio, trade_history, trade_daily_rollup 테이블과 인덱스를 생성합니다. (이미 있으면 건너뜀)"""
+    # 1. accounts 테이블
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS accounts (
+            account_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account_name TEXT DEFAULT 'main',
+            cash_balance INTEGER NOT NULL DEFAULT 10000000,
+            password TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # 2. portfolio 테이블
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS portfolio (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account_id INTEGER NOT NULL DEFAULT 1,
+            ticker TEXT NOT NULL,
+            name TEXT,
+            qty INTEGER NOT NULL,
+            avg_price INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (account_id) REFERENCES accounts(account_id),
+            UNIQUE(account_id, ticker)
+        )
+    """)
+
+    # 3. trade_history 테이블
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS trade_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            account_id INTEGER NOT NULL DEFAULT 1,
+            trade_type TEXT NOT NULL CHECK(trade_type IN ('buy', 'sell')),
+            ticker TEXT NOT NULL,
+            name TEXT,
+            qty INTEGER NOT NULL,
+            price INTEGER NOT NULL,
+            avg_price INTEGER,
+            trade_datetime TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (account_id) REFERENCES accounts(account_id)
+        )
+    """)
+
+    # 인덱스 생성
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_trade_datetime ON trade_history(trade_datetime)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ticker ON trade_history(ticker)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_trade_account_datetime ON trade_history(account_id, trade_datetime)")
+
+    # 4. trade_daily_rollup 테이블 (계좌·일자·종목별 거래 집계, 거래마다 누적 갱신)
+    cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'trade_daily_rollup'")
+    rollup_exists = cursor.fetchone()[0] > 0
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS trade_daily_rollup (
+            account_id INTEGER NOT NULL,
+            trade_date TEXT NOT NULL,
+            ticker TEXT NOT NULL,
+            name TEXT,
+            buy_count INTEGER NOT NULL DEFAULT 0,
+            buy_qty INTEGER NOT NULL DEFAULT 0,
+            buy_notional INTEGER NOT NULL DEFAULT 0,
+            sell_count INTEGER NOT NULL DEFAULT 0,
+            sell_qty INTEGER NOT NULL DEFAULT 0,
+            sell_notional INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (account_id, trade_date, ticker)
+        )
+    """)
+    if not rollup_exists:
+        # 기존 거래 내역으로 집계를 한 번 채웁니다.
+        cursor.execute("""
+            INSERT INTO trade_daily_rollup (account_id, trade_date, ticker, name,
+                buy_count, buy_qty, buy_notional, sell_count, sell_qty, sell_notional)
+            SELECT account_id, DATE(trade_datetime), ticker, MAX(name),
+                SUM(trade_type = 'buy'), SUM(CASE WHEN trade_type = 'buy' THEN qty ELSE 0 END),
+                SUM(CASE WHEN trade_type = 'buy' THEN qty * price ELSE 0 END),
+                SUM(trade_type = 'sell'), SUM(CASE WHEN trade_type = 'sell' THEN qty ELSE 0 END),
+                SUM(CASE WHEN trade_type = 'sell' THEN qty * price ELSE 0 END)
+            FROM trade_history
+            GROUP BY account_id, DATE(trade_datetime), ticker
+        """)
+
+
 def init_database():
     """데이터베이스와 테이블 초기화"""
     try:
@@ -15,58 +99,10 @@ def init_database():
         conn = sqlite3.connect(DB_FILE)
         cursor = conn.cursor()
         
-        # 1. accounts 테이블 생성
-        print("accounts 테이블 생성 중...")
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS accounts (
-                account_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                account_name TEXT DEFAULT 'main',
-                cash_balance INTEGER NOT NULL DEFAULT 10000000,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        print("✓ accounts 테이블 생성 완료")
-        
-        # 2. portfolio 테이블 생성
-        print("portfolio 테이블 생성 중...")
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS portfolio (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                account_id INTEGER NOT NULL DEFAULT 1,
-                ticker TEXT NOT NULL,
-                name TEXT,
-                qty INTEGER NOT NULL,
-                avg_price INTEGER NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (account_id) REFERENCES accounts(account_id),
-                UNIQUE(account_id, ticker)
-            )
-        """)
-        print("✓ portfolio 테이블 생성 완료")
-        
-        # 3. trade_history 테이블 생성
-        print("trade_history 테이블 생성 중...")
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS trade_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                account_id INTEGER NOT NULL DEFAULT 1,
-                trade_type TEXT NOT NULL CHECK(trade_type IN ('buy', 'sell')),
-                ticker TEXT NOT NULL,
-                name TEXT,
-                qty INTEGER NOT NULL,
-                price INTEGER NOT NULL,
-                avg_price INTEGER,
-                trade_datetime TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (account_id) REFERENCES accounts(account_id)
-            )
-        """)
-        
-        # 인덱스 생성
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_trade_datetime ON trade_history(trade_datetime)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_ticker ON trade_history(ticker)")
-        print("✓ trade_history 테이블 생성 완료")
+        # 1~3. accounts, portfolio, trade_history, trade_daily_rollup 테이블 생성
+        print("테이블 생성 중...")
+        create_tables(cursor)
+        print("✓ accounts, portfolio, trade_history, trade_daily_rollup 테이블 생성 완료")
         
         # 4. 기본 계좌 생성
         print("기본 계좌 생성 중...")
@@ -0,0 +1,204 @@
+"""
+로컬 의도 라우터
+"잔고", "005930 시세", "ORDER123 배송 조회"처럼 도구와 인자가 분명한 요청은 LLM을 거치지 않고
+MCP 도구를 바로 호출한 뒤 템플릿으로 답합니다. 규칙에 맞지 않으면 None을 돌려 LLM 경로로 넘깁니다.
+
+규칙은 문장 전체와 일치해야 하므로(앞뒤에 다른 말이 붙으면 LLM으로) 오분류보다 LLM 위임을 택합니다.
+"""
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+# 문장 끝에 붙어도 의미가 바뀌지 않는 말 (예: "잔고 알려줘", "시세 좀 보여주세요?")
+_POLITE = r"(?:\s*(?:좀|를|을|은|는|요|해|해줘|해 줘|해주세요|해 주세요|알려줘|알려 줘|알려주세요|알려 주세요|보여줘|보여 줘|보여주세요|보여 주세요|주세요|줘|부탁해|부탁해요|부탁합니다))*"
+_END = _POLITE + r"\s*[.?!~]*"
+# 매수/매도는 질문("사요?", "매도는?")을 주문으로 오해하지 않도록 명령형 어미로 끝나야 하고, 물음표·조사를 받지 않습니다.
+_ORDER_END = r"\s*[.!]*"
+_ORDER_POLITE = r"(?:\s*(?:해|해\s*줘|해\s*주세요|부탁해|부탁해요|부탁합니다))?"
+
+
+@dataclass
+class Rule:
+    """정규식 하나와 그에 해당하는 도구 호출·응답 템플릿"""
+
+    name: str
+    pattern: str
+    tool: str
+    args: Callable[[re.Match], Dict[str, Any]]
+    render: Callable[[Any], str]
+    end: str = _END  # 문장 끝에 허용하는 말
+    regex: re.Pattern = field(init=False)
+
+    def __post_init__(self):
+        self.regex = re.compile(self.pattern + self.end, re.IGNORECASE)
+
+
+@dataclass
+class Route:
+    """라우팅 결과: 호출할 도구와 인자, 결과 템플릿"""
+
+    rule: str
+    tool: str
+    args: Dict[str, Any]
+    render: Callable[[Any], str]
+
+
+class RouterStats:
+    """라우팅/LLM 위임 비율과 처리 시간"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {"routed": [], "fallback": []}
+
+    def record(self, path: str, seconds: float):
+        self.latencies[path].append(seconds)
+
+    def summary(self) -> Dict[str, Any]:
+        routed, fallback = self.latencies["routed"], self.latencies["fallback"]
+        total = len(routed) + len(fallback)
+        avg = lambda xs: sum(xs) / len(xs) * 1000 if xs else None  # noqa: E731
+        avg_routed, avg_fallback = avg(routed), avg(fallback)
+        saved = None
+        if routed and fallback:
+            # 라우팅된 요청이 LLM 경로였다면 걸렸을 평균 시간과의 차이
+            saved = len(routed) * (avg_fallback - avg_routed)
+        return {
+            "total": total,
+            "routed": len(routed),
+            "fallback": len(fallback),
+            "routed_ratio": round(len(routed) / total, 3) if total else None,
+            "fallback_ratio": round(len(fallback) / total, 3) if total else None,
+            "avg_routed_ms": round(avg_routed, 1) if avg_routed is not None else None,
+            "avg_fallback_ms": round(avg_fallback, 1) if avg_fallback is not None else None,
+            "saved_ms": round(saved, 1) if saved is not None else None,
+        }
+
+    def report(self) -> str:
+        s = self.summary()
+        if not s["total"]:
+            return "라우터 통계: 처리한 요청 없음"
+        text = (
+            f"라우터 통계: 총 {s['total']}건, 로컬 처리 {s['routed']}건({s['routed_ratio']:.0%}), "
+            f"LLM 위임 {s['fallback']}건({s['fallback_ratio']:.0%})"
+        )
+        if s["avg_routed_ms"] is not None:
+            text += f", 로컬 평균 {s['avg_routed_ms']:,.1f}ms"
+        if s["avg_fallback_ms"] is not None:
+            text += f", LLM 평균 {s['avg_fallback_ms']:,.1f}ms"
+        if s["saved_ms"] is not None:
+            text += f", 절약 추정 {s['saved_ms'] / 1000:,.2f}초"
+        return text
+
+
+class IntentRouter:
+    """규칙을 순서대로 검사해 처음 일치하는 규칙으로 라우팅합니다."""
+
+    def __init__(self, rules: List[Rule]):
+        self.rules = rules
+        self.stats = RouterStats()
+
+    def route(self, text: str) -> Optional[Route]:
+        normalized = " ".join(text.split())
+        for rule in self.rules:
+            match = rule.regex.fullmatch(normalized)
+            if match:
+                return Route(rule.name, rule.tool, rule.args(match), rule.render)
+        return None
+
+    def record(self, path: str, started: float):
+        """`started`(time.perf_counter 값)부터 지금까지를 `path`("routed" 또는 "fallback") 처리 시간으로 기록"""
+        self.stats.record(path, time.perf_counter() - started)
+
+
+# ---------------------------------------------------------------------------
+# 주식 거래 (my_client.py, my_server.py 도구)
+# ---------------------------------------------------------------------------
+
+def _won(value: Any) -> str:
+    return f"{int(value):,}원" if value is not None else "-"
+
+
+def render_balance(result: Dict[str, Any]) -> str:
+    lines = [f"현금 잔고: {_won(result['available_cash'])}"]
+    portfolio = result.get("portfolio") or {}
+    if not portfolio:
+        lines.append("보유 종목: 없음")
+    for ticker, item in portfolio.items():
+        lines.append(f"- {item.get('name') or ticker}({ticker}) {item['qty']:,}주, 평균 단가 {_won(item['avg_price'])}")
+    return "\n".join(lines)
+
+
+def render_price(result: Dict[str, Any]) -> str:
+    text = f"{result['ticker']} 최근 종가: {_won(result['close'])} ({result['date']} 기준)"
+    if result.get("stale"):
+        text += " ※ 시세 서버 장애로 마지막으로 받은 시세입니다."
+    return text
+
+
+def render_trade(result: Dict[str, Any]) -> str:
+    return f"{result['message']}\n남은 현금: {_won(result['available_cash'])}"
+
+
+def render_trades(result: Dict[str, Any]) -> str:
+    rows = result.get("result", result) if isinstance(result, dict) else result
+    if not rows:
+        return "해당 기간의 거래 내역이 없습니다."
+    lines = [f"거래 내역 {len(rows):,}건 (최신순)"]
+    for row in rows[:20]:
+        kind = "매수" if row["type"] == "buy" else "매도"
+        lines.append(f"- {row['datetime']} {row.get('name') or row['ticker']} {row['qty']:,}주 {kind} @ {_won(row['price'])}")
+    if len(rows) > 20:
+        lines.append(f"... 외 {len(rows) - 20:,}건")
+    return "\n".join(lines)
+
+
+_TICKER = r"(?P<ticker>\d{6})"
+_QTY = r"\s*(?P<qty>[1-9]\d*)"  # 1주 이상
+_DATE = r"\d{4}-\d{2}-\d{2}"
+
+
+def _trade_args(match: re.Match) -> Dict[str, Any]:
+    return {"ticker": match["ticker"], "qty": int(match["qty"])}
+
+
+def _history_args(match: re.Match) -> Dict[str, Any]:
+    args = {}
+    if match["start"]:
+        args["start_date"] = match["start"]
+    if match["end"]:
+        args["end_date"] = match["end"]
+    return args
+
+
+STOCK_RULES = [
+    Rule("balance", r"(?:내\s*)?(?:잔고|잔액|예수금|계좌\s*잔고|보유\s*종목|포트폴리오)(?:\s*(?:조회|확인))?",
+         "get_balance", lambda m: {}, render_balance),
+    Rule("price", _TICKER + r"\s*(?:의\s*)?(?:시세|주가|현재가|가격|종가)(?:\s*(?:조회|확인))?",
+         "get_price", lambda m: {"ticker": m["ticker"]}, render_price),
+    Rule("buy", _TICKER + _QTY + r"\s*주\s*(?:매수" + _ORDER_POLITE + r"|사\s*줘|사\s*주세요|사)",
+         "buy_stock", _trade_args, render_trade, end=_ORDER_END),
+    Rule("sell", _TICKER + _QTY + r"\s*주\s*(?:매도" + _ORDER_POLITE + r"|팔아\s*줘|팔아\s*주세요|팔아)",
+         "sell_stock", _trade_args, render_trade, end=_ORDER_END),
+    Rule("history", rf"(?:(?P<start>{_DATE})\s*(?:~|부터)\s*(?P<end>{_DATE})?\s*(?:까지\s*)?)?거래\s*내역(?:\s*(?:조회|확인))?",
+         "get_trade_history", _history_args, render_trades),
+]
+
+
+# ---------------------------------------------------------------------------
+# 쇼핑몰 배송 조회 (main.py, mcp_server.py 도구)
+# ---------------------------------------------------------------------------
+
+def render_delivery(result: Dict[str, Any]) -> str:
+    if result.get("courier") in (None, "-"):
+        return f"주문 {result['order_id']}: {result['status']}"
+    return (
+        f"주문 {result['order_id']}은(는) 현재 '{result['status']}' 상태입니다. "
+        f"({result['courier']}, 운송장 {result['tracking_number']}, {result['last_update']} 기준)"
+    )
+
+
+DELIVERY_RULES = [
+    Rule("track_delivery",
+         r"(?:주문\s*(?:번호)?\s*)?(?P<order_id>ORDER\d+)\s*(?:의\s*)?(?:배송|택배)\s*(?:조회|상태|확인|현황|어디|위치)?(?:\s*(?:조회|확인))?",
+         "track_delivery", lambda m: {"order_id": m["order_id"].upper()}, render_delivery),
+]
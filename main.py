@@ -3,13 +3,18 @@ import asyncio
 import json
 import os
 import sys
+import time
+from contextlib import AsyncExitStack
 from pathlib import Path
+from typing import Optional
 
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 from openai import OpenAI
 from dotenv import load_dotenv
 
+from intent_router import DELIVERY_RULES, IntentRouter
+
 
 load_dotenv()  # .env 파일 내용 환경변수로 로드
 
@@ -21,6 +26,9 @@ client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 # MCP 서버 스크립트 경로 (같은 폴더에 mcp_server.py 있다고 가정)
 MCP_SCRIPT = Path(__file__).with_name("mcp_server.py")
 
+# "ORDER123 배송 조회"처럼 주문번호가 분명한 요청은 LLM 없이 바로 도구를 호출
+router = IntentRouter(DELIVERY_RULES)
+
 
 SYSTEM_PROMPT = """
 너는 쇼핑몰 고객센터 상담원이다.
@@ -56,21 +64,43 @@ TOOLS = [
 ]
 
 
+_mcp_stack: Optional[AsyncExitStack] = None
+_mcp_session: Optional[ClientSession] = None
+
+
+async def get_mcp_session() -> ClientSession:
+    """
+    MCP 서버(mcp_server.py)를 stdio로 한 번만 띄우고 세션을 재사용.
+    호출마다 프로세스를 새로 띄우면 도구 호출 한 번에 1초 이상 걸린다.
+    """
+    global _mcp_stack, _mcp_session
+    if _mcp_session is None:
+        server_params = StdioServerParameters(
+            command=sys.executable,
+            args=[str(MCP_SCRIPT)],
+            env={**os.environ},
+        )
+        stack = AsyncExitStack()
+        read, write = await stack.enter_async_context(stdio_client(server_params))
+        session = await stack.enter_async_context(ClientSession(read, write))
+        await session.initialize()
+        _mcp_stack, _mcp_session = stack, session
+    return _mcp_session
+
+
+async def close_mcp_session():
+    global _mcp_stack, _mcp_session
+    if _mcp_stack is not None:
+        await _mcp_stack.aclose()
+        _mcp_stack, _mcp_session = None, None
+
+
 async def call_mcp_tool(tool_name: str, arguments: dict):
     """
     MCP 서버(mcp_server.py)에 stdio로 붙어서 해당 tool을 실행하고 결과를 반환.
     """
-    server_params = StdioServerParameters(
-        command=sys.executable,
-        args=[str(MCP_SCRIPT)],
-        env={**os.environ},
-    )
-
-    async with stdio_client(server_params) as (read, write):
-        async with ClientSession(read, write) as session:
-            await session.initialize()
-            result = await session.call_tool(tool_name, arguments=arguments)
-            return result
+    session = await get_mcp_session()
+    return await session.call_tool(tool_name, arguments=arguments)
 
 
 def call_llm_with_tools(messages):
@@ -114,7 +144,29 @@ def extract_mcp_tool_output(mcp_result) -> str:
     return str(mcp_result)
 
 
+def structured_result(mcp_result) -> dict:
+    """MCP CallToolResult의 structuredContent. 도구가 {"result": ...}로 감싼 경우 벗겨서 반환"""
+    data = getattr(mcp_result, "structuredContent", None) or {}
+    if set(data) == {"result"} and isinstance(data["result"], dict):
+        return data["result"]
+    return data
+
+
 async def chat_once(user_input: str):
+    started = time.perf_counter()
+    route = router.route(user_input)
+    if route is not None:
+        # 0) 로컬 라우팅: LLM 호출 없이 도구 결과를 템플릿으로 답변
+        mcp_result = await call_mcp_tool(route.tool, route.args)
+        if mcp_result.isError:
+            answer = f"요청을 처리하지 못했습니다: {extract_mcp_tool_output(mcp_result)}"
+        else:
+            answer = route.render(structured_result(mcp_result))
+        router.record("routed", started)
+        print(f"\n⚡ 로컬 라우팅: {route.tool}({route.args}) {(time.perf_counter() - started) * 1000:.0f}ms")
+        print(f"\n💬 최종 답변:\n{answer}\n")
+        return
+
     # 1) 유저 메시지까지 넣고 1차 LLM 호출
     messages = [
         {"role": "system", "content": SYSTEM_PROMPT},
@@ -164,15 +216,26 @@ async def chat_once(user_input: str):
         # 도구 필요 없이 바로 답한 경우
         print(f"\n💬 LLM 직접 답변:\n{msg.content}\n")
 
+    router.record("fallback", started)
 
-async def main():
-    # 한 번 테스트: 주문번호까지 다 말해주는 케이스
-    print("=== 테스트 1: 'ORDER123 배송 조회해줘' ===")
-    await chat_once("ORDER123 배송 조회해줘")
 
-    # 한 번 테스트: 주문번호 없이 “배송조회가 궁금해요”
-    print("\n=== 테스트 2: '나 배송조회가 궁금해요' ===")
-    await chat_once("나 배송조회가 궁금해요")
+async def main():
+    try:
+        # 한 번 테스트: 주문번호까지 다 말해주는 케이스
+        print("=== 테스트 1: 'ORDER123 배송 조회해줘' ===")
+        await chat_once("ORDER123 배송 조회해줘")
+
+        # 한 번 테스트: 주문번호 없이 “배송조회가 궁금해요”
+        print("\n=== 테스트 2: '나 배송조회가 궁금해요' ===")
+        await chat_once("나 배송조회가 궁금해요")
+
+        # 같은 세션으로 다시: 로컬 라우팅은 도구 호출 시간만 든다
+        print("\n=== 테스트 3: 'ORDER999 배송 상태' ===")
+        await chat_once("ORDER999 배송 상태")
+    finally:
+        await close_mcp_session()
+
+    print("\n" + router.stats.report())
 
 
 if __name__ == "__main__":
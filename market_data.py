@@ -0,0 +1,66 @@
+"""
+시세 이력 조회
+FinanceDataReader 일봉 이력을 종목별로 잠시 캐시해, 같은 종목을 여러 번 분석해도 한 번만 받아옵니다.
+"""
+import os
+import threading
+import time
+from datetime import date, timedelta
+from typing import Dict, Tuple
+
+import pandas as pd
+
+from upstream import is_outage, price_guard
+
+# 이력 캐시 유지 시간(초)
+PRICE_HISTORY_TTL = float(os.getenv("PRICE_HISTORY_TTL", "300"))
+
+_cache: Dict[str, Tuple[float, date, pd.DataFrame]] = {}
+_cache_lock = threading.Lock()
+
+
+def get_history(ticker: str, days: int = 365) -> pd.DataFrame:
+    """최근 `days`일의 OHLCV 일봉을 반환합니다. (Open, High, Low, Close, Volume 컬럼, 날짜 인덱스)
+
+    캐시에 더 긴 기간이 있으면 그 일부를 잘라서 돌려줍니다. 없는 종목이면 빈 DataFrame
+    """
+    import FinanceDataReader as fdr
+
+    start = date.today() - timedelta(days=days)
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(ticker)
+    if cached and now - cached[0] < PRICE_HISTORY_TTL and cached[1] <= start:
+        df = cached[2]
+        return df.loc[df.index >= pd.Timestamp(start)]
+
+    try:
+        df = fdr.DataReader(ticker, start)
+    except Exception as e:
+        if is_outage(e):
+            raise
+        # 없는 종목이나 빈·깨진 응답은 "데이터 없음"으로 돌려줍니다. (캐시하지 않음)
+        return pd.DataFrame()
+    with _cache_lock:
+        _cache[ticker] = (now, start, df)
+    return df
+
+
+async def load_history(ticker: str, days: int = 365) -> pd.DataFrame:
+    """get_history의 비동기 버전. 캐시에 없을 때만 업스트림 보호 장치(price_guard)를 거쳐 받아옵니다.
+
+    Raises:
+        UpstreamUnavailable: 업스트림을 쓸 수 없는 경우 (503)
+    """
+    start = date.today() - timedelta(days=days)
+    with _cache_lock:
+        cached = _cache.get(ticker)
+    if cached and time.monotonic() - cached[0] < PRICE_HISTORY_TTL and cached[1] <= start:
+        df = cached[2]
+        return df.loc[df.index >= pd.Timestamp(start)]
+    return await price_guard.call(get_history, ticker, days)
+
+
+def clear_history_cache():
+    with _cache_lock:
+        _cache.clear()
@@ -1,30 +1,257 @@
 # mcp_server.py
+import asyncio
+import importlib.metadata
+import json
+import logging
 import os
-import requests
-from typing import Dict
+from collections import OrderedDict, defaultdict
+from typing import Dict, Optional, Set
+
+import httpx
+from pydantic import AnyUrl
 
 from mcp.server.fastmcp import FastMCP
+from mcp.server.session import ServerSession
 
 BASE_URL = os.getenv("BACKEND_BASE_URL", "http://localhost:9000")
+# 백엔드 상태 스트림이 끊겼을 때 다시 연결하기까지 기다리는 최대 시간(초)
+DELIVERY_STREAM_MAX_BACKOFF = float(os.getenv("DELIVERY_STREAM_MAX_BACKOFF", "30"))
+# 상태를 캐시해 둘 주문 수. 넘으면 오래 조회되지 않은 주문부터 버립니다. (구독·조회 중인 주문은 남김)
+DELIVERY_CACHE_SIZE = int(os.getenv("DELIVERY_CACHE_SIZE", "10000"))
+
+DELIVERY_URI = "delivery://{order_id}"
+
+logger = logging.getLogger(__name__)
 
 mcp = FastMCP("ShoppingMallMCP")
 
 
+class DeliveryFeed:
+    """백엔드 주문 상태 스트림(/api/orders/stream) 하나를 모든 MCP 세션이 함께 씁니다.
+
+    - 조회한 적 있거나 구독 중인 주문의 상태를 캐시하고, 스트림이 연결된 동안에는 캐시로 답합니다.
+      (스트림이 끊긴 동안에는 캐시를 믿지 않고 백엔드를 직접 조회)
+    - 캐시는 cache_size개까지 LRU로 유지합니다. 구독 중이거나 조회 중인 주문은 버리지 않습니다.
+    - 상태가 바뀌면 그 주문(delivery://{order_id})을 구독한 MCP 세션에 resources/updated 알림을 보냅니다.
+    백엔드 부하는 조회 횟수가 아니라 상태 변경 횟수에 비례합니다.
+    """
+
+    def __init__(self, base_url: str, cache_size: int = DELIVERY_CACHE_SIZE):
+        self.base_url = base_url
+        self.cache_size = max(1, cache_size)
+        self.connected = False
+        self._orders: "OrderedDict[str, dict]" = OrderedDict()
+        # 백엔드 조회 중인 주문 → 진행 중인 조회 수. 조회하는 동안 온 변경도 캐시해 두기 위해 씁니다.
+        self._pending: Dict[str, int] = {}
+        self._resets = 0
+        self._subscribers: Dict[str, Set[ServerSession]] = defaultdict(set)
+        self._last_event_id: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+        self._http: Optional[httpx.AsyncClient] = None
+        self.stats = {"cache_hits": 0, "backend_fetches": 0, "events": 0, "notifications": 0, "evictions": 0}
+
+    def _ensure_started(self):
+        if self._http is None:
+            self._http = httpx.AsyncClient(base_url=self.base_url, timeout=httpx.Timeout(10, read=None))
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._listen())
+
+    # ------------------------------------------------------------------
+    # 조회 / 구독
+    # ------------------------------------------------------------------
+
+    async def status(self, order_id: str) -> dict:
+        """주문 상태. 스트림이 연결돼 있고 캐시에 있으면 백엔드를 호출하지 않습니다."""
+        self._ensure_started()
+        if self.connected and order_id in self._orders:
+            self.stats["cache_hits"] += 1
+            self._orders.move_to_end(order_id)
+            return self._orders[order_id]
+        self.stats["backend_fetches"] += 1
+        resets = self._resets
+        self._pending[order_id] = self._pending.get(order_id, 0) + 1
+        try:
+            resp = await self._http.get(f"/api/order/{order_id}")
+            resp.raise_for_status()
+        except httpx.HTTPError as e:
+            raise RuntimeError(f"배송조회 API 호출 실패: {e}") from e
+        finally:
+            self._pending[order_id] -= 1
+            if not self._pending[order_id]:
+                del self._pending[order_id]
+        order = resp.json()
+        if self.connected:
+            # 조회하는 동안 스트림으로 온 상태가 있으면 조회 결과보다 그것을 씁니다.
+            # 조회 도중 reset이 왔으면 조회 결과가 이미 지난 값일 수 있으므로 캐시하지 않습니다.
+            if order_id in self._orders:
+                order = self._orders[order_id]
+            elif resets == self._resets:
+                self._remember(order_id, order)
+        return order
+
+    def subscribe(self, order_id: str, session: ServerSession):
+        self._ensure_started()
+        self._subscribers[order_id].add(session)
+
+    def unsubscribe(self, order_id: str, session: ServerSession):
+        subscribers = self._subscribers.get(order_id)
+        if subscribers is None:
+            return
+        subscribers.discard(session)
+        if not subscribers:
+            del self._subscribers[order_id]
+
+    def _remember(self, order_id: str, order: dict):
+        """주문 상태를 캐시하고, 한도를 넘으면 오래 쓰지 않은 주문부터 버립니다."""
+        self._orders[order_id] = order
+        self._orders.move_to_end(order_id)
+        # 구독·조회 중인 주문은 알림과 조회 결과에 필요하므로 뒤로 보내고 다음 주문을 봅니다.
+        checked = 0
+        while len(self._orders) > self.cache_size and checked < len(self._orders):
+            oldest = next(iter(self._orders))
+            checked += 1
+            if oldest in self._subscribers or oldest in self._pending:
+                self._orders.move_to_end(oldest)
+            else:
+                del self._orders[oldest]
+                self.stats["evictions"] += 1
+
+    # ------------------------------------------------------------------
+    # 백엔드 스트림
+    # ------------------------------------------------------------------
+
+    async def _listen(self):
+        backoff = 1.0
+        while True:
+            headers = {"Last-Event-ID": self._last_event_id} if self._last_event_id else {}
+            try:
+                async with self._http.stream("GET", "/api/orders/stream", headers=headers) as resp:
+                    resp.raise_for_status()
+                    if self._last_event_id is None:
+                        # 처음 연결하기 전에 캐시된 값은 변경을 놓쳤을 수 있습니다.
+                        self._orders.clear()
+                        self._resets += 1
+                    self.connected = True
+                    backoff = 1.0
+                    event, data = "message", []
+                    async for line in resp.aiter_lines():
+                        if line.startswith("id:"):
+                            self._last_event_id = line[3:].strip()
+                        elif line.startswith("event:"):
+                            event = line[6:].strip()
+                        elif line.startswith("data:"):
+                            data.append(line[5:].strip())
+                        elif not line:
+                            if data:
+                                await self._handle(event, json.loads("\n".join(data)))
+                            event, data = "message", []
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("주문 상태 스트림 연결 끊김: %s", e)
+            self.connected = False
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, DELIVERY_STREAM_MAX_BACKOFF)
+
+    async def _handle(self, event: str, order: dict):
+        if event == "reset":
+            # 놓친 변경을 다시 받을 수 없으므로 캐시를 비우고, 구독자에게는 다시 읽도록 알립니다.
+            self._orders.clear()
+            self._resets += 1
+            for order_id in list(self._subscribers):
+                await self._notify(order_id)
+            return
+        if event != "status":
+            return
+        order_id = order["order_id"]
+        self.stats["events"] += 1
+        # 관심 있는 주문(캐시됨, 구독 중, 조회 중)만 캐시합니다. (다른 주문은 조회될 때 가져옴)
+        if order_id in self._orders or order_id in self._subscribers or order_id in self._pending:
+            self._remember(order_id, order)
+        await self._notify(order_id)
+
+    async def _notify(self, order_id: str):
+        uri = AnyUrl(DELIVERY_URI.format(order_id=order_id))
+        for session in list(self._subscribers.get(order_id, ())):
+            try:
+                await session.send_resource_updated(uri)
+                self.stats["notifications"] += 1
+            except Exception:
+                # 연결이 끊긴 세션
+                self.unsubscribe(order_id, session)
+
+
+delivery_feed = DeliveryFeed(BASE_URL)
+
+
 @mcp.tool()
-def track_delivery(order_id: str) -> Dict:
+async def track_delivery(order_id: str) -> Dict:
     """
     주문번호(order_id)로 배송 상태를 조회하는 MCP 툴.
-    내부적으로는 백엔드 API /api/order/{order_id}를 호출한다.
+    백엔드 상태 스트림으로 받은 최신 상태가 있으면 그것을, 없으면 백엔드 API /api/order/{order_id}를 호출한다.
+    상태가 바뀔 때 알림을 받으려면 리소스 delivery://{order_id}를 구독한다.
     """
+    return await delivery_feed.status(order_id)
+
+
+@mcp.resource(DELIVERY_URI, mime_type="application/json")
+async def delivery_status(order_id: str) -> str:
+    """주문의 현재 배송 상태. 구독하면 상태가 바뀔 때마다 resources/updated 알림을 보낸다."""
+    return json.dumps(await delivery_feed.status(order_id), ensure_ascii=False)
+
+
+def _order_id(uri: AnyUrl) -> str:
+    prefix = DELIVERY_URI.split("{")[0]
+    if not str(uri).startswith(prefix):
+        raise ValueError(f"구독할 수 없는 리소스입니다: {uri}")
+    return str(uri)[len(prefix):]
+
+
+@mcp._mcp_server.subscribe_resource()
+async def subscribe_delivery(uri: AnyUrl):
+    delivery_feed.subscribe(_order_id(uri), mcp._mcp_server.request_context.session)
+
+
+@mcp._mcp_server.unsubscribe_resource()
+async def unsubscribe_delivery(uri: AnyUrl):
+    delivery_feed.unsubscribe(_order_id(uri), mcp._mcp_server.request_context.session)
+
+
+# mcp 1.x의 저수준 Server.get_capabilities는 구독 핸들러가 있어도 resources.subscribe를 false로 알리므로
+# 바로잡습니다. 비공개 속성(_mcp_server)을 바꾸는 것이므로 mcp 1.x(1.16에서 확인)에서만 적용하고,
+# 다른 버전에서는 경고만 남깁니다. (이미 true로 알리는 버전이면 그대로 둠)
+MCP_SUBSCRIBE_PATCH_MAJOR = 1
+
+
+def _mcp_major_version() -> Optional[int]:
     try:
-        resp = requests.get(f"{BASE_URL}/api/order/{order_id}", timeout=10)
-        resp.raise_for_status()
-        return resp.json()
-    except requests.RequestException as e:
-        raise RuntimeError(f"배송조회 API 호출 실패: {e}") from e
+        return int(importlib.metadata.version("mcp").split(".")[0])
+    except (importlib.metadata.PackageNotFoundError, ValueError):
+        return None
+
+
+def _patch_subscribe_capability():
+    server = getattr(mcp, "_mcp_server", None)
+    original = getattr(server, "get_capabilities", None)
+    major = _mcp_major_version()
+    if major != MCP_SUBSCRIBE_PATCH_MAJOR or original is None:
+        logger.warning("mcp %s에서는 resources.subscribe 보정을 건너뜁니다. 클라이언트가 구독 지원을 알지 못할 수 있습니다.", major)
+        return
+
+    def get_capabilities_with_subscribe(*args, **kwargs):
+        capabilities = original(*args, **kwargs)
+        if capabilities.resources is not None and not capabilities.resources.subscribe:
+            capabilities.resources.subscribe = True
+        return capabilities
+
+    server.get_capabilities = get_capabilities_with_subscribe
+
+
+_patch_subscribe_capability()
 
 
 # HTTP(SSE)로도 쓸 수 있게 앱 노출 (원하면)
+# 여러 클라이언트가 붙어도 백엔드 상태 스트림은 프로세스당 하나만 엽니다.
 app = mcp.sse_app()
 
 if __name__ == "__main__":
@@ -5,9 +5,12 @@ import json
 import asyncio
 import requests
 import os
-from typing import Any, Dict, List
+import time
+from typing import Any, Dict, List, Set
 from openai import OpenAI
 
+from intent_router import STOCK_RULES, IntentRouter
+
 from dotenv import load_dotenv
 load_dotenv()  # .env 파일 내용 환경변수로 로드
 
@@ -23,12 +26,20 @@ MODEL_NAME = "gpt-5-mini-2025-08-07" # 또는 gpt-4, gpt-3.5-turbo 등
 
 
 # === MCP 클라이언트 객체 정의 ===
+ACCOUNT_PASSWORD = "1234"
 transport = StreamableHttpTransport(
     url="http://localhost:8888/mcp/",
-    headers={"X-Account-Password": "1234"}
+    headers={"X-Account-Password": ACCOUNT_PASSWORD}
 )
 mcp_client = Client(transport)
 
+# 계좌 인증 인자는 LLM이 아니라 클라이언트가 채웁니다. (load_tools가 이 인자를 받는 도구를 기록)
+ACCOUNT_ARGS = {"X-Account-Password": ACCOUNT_PASSWORD}
+account_tools: Set[str] = set()
+
+# === 로컬 의도 라우터 (도구와 인자가 분명한 요청은 LLM 없이 바로 처리) ===
+router = IntentRouter(STOCK_RULES)
+
 # === MCP에서 도구 스펙 받아와서 Function calling 포맷으로 변환 ===
 async def load_tools(client: Client) -> List[Dict[str, Any]]:
     tools = await client.list_tools()
@@ -38,6 +49,9 @@ async def load_tools(client: Client) -> List[Dict[str, Any]]:
         props = schema.get("properties", {})
         if not props:
             continue
+        if any(k in props for k in ACCOUNT_ARGS):
+            account_tools.add(tool.name)
+            props = {k: p for k, p in props.items() if k not in ACCOUNT_ARGS}
         tools_spec.append({
             "type": "function",
             "function": {
@@ -51,7 +65,7 @@ async def load_tools(client: Client) -> List[Dict[str, Any]]:
                             "description": p.get("description", "")
                         } for k, p in props.items()
                     },
-                    "required": schema.get("required", [])
+                    "required": [k for k in schema.get("required", []) if k in props]
                 },
             },
         })
@@ -76,8 +90,79 @@ def call_llm(messages: List[Dict[str, Any]], tools_spec=None, tool_choice="auto"
 
 # === MCP 도구 실행 ===
 async def call_mcp_tool(client: Client, name: str, args: Dict[str, Any]) -> Any:
+    if name in account_tools:
+        # 모델이 만든 인자가 계좌 인증 값을 덮어쓰지 못하도록 마지막에 넣습니다.
+        args = {**args, **ACCOUNT_ARGS}
     return await client.call_tool(name, args)
 
+# === LLM 경로: 도구 선택과 최종 답변에 LLM을 두 번 호출 ===
+async def answer_with_llm(client: Client, tools_spec, system_prompt: Dict[str, Any], user_input: str):
+    user_msg = {"role": "user", "content": user_input}
+    
+    try:
+        first_resp = call_llm([system_prompt, user_msg], tools_spec=tools_spec, tool_choice="auto")
+    except Exception as e:
+        print("\nLLM 호출 실패:", str(e))
+        return
+
+    assistant_msg = first_resp.choices[0].message
+    tool_calls = assistant_msg.tool_calls or []
+
+    if not tool_calls:
+        print("\n모델 답변:", assistant_msg.content or "")
+        return
+
+    tool_call = tool_calls[0]
+    func_name = tool_call.function.name
+    func_args_str = tool_call.function.arguments
+    func_args = json.loads(func_args_str) if isinstance(func_args_str, str) else func_args_str
+    call_id = tool_call.id
+
+    try:
+        tool_result = await call_mcp_tool(client, func_name, func_args)
+    except Exception as err:
+        print("\nMCP 도구 실행 실패:", err)
+        return
+
+
+    tool_response_prompt = {
+        "role": "system",
+        "content": (
+            "아래 tool 결과를 기반으로 간결하게 최종 답변을 작성하세요. "
+            "'available_cash'는 현재 남은 현금 잔고, 'portfolio'는 종목별 보유 수량과 평균 단가입니다. "
+            "수치는 단위와 함께 명확하게 표현하세요. (예: 3주, 1,000원)\n"
+            "금액 해석 시 숫자의 자릿수를 기준으로 정확히 구분하세요."
+        ),
+    }
+
+    # tool_call 객체를 딕셔너리로 변환
+    tool_call_dict = {
+        "id": tool_call.id,
+        "type": "function",
+        "function": {
+            "name": func_name,
+            "arguments": func_args_str
+        }
+    }
+    
+    try:
+        second_resp = call_llm(
+            [
+                tool_response_prompt,
+                user_msg,
+                {"role": "assistant", "content": None, "tool_calls": [tool_call_dict]},
+                {
+                    "role": "tool",
+                    "tool_call_id": call_id,
+                    "name": func_name,
+                    "content": json.dumps(tool_result.structured_content, ensure_ascii=False),
+                },
+            ]
+        )
+        print("\n모델 답변:", second_resp.choices[0].message.content)
+    except Exception as e:
+        print("\nLLM 호출 실패:", str(e))
+
 # === main loop ===
 async def main():
     async with mcp_client as client:
@@ -87,6 +172,7 @@ async def main():
             "content": (
                 "당신은 사용자 주식 거래를 돕는 AI 어시스턴트입니다. "
                 "매수·매도, 잔고 조회, 거래 내역 조회, 주가 조회를 처리하고 결과를 수치로 명확히 안내하세요. "
+                "이동평균·변동성·RSI·낙폭 같은 지표는 analyze_ticker 도구로 여러 종목을 한 번에 조회하세요. "
                 "잔고·수량 부족 등 거래가 불가능하면 이유를 숫자와 함께 설명하세요."
             ),
         }
@@ -94,74 +180,26 @@ async def main():
         while True:
             user_input = input("\n사용자 요청을 입력하세요: ")
             if user_input.lower() in {"exit", "quit", "종료"}:
+                print("\n" + router.stats.report())
                 print("\n대화를 종료합니다.")
                 break
 
-            user_msg = {"role": "user", "content": user_input}
-            
-            try:
-                first_resp = call_llm([system_prompt, user_msg], tools_spec=tools_spec, tool_choice="auto")
-            except Exception as e:
-                print("\nLLM 호출 실패:", str(e))
-                continue
-
-            assistant_msg = first_resp.choices[0].message
-            tool_calls = assistant_msg.tool_calls or []
-
-            if not tool_calls:
-                print("\n모델 답변:", assistant_msg.content or "")
+            started = time.perf_counter()
+            route = router.route(user_input)
+            if route is not None:
+                try:
+                    tool_result = await call_mcp_tool(client, route.tool, route.args)
+                    answer = route.render(tool_result.structured_content)
+                except Exception as err:
+                    answer = f"요청을 처리하지 못했습니다: {err}"
+                router.record("routed", started)
+                print(f"\n모델 답변: {answer}")
+                print(f"(로컬 처리: {route.tool}, {(time.perf_counter() - started) * 1000:.0f}ms)")
                 continue
 
-            tool_call = tool_calls[0]
-            func_name = tool_call.function.name
-            func_args_str = tool_call.function.arguments
-            func_args = json.loads(func_args_str) if isinstance(func_args_str, str) else func_args_str
-            call_id = tool_call.id
+            await answer_with_llm(client, tools_spec, system_prompt, user_input)
+            router.record("fallback", started)
 
-            try:
-                tool_result = await call_mcp_tool(client, func_name, func_args)
-            except Exception as err:
-                print("\nMCP 도구 실행 실패:", err)
-                continue
-
-
-            tool_response_prompt = {
-                "role": "system",
-                "content": (
-                    "아래 tool 결과를 기반으로 간결하게 최종 답변을 작성하세요. "
-                    "'available_cash'는 현재 남은 현금 잔고, 'portfolio'는 종목별 보유 수량과 평균 단가입니다. "
-                    "수치는 단위와 함께 명확하게 표현하세요. (예: 3주, 1,000원)\n"
-                    "금액 해석 시 숫자의 자릿수를 기준으로 정확히 구분하세요."
-                ),
-            }
-
-            # tool_call 객체를 딕셔너리로 변환
-            tool_call_dict = {
-                "id": tool_call.id,
-                "type": "function",
-                "function": {
-                    "name": func_name,
-                    "arguments": func_args_str
-                }
-            }
-            
-            try:
-                second_resp = call_llm(
-                    [
-                        tool_response_prompt,
-                        user_msg,
-                        {"role": "assistant", "content": None, "tool_calls": [tool_call_dict]},
-                        {
-                            "role": "tool",
-                            "tool_call_id": call_id,
-                            "name": func_name,
-                            "content": json.dumps(tool_result.structured_content, ensure_ascii=False),
-                        },
-                    ]
-                )
-                print("\n모델 답변:", second_resp.choices[0].message.content)
-            except Exception as e:
-                print("\nLLM 호출 실패:", str(e))
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -1,11 +1,34 @@
-from fastapi import FastAPI
+import json
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import StreamingResponse
 from fastmcp import FastMCP
+from fastmcp.server.openapi import MCPType, RouteMap
 
+from price_feed import get_quote, price_feed
 from stock_api import app as stock_api_app
+from stock_api import lifespan as stock_api_lifespan, parse_csv
+
+# SSE 연결 유지용 주석을 보내는 간격(초)
+SSE_KEEPALIVE_INTERVAL = 15
+
+# 행 수만큼 커지는 결과를 돌려주는 도구. MCP 서버와 클라이언트가 결과 전체를 출력 스키마로
+# 다시 검증하지 않도록 출력 스키마를 빼고 등록합니다. (응답 형태는 stock_api의 response_model이 보장)
+UNVALIDATED_OUTPUT_TOOLS = {"get_trade_history"}
+
+# MCP 도구로 노출하지 않는 API. 계좌 개설은 사용자가 직접 REST로 하고, LLM이 스스로 계좌를 만들 수 없게 합니다.
+EXCLUDED_ROUTES = [RouteMap(methods=["POST"], pattern=r"^/accounts$", mcp_type=MCPType.EXCLUDE)]
+
+
+def skip_output_validation(route, component):
+    """대량 결과 도구의 출력 스키마 제거 (FastMCP.from_fastapi의 mcp_component_fn)"""
+    if getattr(component, "name", None) in UNVALIDATED_OUTPUT_TOOLS:
+        component.output_schema = None
 
 def create_app() -> FastAPI:
     instructions = (
-        "이 MCP 서버는 주식 매수/매도, 잔고 조회, 거래 내역 조회, 시세 조회 기능을 제공합니다."
+        "이 MCP 서버는 주식 매수/매도, 잔고 조회, 거래 내역 조회, 시세 조회, 기술적 지표 분석 기능을 제공합니다."
     )
 
     # 1) 기존 FastAPI의 API 전체를 MCP 도구 세트로 래핑하고 MCP 서버 객체를 생성합니다.
@@ -13,6 +36,8 @@ def create_app() -> FastAPI:
         stock_api_app,
         name="Stock Trading MCP",
         instructions=instructions,
+        route_maps=EXCLUDED_ROUTES,
+        mcp_component_fn=skip_output_validation,
     )
 
     # 2) FastAPI API에 정의되지 않은 이외 도구를 @mcp.tool로 추가 등록합니다.(즉 API가 아닌 파이썬 개별 함수)
@@ -22,35 +47,66 @@ def create_app() -> FastAPI:
         description="특정 종목의 실시간 주가 또는 최근 종가를 반환합니다.",
     )
     async def get_price(ticker: str) -> dict:
-        """FinanceDataReader로 가장 최근 종가를 가져와 반환"""
-        import FinanceDataReader as fdr
-
-        df = fdr.DataReader(ticker)
-        latest = df.iloc[-1]
-        return {
-            "ticker": ticker,
-            "date": latest.name.strftime("%Y-%m-%d"),
-            "close": int(latest["Close"]),
-        }
+        """구독 중인 종목은 스트리밍 피드의 최신 시세를, 아니면 최근 며칠치 시세만 받아 종가를 반환.
+        시세 서버를 쓸 수 없으면 마지막으로 받은 시세를 `stale: true`로 표시해 반환"""
+        quote = price_feed.latest(ticker)
+        if quote is None:
+            quote = await get_quote(ticker)
+        if quote is None:
+            raise ValueError(f"종목 {ticker}에 대한 시장 데이터를 찾을 수 없습니다.")
+        return quote
 
     # 3) MCP JSON‑RPC 서브 앱 생성 (StreamableHttp 사용)
     mcp_app = mcp.streamable_http_app(path="/")
 
     # 4) 루트 FastAPI에 REST와 MCP를 마운트
+    # 마운트된 하위 앱의 lifespan은 실행되지 않으므로 MCP와 주문 매칭 엔진을 함께 시작합니다.
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        async with mcp_app.lifespan(app):
+            async with stock_api_lifespan(stock_api_app):
+                yield
+
     root_app = FastAPI(
         title="Stock Trading Service with MCP",
-        lifespan=mcp_app.lifespan,
+        lifespan=lifespan,
     )
 
     root_app.mount("/api", stock_api_app)
     root_app.mount("/mcp", mcp_app)
 
+    @root_app.get("/prices/stream", summary="실시간 시세 스트림 (SSE)")
+    async def stream_prices(
+        request: Request,
+        tickers: str = Query(..., description="쉼표로 구분한 종목 코드 (예: 005930,035420)"),
+    ):
+        """구독한 종목의 시세가 바뀔 때마다 `event: price` 이벤트를 보냅니다."""
+        subscription = price_feed.subscribe(parse_csv(tickers, "tickers"))
+
+        async def events():
+            try:
+                while not await request.is_disconnected():
+                    quote = await subscription.get(timeout=SSE_KEEPALIVE_INTERVAL)
+                    if quote is None:
+                        yield ": keep-alive\n\n"
+                        continue
+                    yield f"event: price\ndata: {json.dumps(quote, ensure_ascii=False)}\n\n"
+            finally:
+                subscription.close()
+
+        return StreamingResponse(
+            events(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache"},
+        )
+
     @root_app.get("/")
     async def root() -> dict:
         return {
             "message": "Stock Trading Service with MCP",
             "api": "/api",
             "mcp": "/mcp",
+            "prices": "/prices/stream?tickers=005930",
         }
 
     return root_app
@@ -0,0 +1,387 @@
+"""
+지정가/스톱 주문장
+종목별 주문장을 가격-시간 우선순위 힙으로 관리하고, 새 시세가 들어올 때마다 체결 조건을 만족한 주문을 꺼냅니다.
+
+- 지정가 매수: 시세 <= 지정가,  지정가 매도: 시세 >= 지정가
+- 스톱 매수:  시세 >= 스톱가,  스톱 매도:  시세 <= 스톱가
+체결가는 조건을 만족시킨 시세이며, 체결은 저장소에 묶어서(샤드당 한 트랜잭션) 반영합니다.
+
+미체결 주문은 스냅샷 + 저널 파일로 재시작 후에도 유지됩니다.
+체결 대상이 된 주문은 DB 반영 전에 저널에서 먼저 제거하므로, 장애 시 같은 주문이 두 번 체결되지 않습니다. (최대 한 번)
+DB 반영 자체가 실패한 주문은 최근 결과에 "failed"로 남깁니다.
+"""
+import asyncio
+import heapq
+import json
+import logging
+import os
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+
+from storage import TradeStore
+
+logger = logging.getLogger(__name__)
+
+ORDER_SIDES = ("buy", "sell")
+ORDER_TYPES = ("limit", "stop")
+
+
+@dataclass
+class Order:
+    order_id: int
+    account_id: int
+    ticker: str
+    name: str
+    side: str
+    order_type: str
+    qty: int
+    price: int  # 지정가 또는 스톱가
+    seq: int    # 접수 순서 (시간 우선순위)
+    created_at: str
+
+    def to_row(self) -> list:
+        return [self.order_id, self.account_id, self.ticker, self.name, self.side,
+                self.order_type, self.qty, self.price, self.seq, self.created_at]
+
+    @classmethod
+    def from_row(cls, row: list) -> "Order":
+        return cls(*row)
+
+    def to_dict(self) -> dict:
+        return {
+            "order_id": self.order_id,
+            "ticker": self.ticker,
+            "name": self.name,
+            "side": self.side,
+            "order_type": self.order_type,
+            "qty": self.qty,
+            "price": self.price,
+            "created_at": self.created_at,
+        }
+
+
+class TickerBook:
+    """한 종목의 주문장. 네 개의 힙에 (우선순위 키, 접수 순서, 주문 번호)를 넣습니다.
+
+    취소된 주문은 힙에서 바로 지우지 않고, 꺼낼 때 `live`에 없으면 건너뜁니다.
+    """
+
+    def __init__(self):
+        self.buy_limits: List[Tuple[int, int, int]] = []   # (-지정가, seq, id): 높은 매수가 우선
+        self.sell_limits: List[Tuple[int, int, int]] = []  # (지정가, seq, id): 낮은 매도가 우선
+        self.buy_stops: List[Tuple[int, int, int]] = []    # (스톱가, seq, id): 낮은 스톱가부터 발동
+        self.sell_stops: List[Tuple[int, int, int]] = []   # (-스톱가, seq, id): 높은 스톱가부터 발동
+        self.live: Dict[int, Order] = {}
+
+    def __len__(self) -> int:
+        return len(self.live)
+
+    def add(self, order: Order):
+        self.live[order.order_id] = order
+        entry_price = order.price
+        if order.order_type == "limit":
+            heap, key = (self.buy_limits, -entry_price) if order.side == "buy" else (self.sell_limits, entry_price)
+        else:
+            heap, key = (self.buy_stops, entry_price) if order.side == "buy" else (self.sell_stops, -entry_price)
+        heapq.heappush(heap, (key, order.seq, order.order_id))
+        self._compact(heap)
+
+    def remove(self, order_id: int) -> Optional[Order]:
+        return self.live.pop(order_id, None)
+
+    def match(self, price: int) -> List[Order]:
+        """시세 `price`에서 체결 조건을 만족한 주문을 우선순위대로 꺼냅니다. (매도 먼저, 그다음 매수)"""
+        triggered: List[Order] = []
+        self._pop_while(self.sell_stops, lambda key: -key >= price, triggered)
+        self._pop_while(self.sell_limits, lambda key: key <= price, triggered)
+        self._pop_while(self.buy_stops, lambda key: key <= price, triggered)
+        self._pop_while(self.buy_limits, lambda key: -key >= price, triggered)
+        return triggered
+
+    def _pop_while(self, heap: list, condition, out: List[Order]):
+        while heap and condition(heap[0][0]):
+            _, _, order_id = heapq.heappop(heap)
+            order = self.live.pop(order_id, None)
+            if order is not None:
+                out.append(order)
+
+    def _compact(self, heap: list):
+        # 취소된 항목이 절반을 넘으면 힙을 다시 만듭니다.
+        if len(heap) > 64 and len(heap) > 2 * len(self.live):
+            heap[:] = [entry for entry in heap if entry[2] in self.live]
+            heapq.heapify(heap)
+
+
+class OrderJournal:
+    """미체결 주문의 스냅샷 + 추가 전용 저널.
+
+    저널 한 줄은 ["a", 주문 행] (접수), ["x", 주문 번호] (취소·체결 대상 제거) 입니다.
+    저널이 `compact_every`줄을 넘으면 스냅샷을 새로 쓰고 저널을 비웁니다.
+    """
+
+    def __init__(self, directory: Path, compact_every: int = 10_000, fsync: bool = False):
+        self.directory = Path(directory)
+        self.snapshot_file = self.directory / "orders.snapshot.json"
+        self.journal_file = self.directory / "orders.journal"
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self._lines = 0
+        self._fp = None
+
+    def load(self) -> Tuple[int, Dict[int, Order]]:
+        """(다음 주문 번호, 미체결 주문)을 복원합니다."""
+        next_id, orders = 1, {}
+        if self.snapshot_file.exists():
+            snapshot = json.loads(self.snapshot_file.read_text(encoding="utf-8"))
+            next_id = snapshot["next_id"]
+            orders = {row[0]: Order.from_row(row) for row in snapshot["orders"]}
+        if self.journal_file.exists():
+            with open(self.journal_file, encoding="utf-8") as fp:
+                for line in fp:
+                    try:
+                        op, payload = json.loads(line)
+                    except ValueError:
+                        break  # 마지막 줄이 기록 도중 끊긴 경우
+                    if op == "a":
+                        order = Order.from_row(payload)
+                        orders[order.order_id] = order
+                        next_id = max(next_id, order.order_id + 1)
+                    else:
+                        orders.pop(payload, None)
+                    self._lines += 1
+        return next_id, orders
+
+    def record_add(self, order: Order):
+        self._write(["a", order.to_row()])
+
+    def record_remove(self, order_ids: Iterable[int]):
+        for order_id in order_ids:
+            self._write(["x", order_id], flush=False)
+        self._flush()
+
+    def needs_compaction(self) -> bool:
+        return self._lines >= self.compact_every
+
+    def write_snapshot(self, next_id: int, orders: Iterable[Order]):
+        """스냅샷을 원자적으로 교체하고 저널을 비웁니다."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = self.snapshot_file.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as fp:
+            json.dump({"next_id": next_id, "orders": [o.to_row() for o in orders]}, fp, ensure_ascii=False, separators=(",", ":"))
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(tmp, self.snapshot_file)
+        self.close()
+        self.journal_file.unlink(missing_ok=True)
+        self._lines = 0
+
+    def close(self):
+        if self._fp is not None:
+            self._fp.close()
+            self._fp = None
+
+    def _write(self, entry: list, flush: bool = True):
+        if self._fp is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._fp = open(self.journal_file, "a", encoding="utf-8")
+        self._fp.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._lines += 1
+        if flush:
+            self._flush()
+
+    def _flush(self):
+        if self._fp is None:
+            return
+        self._fp.flush()
+        if self.fsync:
+            os.fsync(self._fp.fileno())
+
+
+class OrderBookEngine:
+    """종목별 주문장과 매칭 엔진.
+
+    `feed`(price_feed.PriceFeed)에서 미체결 주문이 있는 종목의 시세를 받아 매칭하고,
+    체결은 `store.apply_trades`로 한꺼번에 반영합니다. `journal`이 없으면 메모리에만 보관합니다.
+    """
+
+    def __init__(self, store: Optional[TradeStore], feed=None, journal: Optional[OrderJournal] = None, history_size: int = 1000):
+        self.store = store
+        self.feed = feed
+        self.journal = journal
+        self.books: Dict[str, TickerBook] = {}
+        self.orders: Dict[int, Order] = {}
+        self.recent: Deque[dict] = deque(maxlen=history_size)
+        self._next_id = 1
+        self._seq = 0
+        self._subscription = None
+        self._task: Optional[asyncio.Task] = None
+        self._loaded = False
+
+    # --- 시작/종료 -------------------------------------------------------
+
+    def load(self):
+        """저널에서 미체결 주문을 복원합니다."""
+        if self._loaded or self.journal is None:
+            self._loaded = True
+            return
+        self._next_id, orders = self.journal.load()
+        for order in sorted(orders.values(), key=lambda o: o.seq):
+            self._insert(order)
+        self._seq = max((o.seq for o in orders.values()), default=0)
+        self._loaded = True
+
+    async def start(self):
+        self.load()
+        if self.feed is not None and self._task is None:
+            self._subscription = self.feed.subscribe(self.books, maxsize=0)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._subscription is not None:
+            self._subscription.close()
+            self._subscription = None
+        if self.journal is not None:
+            self.journal.write_snapshot(self._next_id, self.orders.values())
+            self.journal.close()
+
+    # --- 주문 접수/취소 ---------------------------------------------------
+
+    def place(self, account_id: int, ticker: str, name: str, side: str, order_type: str, qty: int, price: int) -> Order:
+        if side not in ORDER_SIDES:
+            raise ValueError(f"side는 {', '.join(ORDER_SIDES)} 중 하나여야 합니다.")
+        if order_type not in ORDER_TYPES:
+            raise ValueError(f"order_type은 {', '.join(ORDER_TYPES)} 중 하나여야 합니다.")
+        self.load()
+        self._seq += 1
+        order = Order(self._next_id, account_id, ticker, name, side, order_type, qty, price, self._seq,
+                      datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        self._next_id += 1
+        if self.journal is not None:
+            self.journal.record_add(order)
+        watched = ticker in self.books
+        self._insert(order)
+        # 이미 감시 중인 종목이면 시세가 바뀔 때까지 기다리지 않도록 마지막 시세로 바로 매칭을 예약합니다.
+        # (새로 구독한 종목은 피드가 마지막 시세를 보내 줌)
+        if watched and self._subscription is not None:
+            quote = self.feed.latest(ticker)
+            if quote is not None:
+                self._subscription.put(quote)
+        return order
+
+    def cancel(self, account_id: int, order_id: int) -> Optional[Order]:
+        """본인 계좌의 미체결 주문을 취소합니다. 없으면 None"""
+        order = self.orders.get(order_id)
+        if order is None or order.account_id != account_id:
+            return None
+        self._discard([order])
+        if self.journal is not None:
+            self.journal.record_remove([order_id])
+            self._maybe_compact()
+        return order
+
+    def open_orders(self, account_id: int) -> List[Order]:
+        return sorted((o for o in self.orders.values() if o.account_id == account_id), key=lambda o: o.seq)
+
+    def recent_results(self, account_id: int) -> List[dict]:
+        return [r for r in self.recent if r["account_id"] == account_id]
+
+    # --- 매칭 ------------------------------------------------------------
+
+    def match(self, prices: Dict[str, int]) -> List[Tuple[Order, int]]:
+        """종목별 새 시세로 체결 대상 주문을 꺼내 (주문, 체결가) 목록을 반환합니다. DB에는 반영하지 않습니다."""
+        triggered: List[Tuple[Order, int]] = []
+        for ticker, price in prices.items():
+            book = self.books.get(ticker)
+            if book is None:
+                continue
+            orders = book.match(price)
+            if not orders:
+                continue
+            for order in orders:
+                del self.orders[order.order_id]
+            if not book:
+                self._drop_book(ticker)
+            triggered.extend((order, price) for order in orders)
+        if triggered and self.journal is not None:
+            self.journal.record_remove(order.order_id for order, _ in triggered)
+            self._maybe_compact()
+        return triggered
+
+    async def on_prices(self, prices: Dict[str, int]) -> List[dict]:
+        """새 시세로 매칭하고 체결을 저장소에 반영합니다. 체결/거부/실패 결과 목록을 반환합니다."""
+        triggered = self.match(prices)
+        if not triggered:
+            return []
+        fills = [(o.side, o.account_id, o.ticker, o.name, o.qty, price) for o, price in triggered]
+        try:
+            outcomes = await self.store.apply_trades(fills)
+            status = "rejected"
+        except Exception as e:
+            # 주문장과 저널에서 이미 빠진 주문이므로, 결과에라도 남겨 사용자가 확인할 수 있게 합니다.
+            logger.exception("체결 반영 실패 (주문 %d건)", len(triggered))
+            outcomes = [(False, e)] * len(triggered)
+            status = "failed"
+        results = []
+        for (order, price), (ok, value) in zip(triggered, outcomes):
+            result = {
+                **order.to_dict(),
+                "account_id": order.account_id,
+                "status": "filled" if ok else status,
+                "fill_price": price if ok else None,
+                "detail": value["message"] if ok else getattr(value, "detail", str(value)),
+            }
+            self.recent.append(result)
+            results.append(result)
+        return results
+
+    async def _run(self):
+        while True:
+            quote = await self._subscription.get()
+            prices = {quote["ticker"]: quote["close"]}
+            # 쌓여 있는 시세를 모두 모아 한 번에 매칭·반영합니다.
+            while not self._subscription.queue.empty():
+                quote = self._subscription.queue.get_nowait()
+                prices[quote["ticker"]] = quote["close"]
+            try:
+                await self.on_prices(prices)
+            except Exception:
+                logger.exception("주문 매칭 실패")
+
+    # --- 내부 ------------------------------------------------------------
+
+    def _insert(self, order: Order):
+        self.orders[order.order_id] = order
+        book = self.books.get(order.ticker)
+        if book is None:
+            book = self.books[order.ticker] = TickerBook()
+            if self._subscription is not None:
+                self._subscription.add(order.ticker)
+        book.add(order)
+
+    def _discard(self, orders: List[Order]):
+        for order in orders:
+            self.orders.pop(order.order_id, None)
+            book = self.books.get(order.ticker)
+            if book is not None:
+                book.remove(order.order_id)
+                if not book:
+                    self._drop_book(order.ticker)
+
+    def _drop_book(self, ticker: str):
+        del self.books[ticker]
+        if self._subscription is not None:
+            self._subscription.discard(ticker)
+
+    def _maybe_compact(self):
+        if self.journal.needs_compaction():
+            self.journal.write_snapshot(self._next_id, self.orders.values())
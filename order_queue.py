@@ -0,0 +1,144 @@
+"""
+주문 그룹 커밋(group commit) 큐
+여러 주문을 모아 한 트랜잭션으로 커밋해, 주문마다 발생하던 커밋/fsync 비용을 나눠 냅니다.
+"""
+import asyncio
+import sqlite3
+from typing import Any, Callable, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+# 큐에 들어가는 작업: 열린 연결을 받아 주문 하나를 반영하고 결과를 돌려주는 함수
+OrderJob = Callable[[sqlite3.Connection], Any]
+
+
+def apply_jobs(conn: sqlite3.Connection, jobs: List[OrderJob]) -> List[Tuple[bool, Any]]:
+    """작업들을 한 트랜잭션 안에서 각자의 SAVEPOINT로 실행하고 커밋합니다.
+
+    실패한 작업만 되돌리며, 작업별 (성공 여부, 결과 또는 예외)를 순서대로 반환합니다.
+    커밋이 실패하면 전체를 롤백하고 예외를 그대로 올립니다.
+    """
+    outcomes = []
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for job in jobs:
+            conn.execute("SAVEPOINT order_job")
+            try:
+                result = job(conn)
+            except Exception as e:
+                conn.execute("ROLLBACK TO SAVEPOINT order_job")
+                conn.execute("RELEASE SAVEPOINT order_job")
+                outcomes.append((False, e))
+            else:
+                conn.execute("RELEASE SAVEPOINT order_job")
+                outcomes.append((True, result))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return outcomes
+
+
+class OrderIngestQueue:
+    """단일 writer 태스크가 주문을 마이크로 배치로 적용하는 인메모리 큐.
+
+    배치 안의 주문은 들어온 순서대로 각자의 SAVEPOINT 안에서 실행됩니다.
+    한 주문이 실패하면 그 주문만 되돌리고 나머지는 같은 트랜잭션으로 커밋되며,
+    호출자는 자신의 결과 또는 예외를 받습니다.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], sqlite3.Connection],
+        max_batch_size: int = 64,
+        max_wait: float = 0.002,
+    ):
+        self._connect = connect
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def submit(self, job: OrderJob) -> Any:
+        """주문을 큐에 넣고, 해당 주문이 커밋되면 그 결과를 반환합니다."""
+        self._ensure_writer()
+        future = self._loop.create_future()
+        await self._queue.put((job, future))
+        return await future
+
+    async def close(self):
+        """writer 태스크를 멈추고 연결을 닫습니다. 이미 큐에 들어온 주문은 먼저 반영합니다.
+
+        닫은 뒤에 주문이 들어오면 writer와 연결을 다시 만듭니다.
+        """
+        if self._task is not None and not self._task.done():
+            if self._loop is asyncio.get_running_loop():
+                await self._queue.put(None)  # 종료 표시
+                await self._task
+            else:
+                self._task.cancel()
+        self._task = None
+        self._reset_connection()
+
+    def _ensure_writer(self):
+        # writer 태스크는 처음 주문이 들어올 때 현재 이벤트 루프에서 시작합니다.
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._writer())
+
+    async def _writer(self):
+        closing = False
+        while not closing:
+            item = await self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = self._loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - self._loop.time()
+                if timeout <= 0:
+                    # 기다리지 않고 이미 쌓여 있는 주문만 더 가져옵니다.
+                    if self._queue.empty():
+                        break
+                    item = self._queue.get_nowait()
+                else:
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    # 종료 표시: 지금까지 모은 배치만 반영하고 끝냅니다.
+                    closing = True
+                    break
+                batch.append(item)
+
+            try:
+                outcomes = await run_in_threadpool(self._apply_batch, [job for job, _ in batch])
+            except Exception as e:
+                # 커밋 자체가 실패하면 배치의 모든 주문이 반영되지 않았습니다.
+                self._reset_connection()
+                outcomes = [(False, e)] * len(batch)
+
+            for (_, future), (ok, value) in zip(batch, outcomes):
+                if future.done():
+                    continue
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
+
+    def _apply_batch(self, jobs: List[OrderJob]) -> List[Tuple[bool, Any]]:
+        if self._conn is None:
+            self._conn = self._connect()
+        return apply_jobs(self._conn, jobs)
+
+    def _reset_connection(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            finally:
+                self._conn = None
@@ -0,0 +1,170 @@
+"""
+실시간 시세 스트리밍
+구독 중인 종목을 공유 스케줄로 한 번씩만 조회하고, 결과를 모든 구독자에게 나눠 보냅니다.
+업스트림(FinanceDataReader) 호출 수는 구독자 수가 아니라 서로 다른 종목 수에 비례합니다.
+"""
+import asyncio
+import os
+from collections import defaultdict
+from datetime import date, timedelta
+from functools import partial
+from typing import Dict, Iterable, Optional, Set
+
+from upstream import UpstreamUnavailable, is_outage, price_guard
+
+# 시세 갱신 주기(초)
+PRICE_POLL_INTERVAL = float(os.getenv("PRICE_POLL_INTERVAL", "5"))
+
+# 최근 종가만 필요하므로 전체 이력 대신 최근 며칠치만 받아옵니다. (주말·연휴 포함 여유분)
+RECENT_DAYS = 14
+
+
+def fetch_latest_quote(ticker: str) -> Optional[dict]:
+    """가장 최근 종가를 조회합니다. 데이터가 없으면(없는 종목, 빈·깨진 응답) None"""
+    import FinanceDataReader as fdr
+
+    try:
+        df = fdr.DataReader(ticker, date.today() - timedelta(days=RECENT_DAYS))
+        if df.empty:
+            return None
+        latest = df.iloc[-1]
+        return {
+            "ticker": ticker,
+            "date": latest.name.strftime("%Y-%m-%d"),
+            "close": int(latest["Close"]),
+        }
+    except Exception as e:
+        if is_outage(e):
+            raise
+        return None
+
+
+# 종목별로 마지막으로 받은 시세. 업스트림을 쓸 수 없을 때 stale 표시와 함께 돌려줍니다.
+_last_quotes: Dict[str, dict] = {}
+
+
+async def get_quote(ticker: str, allow_stale: bool = True) -> Optional[dict]:
+    """업스트림 보호 장치를 거쳐 최근 종가를 조회합니다. 데이터가 없으면 None
+
+    업스트림을 쓸 수 없으면(브레이커 열림, 부하 차단, 타임아웃, 업스트림 장애) 마지막으로 받은 시세에
+    `"stale": True`를 붙여 반환합니다. 받은 적이 없거나 allow_stale=False면 UpstreamUnavailable(503)을 올립니다.
+    """
+    try:
+        quote = await price_guard.call(fetch_latest_quote, ticker)
+    except UpstreamUnavailable:
+        cached = _last_quotes.get(ticker)
+        if not allow_stale or cached is None:
+            raise
+        return {**cached, "stale": True}
+    if quote is not None:
+        _last_quotes[ticker] = quote
+    return quote
+
+
+class PriceSubscription:
+    """구독자 한 명의 수신함. 느린 구독자 때문에 폴링이 막히지 않도록 오래된 시세부터 버립니다."""
+
+    def __init__(self, feed: "PriceFeed", tickers: Set[str], maxsize: int = 100):
+        self.feed = feed
+        self.tickers = tickers
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    def put(self, quote: dict):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(quote)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """다음 시세. timeout 안에 없으면 None"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def add(self, ticker: str):
+        """구독 종목 추가"""
+        if ticker not in self.tickers:
+            self.tickers.add(ticker)
+            self.feed._attach(self, ticker)
+
+    def discard(self, ticker: str):
+        """구독 종목 해제"""
+        if ticker in self.tickers:
+            self.tickers.discard(ticker)
+            self.feed._detach(self, ticker)
+
+    def close(self):
+        self.feed.unsubscribe(self)
+
+
+class PriceFeed:
+    """종목별 구독자 목록과 공유 폴링 태스크를 관리합니다."""
+
+    def __init__(self, interval: float = PRICE_POLL_INTERVAL, fetch=None):
+        self.interval = interval
+        # 기본값은 업스트림 보호 장치를 거치는 조회 (브레이커가 열려 있으면 그 회차는 건너뜀)
+        self._fetch = fetch or partial(get_quote, allow_stale=False)
+        self._subscribers: Dict[str, Set[PriceSubscription]] = defaultdict(set)
+        self._latest: Dict[str, dict] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def tickers(self) -> Set[str]:
+        return set(self._subscribers)
+
+    def latest(self, ticker: str) -> Optional[dict]:
+        """마지막으로 받은 시세 (구독 중인 종목만)"""
+        return self._latest.get(ticker)
+
+    def subscribe(self, tickers: Iterable[str], maxsize: int = 100) -> PriceSubscription:
+        """종목 시세를 구독합니다. maxsize=0이면 수신함 크기 제한 없음"""
+        subscription = PriceSubscription(self, set(tickers), maxsize=maxsize)
+        for ticker in subscription.tickers:
+            self._attach(subscription, ticker)
+        return subscription
+
+    def unsubscribe(self, subscription: PriceSubscription):
+        for ticker in subscription.tickers:
+            self._detach(subscription, ticker)
+
+    def _attach(self, subscription: PriceSubscription, ticker: str):
+        self._subscribers[ticker].add(subscription)
+        # 이미 받은 시세가 있으면 바로 보내 줍니다.
+        if ticker in self._latest:
+            subscription.put(self._latest[ticker])
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._poll())
+
+    def _detach(self, subscription: PriceSubscription, ticker: str):
+        subscribers = self._subscribers.get(ticker)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[ticker]
+            self._latest.pop(ticker, None)
+        if not self._subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _poll(self):
+        while self._subscribers:
+            tickers = list(self._subscribers)
+            results = await asyncio.gather(
+                *(self._fetch(ticker) for ticker in tickers),
+                return_exceptions=True,
+            )
+            for ticker, quote in zip(tickers, results):
+                if isinstance(quote, BaseException) or quote is None:
+                    continue
+                # 값이 바뀐 경우에만 전달
+                if self._latest.get(ticker) == quote or ticker not in self._subscribers:
+                    continue
+                self._latest[ticker] = quote
+                for subscription in list(self._subscribers[ticker]):
+                    subscription.put(quote)
+            await asyncio.sleep(self.interval)
+
+
+# 프로세스 전체에서 공유하는 시세 피드 (SSE 구독자와 주문 매칭 엔진이 함께 사용)
+price_feed = PriceFeed()
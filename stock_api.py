@@ -1,31 +1,189 @@
 import FinanceDataReader as fdr
 from fastapi import FastAPI, HTTPException, Query, Header, Depends
 from pydantic import BaseModel, Field
-from datetime import date, datetime
-from typing import Optional, Dict, List
+from datetime import date, datetime, timedelta
+from typing import Optional, Dict, List, Literal
 from typing import Any
-import sqlite3
+import asyncio
+import hmac
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from pathlib import Path
-from contextlib import contextmanager
 
-app = FastAPI(title="Stock Trading API", version="1.0.0")
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson이 없으면 표준 json으로 인코딩합니다.
+    orjson = None
+
+from backtest import SIZING_RULES, run_backtest
+from indicators import summarize
+from market_data import load_history
+from order_book import OrderBookEngine, OrderJournal
+from price_feed import get_quote, price_feed
+from storage import MySQLTradeStore, SQLiteTradeStore, TradeStore, check_password
+from trade_archive import run_retention
+from upstream import UpstreamUnavailable, listing_guard, upstream_status
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """지정가/스톱 주문 매칭 엔진과 거래 내역 보존 작업을 시작하고, 종료 시 미체결 주문 스냅샷을 남기고 저장소를 닫습니다."""
+    await order_engine.start()
+    retention = None
+    if TRADE_RETENTION_DAYS > 0:
+        retention = asyncio.create_task(run_retention(store, TRADE_RETENTION_DAYS, TRADE_ARCHIVE_INTERVAL_HOURS * 3600))
+    try:
+        yield
+    finally:
+        if retention is not None:
+            retention.cancel()
+            try:
+                await retention
+            except asyncio.CancelledError:
+                pass
+        try:
+            await order_engine.stop()
+        finally:
+            await store.close()
+
+
+app = FastAPI(title="Stock Trading API", version="1.0.0", lifespan=lifespan)
+
+# 저장소 백엔드: "sqlite"(기본) 또는 "mysql"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlite")
+
+# SQLite 데이터베이스 파일 경로 (샤드 0)
+DB_FILE = Path(os.getenv("STOCK_DB_FILE", Path(__file__).parent / "stock_trading.db"))
+
+# 계좌를 나눠 담을 SQLite 파일 수. 배포 후에는 바꾸면 안 됩니다(계좌 → 샤드 매핑이 달라짐).
+DB_SHARD_COUNT = max(1, int(os.getenv("DB_SHARD_COUNT", "1")))
+
+# 주문 반영 방식: "sync"는 주문마다 커밋, "batch"는 큐에 모아 한 트랜잭션으로 그룹 커밋
+ORDER_INGEST_MODE = os.getenv("ORDER_INGEST_MODE", "sync")
+ORDER_BATCH_MAX_SIZE = int(os.getenv("ORDER_BATCH_MAX_SIZE", "64"))
+ORDER_BATCH_MAX_WAIT_MS = float(os.getenv("ORDER_BATCH_MAX_WAIT_MS", "2"))
+
+# MySQL 연결 설정 (STORAGE_BACKEND=mysql 일 때 사용, 기본값은 init_database.py와 동일)
+MYSQL_CONFIG = {
+    "host": os.getenv("MYSQL_HOST", "localhost"),
+    "user": os.getenv("MYSQL_USER", "root"),
+    "password": os.getenv("MYSQL_PASSWORD", ""),
+    "port": int(os.getenv("MYSQL_PORT", "3306")),
+    "db": os.getenv("MYSQL_DB", "stock_trading"),
+    "charset": "utf8mb4",
+}
+MYSQL_POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", "10"))
+
+# 미체결 지정가/스톱 주문 스냅샷·저널 위치
+ORDER_BOOK_DIR = Path(os.getenv("ORDER_BOOK_DIR", Path(__file__).parent / "order_book"))
+ORDER_JOURNAL_FSYNC = os.getenv("ORDER_JOURNAL_FSYNC", "0") == "1"
+
+# 거래 내역 보존 기간(일). 이보다 오래된 거래는 월별 압축 파일로 옮깁니다. (0이면 옮기지 않음)
+TRADE_RETENTION_DAYS = int(os.getenv("TRADE_RETENTION_DAYS", "0"))
+TRADE_ARCHIVE_INTERVAL_HOURS = float(os.getenv("TRADE_ARCHIVE_INTERVAL_HOURS", "24"))
+# 아카이브 위치 (기본: SQLite는 DB 파일 옆 stock_trading_archive/, MySQL은 trade_archive/)
+TRADE_ARCHIVE_DIR = os.getenv("TRADE_ARCHIVE_DIR")
+
+# 행이 많은 응답을 response_model 검증 없이 바로 JSON으로 인코딩 (0이면 FastAPI 기본 경로)
+API_FAST_JSON = os.getenv("API_FAST_JSON", "1") == "1"
+
+# KRX 종목 목록(종목명 조회용) 캐시 유지 시간(초)
+KRX_LISTING_TTL = float(os.getenv("KRX_LISTING_TTL", "3600"))
+
+# 간단한 비밀번호 설정 (계좌별 비밀번호가 없을 때 사용하는 기본값)
+ACCOUNT_PASSWORD = "1234"
 
-# SQLite 데이터베이스 파일 경로
-DB_FILE = Path(__file__).parent / "stock_trading.db"
+# 신규 계좌 기본 입금액
+DEFAULT_CASH_BALANCE = 10_000_000
 
-# 간단한 비밀번호 설정
-ACCOUNT_PASSWORD = "1234"
+# 비밀번호 확인 결과를 기억해 둘 계좌 수. 요청마다 느린 해시(PBKDF2)를 다시 계산하지 않기 위함
+PASSWORD_CACHE_SIZE = int(os.getenv("PASSWORD_CACHE_SIZE", "10000"))
 
-# DB 연결 관리
-@contextmanager
-def get_db():
-    """SQLite 연결을 관리하는 컨텍스트 매니저"""
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row  # 딕셔너리처럼 접근 가능
-    try:
-        yield conn
-    finally:
-        conn.close()
+
+def create_store() -> TradeStore:
+    """환경변수 설정에 맞는 저장소를 생성합니다."""
+    if STORAGE_BACKEND == "mysql":
+        return MySQLTradeStore(MYSQL_CONFIG, pool_size=MYSQL_POOL_SIZE, archive_dir=TRADE_ARCHIVE_DIR)
+    if STORAGE_BACKEND != "sqlite":
+        raise ValueError(f"지원하지 않는 STORAGE_BACKEND: {STORAGE_BACKEND}")
+    return SQLiteTradeStore(
+        DB_FILE,
+        shard_count=DB_SHARD_COUNT,
+        ingest_mode=ORDER_INGEST_MODE,
+        batch_max_size=ORDER_BATCH_MAX_SIZE,
+        batch_max_wait=ORDER_BATCH_MAX_WAIT_MS / 1000,
+        archive_dir=TRADE_ARCHIVE_DIR,
+    )
+
+
+store = create_store()
+order_engine = OrderBookEngine(store, price_feed, OrderJournal(ORDER_BOOK_DIR, fsync=ORDER_JOURNAL_FSYNC))
+
+
+class FastJSONResponse(JSONResponse):
+    """orjson으로 인코딩하는 JSON 응답"""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content)
+
+
+def fast_response(content: Any):
+    """직접 만든 dict/list를 response_model 검증과 jsonable_encoder 없이 바로 인코딩해 반환합니다.
+
+    내용은 이미 response_model과 같은 형태의 JSON 기본 타입이어야 합니다.
+    API_FAST_JSON=0이면 그대로 반환해 FastAPI가 검증·직렬화합니다.
+    """
+    return FastJSONResponse(content) if API_FAST_JSON else content
+
+
+# (계좌 번호, 저장된 해시) → 확인에 성공한 비밀번호의 HMAC. 키는 프로세스마다 새로 만들므로 밖으로 새지 않습니다.
+_verified_passwords: "OrderedDict[tuple, bytes]" = OrderedDict()
+_password_cache_key = os.urandom(32)
+
+
+async def verify_password(account_id: int, password: str, stored: Optional[str]):
+    """계좌 비밀번호를 저장된 해시(`stored`)와 확인합니다. 계좌별 비밀번호가 없으면 기본 비밀번호와 비교합니다.
+
+    저장된 해시와 한 번 맞춰 본 비밀번호는 HMAC으로 기억해, 같은 비밀번호로 오는 다음 요청은 해시를 다시 계산하지 않습니다.
+    """
+    if stored is None:
+        ok = hmac.compare_digest(password.encode(), ACCOUNT_PASSWORD.encode())
+    else:
+        key = (account_id, stored)
+        digest = hmac.new(_password_cache_key, password.encode(), "sha256").digest()
+        cached = _verified_passwords.get(key)
+        if cached is not None:
+            ok = hmac.compare_digest(cached, digest)
+        else:
+            ok = await run_in_threadpool(check_password, password, stored)
+            if ok:
+                _verified_passwords[key] = digest
+                if len(_verified_passwords) > PASSWORD_CACHE_SIZE:
+                    _verified_passwords.popitem(last=False)
+    if not ok:
+        raise HTTPException(status_code=401, detail="잘못된 비밀번호입니다.")
+
+
+async def get_account_id(
+    account_id: int = Header(1, alias="X-Account-Id", ge=1, description="계좌 번호"),
+    password: str = Header(..., alias="X-Account-Password", description="계좌 비밀번호"),
+) -> int:
+    """요청 헤더 `X-Account-Id`의 계좌가 존재하고 `X-Account-Password`가 맞는지 확인한 뒤 계좌 번호를 반환합니다.
+
+    계좌를 다루는 모든 엔드포인트가 이 의존성을 사용합니다.
+    """
+    account = await store.get_account(account_id)
+    if account is None:
+        raise HTTPException(status_code=404, detail=f"계좌 {account_id}을(를) 찾을 수 없습니다.")
+    await verify_password(account_id, password, account[0])
+    return account_id
 
 class PortfolioItem(BaseModel):
     """보유 종목 정보"""
@@ -58,9 +216,12 @@ class TradeHistoryItem(BaseModel):
     avg_price: Optional[int] = Field(None, description="거래 후 평균 단가")
     datetime: str = Field(..., description="거래 시각 (YYYY-MM-DD HH:MM:SS)")
 
-def get_market_price(ticker: str) -> int:
+
+async def get_market_price(ticker: str) -> int:
     """주어진 종목 코드의 가장 최근 종가를 조회합니다.
 
+    거래에 쓰는 가격이므로 업스트림을 쓸 수 없을 때 예전 시세로 대신하지 않습니다.
+
     Args:
         ticker: 종목 코드
 
@@ -68,212 +229,292 @@ def get_market_price(ticker: str) -> int:
         int: 최근 종가
 
     Raises:
-        HTTPException: 종목 데이터가 없는 경우
+        HTTPException: 종목 데이터가 없는 경우 (404), 시세 서버를 쓸 수 없는 경우 (503, Retry-After)
     """
-    df = fdr.DataReader(ticker)
-    if df.empty:
+    quote = await get_quote(ticker, allow_stale=False)
+    if quote is None:
         raise HTTPException(status_code=404, detail=f"종목 {ticker}에 대한 시장 데이터를 찾을 수 없습니다.")
-    return int(df['Close'].iloc[-1])
+    return quote["close"]
 
 
-def get_corp_name(ticker: str) -> str:
-    """종목 코드를 종목명으로 변환합니다. 못 찾으면 그대로 코드 반환."""
+# (받은 시각, 종목 코드 → 종목명)
+_corp_names: Optional[tuple] = None
+
+
+def _load_corp_names() -> Dict[str, str]:
     krx = fdr.StockListing("KRX")
-    match = krx.loc[krx['Code'] == ticker, 'Name']
-    return match.values[0] if not match.empty else ticker
+    return dict(zip(krx['Code'], krx['Name']))
+
+
+async def get_corp_name(ticker: str) -> str:
+    """종목 코드를 종목명으로 변환합니다. 못 찾으면 그대로 코드 반환.
+
+    KRX 종목 목록은 KRX_LISTING_TTL 동안 캐시하고, 목록 서버를 쓸 수 없으면 예전 목록(없으면 코드)을 씁니다.
+    """
+    global _corp_names
+    if _corp_names is None or time.monotonic() - _corp_names[0] >= KRX_LISTING_TTL:
+        try:
+            _corp_names = (time.monotonic(), await listing_guard.call(_load_corp_names))
+        except Exception:
+            # 목록 서버 장애(UpstreamUnavailable)나 응답 형식 오류
+            if _corp_names is None:
+                return ticker
+    return _corp_names[1].get(ticker, ticker)
+
+
+class AccountCreateRequest(BaseModel):
+    """계좌 개설"""
+
+    account_name: str = Field("main", description="계좌 이름")
+    password: str = Field(..., min_length=1, description="계좌 비밀번호")
+
+
+@app.post("/accounts", summary="계좌 개설", operation_id="create_account", response_model=dict)
+async def create_account(request: AccountCreateRequest):
+    """새 계좌를 개설하고 계좌 번호를 반환합니다. 이후 요청은 `X-Account-Id` 헤더로 계좌를 지정합니다.
+
+    초기 현금 잔고는 DEFAULT_CASH_BALANCE로 고정입니다. (MCP 도구로는 노출하지 않음)
+    """
+    account_id = await store.create_account(request.account_name, request.password, DEFAULT_CASH_BALANCE)
+    return {"account_id": account_id, "available_cash": DEFAULT_CASH_BALANCE}
 
 
 @app.post("/buy", summary="종목 매수", operation_id="buy_stock", response_model=dict)
-async def buy_stock(trade: TradeRequest):
+async def buy_stock(trade: TradeRequest, account_id: int = Depends(get_account_id)):
     """주어진 종목을 지정한 수량만큼 매수합니다.
 
     요청 본문으로 종목 코드와 수량을 받으며, 현재 잔고가 부족하면 400 오류를 반환합니다.
     """
-    price = get_market_price(trade.ticker)
-    name = get_corp_name(trade.ticker)
-    cost = trade.qty * price
-
-    with get_db() as conn:
-        cursor = conn.cursor()
-        
-        # 현재 잔고 확인
-        cursor.execute("SELECT cash_balance FROM accounts WHERE account_id = 1")
-        row = cursor.fetchone()
-        cash_balance = row[0]
-        
-        if cost > cash_balance:
-            raise HTTPException(status_code=400, detail=f"잔고가 부족합니다. 현재 잔고는 {cash_balance:,}원이며, 총 {cost:,}원이 필요합니다.")
-        
-        # 잔고 업데이트
-        new_balance = cash_balance - int(cost)
-        cursor.execute("UPDATE accounts SET cash_balance = ?, updated_at = CURRENT_TIMESTAMP WHERE account_id = 1", (new_balance,))
-        
-        # 포트폴리오 확인 및 업데이트
-        cursor.execute("SELECT qty, avg_price FROM portfolio WHERE account_id = 1 AND ticker = ?", (trade.ticker,))
-        existing = cursor.fetchone()
-        
-        if existing:
-            existing_qty, existing_avg = existing[0], existing[1]
-            total_qty = existing_qty + trade.qty
-            avg_price = ((existing_qty * existing_avg) + cost) / total_qty
-            cursor.execute("""
-                UPDATE portfolio 
-                SET qty = ?, avg_price = ?, name = ?, updated_at = CURRENT_TIMESTAMP 
-                WHERE account_id = 1 AND ticker = ?
-            """, (total_qty, int(round(avg_price)), name, trade.ticker))
-        else:
-            total_qty = trade.qty
-            avg_price = price
-            cursor.execute("""
-                INSERT INTO portfolio (account_id, ticker, name, qty, avg_price)
-                VALUES (1, ?, ?, ?, ?)
-            """, (trade.ticker, name, trade.qty, int(round(price))))
-        
-        # 거래 내역 저장
-        cursor.execute("""
-            INSERT INTO trade_history (account_id, trade_type, ticker, name, qty, price, avg_price)
-            VALUES (1, 'buy', ?, ?, ?, ?, ?)
-        """, (trade.ticker, name, trade.qty, int(round(price)), int(round(avg_price))))
-        
-        conn.commit()
-
-    return {
-        "message": f"{name} {trade.qty}주 매수 완료 (시장가 {round(price, 2)}원)",
-        "available_cash": new_balance
-    }
+    price = await get_market_price(trade.ticker)
+    name = await get_corp_name(trade.ticker)
+    return await store.buy(account_id, trade.ticker, name, trade.qty, price)
 
 
 @app.post("/sell", summary="종목 매도", operation_id="sell_stock", response_model=dict)
-async def sell_stock(trade: TradeRequest):
+async def sell_stock(trade: TradeRequest, account_id: int = Depends(get_account_id)):
     """보유 종목을 지정한 수량만큼 매도합니다.
 
     보유 수량이 부족하면 400 오류를 반환합니다. 매도 후 잔여 수량이 0이면 포트폴리오에서 삭제합니다.
     """
-    price = get_market_price(trade.ticker)
-    name = get_corp_name(trade.ticker)
-    revenue = trade.qty * price
-    
-    with get_db() as conn:
-        cursor = conn.cursor()
-        
-        # 보유 수량 확인
-        cursor.execute("SELECT qty, avg_price FROM portfolio WHERE account_id = 1 AND ticker = ?", (trade.ticker,))
-        existing = cursor.fetchone()
-        
-        if not existing or existing[0] < trade.qty:
-            current_qty = existing[0] if existing else 0
-            raise HTTPException(status_code=400, detail=f"보유한 수량이 부족합니다. 현재 보유: {current_qty}주, 요청 수량: {trade.qty:,}주")
-        
-        current_qty, current_avg_price = existing[0], existing[1]
-        new_qty = current_qty - trade.qty
-        
-        # 잔고 업데이트
-        cursor.execute("UPDATE accounts SET cash_balance = cash_balance + ?, updated_at = CURRENT_TIMESTAMP WHERE account_id = 1", (int(revenue),))
-        
-        # 포트폴리오 업데이트
-        if new_qty == 0:
-            cursor.execute("DELETE FROM portfolio WHERE account_id = 1 AND ticker = ?", (trade.ticker,))
-        else:
-            cursor.execute("""
-                UPDATE portfolio 
-                SET qty = ?, updated_at = CURRENT_TIMESTAMP 
-                WHERE account_id = 1 AND ticker = ?
-            """, (new_qty, trade.ticker))
-        
-        # 거래 내역 저장
-        cursor.execute("""
-            INSERT INTO trade_history (account_id, trade_type, ticker, name, qty, price, avg_price)
-            VALUES (1, 'sell', ?, ?, ?, ?, ?)
-        """, (trade.ticker, name, trade.qty, int(round(price)), int(round(current_avg_price))))
-        
-        # 업데이트된 잔고 조회
-        cursor.execute("SELECT cash_balance FROM accounts WHERE account_id = 1")
-        new_balance = cursor.fetchone()[0]
-        
-        conn.commit()
-
-    return {
-        "message": f"{name} {trade.qty}주 매도 완료 (시장가 {round(price, 2)}원)",
-        "available_cash": new_balance
-    }
+    price = await get_market_price(trade.ticker)
+    name = await get_corp_name(trade.ticker)
+    return await store.sell(account_id, trade.ticker, name, trade.qty, price)
 
 
 @app.get("/balance", summary="잔고 조회", operation_id="get_balance", response_model=BalanceResponse)
-async def get_balance(password: str = Header(..., alias="X-Account-Password")):
+async def get_balance(account_id: int = Depends(get_account_id)):
     """현재 보유 현금과 포트폴리오를 반환합니다.
 
     요청 시 HTTP 헤더의 `X-Account-Password` 값을 통해 비밀번호를 전달받습니다.
     """
-    if password != ACCOUNT_PASSWORD:
-        raise HTTPException(status_code=401, detail="잘못된 비밀번호입니다.")
+    cash_balance, rows = await store.get_balance(account_id)
+
+    portfolio_dict = {
+        ticker: {"qty": qty, "name": name, "avg_price": avg_price}
+        for ticker, name, qty, avg_price in rows
+    }
 
-    with get_db() as conn:
-        cursor = conn.cursor()
-        
-        # 현재 잔고 조회
-        cursor.execute("SELECT cash_balance FROM accounts WHERE account_id = 1")
-        cash_balance = cursor.fetchone()[0]
-        
-        # 포트폴리오 조회
-        cursor.execute("SELECT ticker, name, qty, avg_price FROM portfolio WHERE account_id = 1")
-        rows = cursor.fetchall()
-        
-        portfolio_dict = {}
-        for row in rows:
-            ticker, name, qty, avg_price = row
-            portfolio_dict[ticker] = PortfolioItem(
-                qty=qty,
-                name=name,
-                avg_price=avg_price
-            )
-    
-    return {
+    return fast_response({
         "available_cash": cash_balance,
         "portfolio": portfolio_dict
-    }
+    })
 
 
 @app.get("/trades", summary="거래 내역 조회", operation_id="get_trade_history", response_model=List[TradeHistoryItem])
 async def get_trade_history(
     start_date: Optional[date] = Query(None, description="조회 시작일 (예: 2025-07-01)"),
-    end_date: Optional[date] = Query(None, description="조회 종료일 (예: 2025-07-28)")
+    end_date: Optional[date] = Query(None, description="조회 종료일 (예: 2025-07-28)"),
+    account_id: int = Depends(get_account_id),
+):
+    """지정 기간 동안의 거래 내역을 반환합니다. 보존 기간이 지나 아카이브된 거래도 포함합니다."""
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date는 end_date보다 이후일 수 없습니다.")
+
+    rows = await store.get_trades(account_id, start_date, end_date)
+
+    # 행마다 모델을 만들지 않고 저장소 튜플에서 바로 TradeHistoryItem과 같은 dict를 만듭니다.
+    return fast_response([
+        {"type": t, "name": n, "ticker": tk, "qty": q, "price": p, "avg_price": ap, "datetime": dt}
+        for t, tk, n, q, p, ap, dt in rows
+    ])
+
+
+@app.get("/trades/summary", summary="거래 집계 조회", operation_id="get_trade_summary", response_model=dict)
+async def get_trade_summary(
+    start_date: Optional[date] = Query(None, description="집계 시작일 (예: 2025-07-01, 기본: 30일 전)"),
+    end_date: Optional[date] = Query(None, description="집계 종료일 (예: 2025-07-28, 기본: 오늘)"),
+    group_by: Literal["ticker", "date", "date_ticker"] = Query("ticker", description="집계 단위: 종목(ticker), 일자(date), 일자·종목(date_ticker)"),
+    account_id: int = Depends(get_account_id),
+):
+    """기간 내 매수/매도 건수, 수량, 거래대금(원)을 종목 또는 일자별로 집계합니다.
+
+    거래 내역 전체 대신 일별 집계 테이블을 읽으므로 "지난달 거래 요약" 같은 질문에 적합합니다.
+    """
+    end_date = end_date or date.today()
+    start_date = start_date or end_date - timedelta(days=30)
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date는 end_date보다 이후일 수 없습니다.")
+
+    rows = await store.get_trade_summary(account_id, start_date, end_date, group_by)
+
+    items = []
+    totals = dict.fromkeys(("buy_count", "buy_qty", "buy_notional", "sell_count", "sell_qty", "sell_notional"), 0)
+    for trade_date, ticker, name, *sums in rows:
+        item = {}
+        if trade_date is not None:
+            item["date"] = trade_date
+        if ticker is not None:
+            item.update(ticker=ticker, name=name)
+        item.update(zip(totals, sums))
+        item["net_notional"] = item["sell_notional"] - item["buy_notional"]
+        items.append(item)
+        for key, value in zip(totals, sums):
+            totals[key] += value
+
+    totals["trade_count"] = totals["buy_count"] + totals["sell_count"]
+    totals["net_notional"] = totals["sell_notional"] - totals["buy_notional"]
+    return fast_response({
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "group_by": group_by,
+        "totals": totals,
+        "items": items,
+    })
+
+
+class OrderRequest(BaseModel):
+    """지정가/스톱 주문"""
+
+    ticker: str = Field(..., description="종목 코드 (예: 035420)")
+    side: Literal["buy", "sell"] = Field(..., description="매수(buy) 또는 매도(sell)")
+    order_type: Literal["limit", "stop"] = Field(..., description="지정가(limit) 또는 스톱(stop)")
+    qty: int = Field(..., gt=0, description="주문 수량")
+    price: int = Field(..., gt=0, description="지정가 또는 스톱 발동 가격(원)")
+
+
+@app.post("/orders", summary="지정가/스톱 주문", operation_id="place_order", response_model=dict)
+async def place_order(order: OrderRequest, account_id: int = Depends(get_account_id)):
+    """지정가 또는 스톱 주문을 접수합니다.
+
+    지정가 매수는 시세가 지정가 이하, 지정가 매도는 이상일 때, 스톱 매수는 시세가 스톱가 이상,
+    스톱 매도는 이하일 때 그 시세로 체결됩니다. 체결 시점에 잔고·보유 수량이 부족하면 거부됩니다.
+    """
+    name = await get_corp_name(order.ticker)
+    placed = order_engine.place(account_id, order.ticker, name, order.side, order.order_type, order.qty, order.price)
+    kind = ("지정가 " if order.order_type == "limit" else "스톱 ") + ("매수" if order.side == "buy" else "매도")
+    return {"message": f"{name} {order.qty}주 {kind} 주문 접수 (주문번호 {placed.order_id}, {order.price:,}원)", **placed.to_dict()}
+
+
+@app.get("/orders", summary="주문 조회", operation_id="list_orders", response_model=dict)
+async def list_orders(account_id: int = Depends(get_account_id)):
+    """미체결 주문과 최근 체결/거부/실패한 주문을 반환합니다."""
+    return fast_response({
+        "open": [o.to_dict() for o in order_engine.open_orders(account_id)],
+        "recent": order_engine.recent_results(account_id),
+    })
+
+
+@app.delete("/orders/{order_id}", summary="주문 취소", operation_id="cancel_order", response_model=dict)
+async def cancel_order(order_id: int, account_id: int = Depends(get_account_id)):
+    """미체결 주문을 취소합니다."""
+    order = order_engine.cancel(account_id, order_id)
+    if order is None:
+        raise HTTPException(status_code=404, detail=f"미체결 주문 {order_id}을(를) 찾을 수 없습니다.")
+    return {"message": f"주문번호 {order_id} 취소 완료", **order.to_dict()}
+
+
+def parse_csv(value: str, field: str) -> List[str]:
+    items = [item.strip() for item in value.split(",") if item.strip()]
+    if not items:
+        raise HTTPException(status_code=400, detail=f"{field} 값이 비어 있습니다.")
+    return items
+
+
+@app.get("/analyze", summary="기술적 지표 분석", operation_id="analyze_ticker", response_model=dict)
+async def analyze_ticker(
+    tickers: str = Query(..., description="쉼표로 구분한 종목 코드 (예: 005930,035420)"),
+    windows: str = Query("5,20,60", description="이동평균·수익률·변동성 기간(거래일), 쉼표로 구분"),
+    rsi_period: int = Query(14, ge=2, le=100, description="RSI 기간(거래일)"),
+    lookback_days: int = Query(365, ge=30, le=3650, description="조회할 과거 기간(일). 최대 낙폭 계산 범위"),
+):
+    """여러 종목의 이동평균, 수익률(%), 연율화 변동성(%), RSI, 최대 낙폭(%)을 한 번에 계산합니다.
+
+    원시 시세 대신 종목별 요약 수치만 반환합니다.
+    """
+    ticker_list = list(dict.fromkeys(parse_csv(tickers, "tickers")))
+    try:
+        window_list = sorted({int(w) for w in parse_csv(windows, "windows")})
+    except ValueError:
+        raise HTTPException(status_code=400, detail="windows는 쉼표로 구분한 정수여야 합니다. (예: 5,20,60)")
+    if window_list[0] < 1:
+        raise HTTPException(status_code=400, detail="windows 값은 1 이상이어야 합니다.")
+
+    frames = await asyncio.gather(
+        *(load_history(ticker, lookback_days) for ticker in ticker_list),
+        return_exceptions=True,
+    )
+    found, errors = [], {}
+    for ticker, df in zip(ticker_list, frames):
+        if isinstance(df, UpstreamUnavailable):
+            raise df
+        if isinstance(df, Exception) or df.empty:
+            errors[ticker] = "시장 데이터를 찾을 수 없습니다."
+        else:
+            found.append((ticker, df))
+
+    results = summarize([t for t, _ in found], [df for _, df in found], window_list, rsi_period) if found else {}
+    return {"windows": window_list, "results": results, "errors": errors}
+
+
+@app.get("/backtest", summary="거래 내역 백테스트", operation_id="backtest_trades", response_model=dict)
+async def backtest_trades(
+    start_date: Optional[date] = Query(None, description="재생할 거래 시작일 (예: 2024-01-01)"),
+    end_date: Optional[date] = Query(None, description="재생할 거래 종료일 (예: 2025-07-28)"),
+    sizing: str = Query("as_traded", description="주문 수량 규칙: as_traded(실제 수량), fixed_qty(매번 size주), fixed_notional(매번 size원어치)"),
+    size: float = Query(0, ge=0, description="fixed_qty의 주식 수 또는 fixed_notional의 금액(원)"),
+    initial_cash: int = Query(DEFAULT_CASH_BALANCE, gt=0, description="시작 현금(원)"),
+    account_id: int = Depends(get_account_id),
 ):
-    """지정 기간 동안의 거래 내역을 반환합니다."""
+    """과거 거래 내역의 매수/매도 시점을 주어진 수량 규칙으로 다시 실행해 수익률, 변동성, 최대 낙폭 등을 반환합니다."""
     if start_date and end_date and start_date > end_date:
         raise HTTPException(status_code=400, detail="start_date는 end_date보다 이후일 수 없습니다.")
+    if sizing not in SIZING_RULES:
+        raise HTTPException(status_code=400, detail=f"sizing은 {', '.join(SIZING_RULES)} 중 하나여야 합니다.")
+    if sizing != "as_traded" and size <= 0:
+        raise HTTPException(status_code=400, detail=f"sizing={sizing}에는 0보다 큰 size가 필요합니다.")
+
+    rows = await store.get_trades(account_id, start_date, end_date)
+    if not rows:
+        raise HTTPException(status_code=404, detail="해당 기간의 거래 내역이 없습니다.")
+    # (거래일시, 종목, 종류, 수량) 시간순
+    signals = [(row[6], row[1], row[0], row[3]) for row in reversed(rows)]
+
+    first_day = date.fromisoformat(signals[0][0][:10])
+    days = (date.today() - first_day).days + 1
+    tickers = list(dict.fromkeys(s[1] for s in signals))
+    frames = await asyncio.gather(
+        *(load_history(ticker, days) for ticker in tickers),
+        return_exceptions=True,
+    )
+    for df in frames:
+        if isinstance(df, UpstreamUnavailable):
+            raise df
+    prices = {
+        ticker: df["Close"]
+        for ticker, df in zip(tickers, frames)
+        if not isinstance(df, Exception) and not df.empty
+    }
+    if not prices:
+        raise HTTPException(status_code=404, detail="거래 종목의 시장 데이터를 찾을 수 없습니다.")
+
+    stats = await run_in_threadpool(run_backtest, signals, prices, initial_cash, sizing, size)
+    return {"sizing": sizing, "size": size, **stats}
+
 
-    with get_db() as conn:
-        cursor = conn.cursor()
-        
-        query = "SELECT trade_type, ticker, name, qty, price, avg_price, trade_datetime FROM trade_history WHERE account_id = 1"
-        params = []
-        
-        if start_date:
-            query += " AND DATE(trade_datetime) >= ?"
-            params.append(start_date.isoformat())
-        
-        if end_date:
-            query += " AND DATE(trade_datetime) <= ?"
-            params.append(end_date.isoformat())
-        
-        query += " ORDER BY trade_datetime DESC"
-        
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        
-        result = []
-        for row in rows:
-            result.append(TradeHistoryItem(
-                type=row[0],
-                ticker=row[1],
-                name=row[2],
-                qty=row[3],
-                price=row[4],
-                avg_price=row[5],
-                datetime=row[6]
-            ))
-    
-    return result
+@app.get("/health/upstreams", summary="시세 서버 상태", operation_id="get_upstream_status", response_model=dict)
+async def get_upstream_status():
+    """시세 데이터 서버별 서킷 브레이커 상태(closed, open, half_open), 동시 호출·대기 수, 누적 호출/실패/차단 건수를 반환합니다."""
+    return upstream_status()
 
 
 @app.get("/", summary="서비스 안내")
@@ -0,0 +1,815 @@
+"""
+거래 저장소
+매수/매도, 잔고, 거래 내역 엔드포인트가 사용하는 저장소 인터페이스와 구현체입니다.
+
+- SQLiteTradeStore: 기본값. 계좌별 샤드 파일, 계좌 잠금, 그룹 커밋 큐를 지원합니다.
+- MySQLTradeStore: aiomysql 커넥션 풀을 사용하는 비동기 구현. (init_database.py 스키마 사용)
+"""
+import asyncio
+import hashlib
+import hmac
+import os
+import sqlite3
+from collections import defaultdict
+from contextlib import AsyncExitStack, asynccontextmanager, contextmanager
+from datetime import date, datetime, timedelta
+from functools import partial
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from init_sqlite_db import create_tables
+from order_queue import OrderIngestQueue, apply_jobs
+from trade_archive import ARCHIVE_COLUMNS, TradeArchive, merge_trades
+
+# (ticker, name, qty, avg_price)
+PortfolioRow = Tuple[str, Optional[str], int, int]
+# (trade_type, ticker, name, qty, price, avg_price, trade_datetime)
+TradeRow = Tuple[str, str, Optional[str], int, int, Optional[int], str]
+# (trade_type, account_id, ticker, name, qty, price)
+TradeFill = Tuple[str, int, str, str, int, int]
+# (password 해시 또는 None,)
+AccountRow = Tuple[Optional[str]]
+
+
+def weighted_avg_price(held_qty: int, held_avg: float, qty: int, price: float) -> float:
+    """추가 매수 후의 평균 단가 (기존 보유분과 신규 매수분의 가중 평균)"""
+    return ((held_qty * held_avg) + qty * price) / (held_qty + qty)
+
+
+# 계좌 비밀번호 해시 (PBKDF2-SHA256). 반복 횟수는 해시 문자열에 함께 저장하므로 바꿔도 기존 계좌에 영향이 없습니다.
+PASSWORD_HASH_ITERATIONS = 100_000
+
+
+def hash_password(password: str) -> str:
+    """비밀번호를 "pbkdf2_sha256$반복 횟수$솔트$해시" 문자열로 만듭니다. (저장용)"""
+    salt = os.urandom(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, PASSWORD_HASH_ITERATIONS)
+    return f"pbkdf2_sha256${PASSWORD_HASH_ITERATIONS}${salt.hex()}${digest.hex()}"
+
+
+def check_password(password: str, stored: str) -> bool:
+    """hash_password로 만든 값과 비밀번호가 일치하는지 상수 시간에 비교합니다."""
+    try:
+        algorithm, iterations, salt, digest = stored.split("$")
+    except ValueError:
+        return False
+    if algorithm != "pbkdf2_sha256":
+        return False
+    computed = hashlib.pbkdf2_hmac("sha256", password.encode(), bytes.fromhex(salt), int(iterations))
+    return hmac.compare_digest(computed, bytes.fromhex(digest))
+
+
+def insufficient_cash(cash_balance: int, cost: int) -> HTTPException:
+    return HTTPException(status_code=400, detail=f"잔고가 부족합니다. 현재 잔고는 {cash_balance:,}원이며, 총 {cost:,}원이 필요합니다.")
+
+
+def insufficient_qty(current_qty: int, qty: int) -> HTTPException:
+    return HTTPException(status_code=400, detail=f"보유한 수량이 부족합니다. 현재 보유: {current_qty}주, 요청 수량: {qty:,}주")
+
+
+def trade_result(trade_type: str, name: str, qty: int, price: int, available_cash: int) -> dict:
+    action = "매수" if trade_type == "buy" else "매도"
+    return {
+        "message": f"{name} {qty}주 {action} 완료 (시장가 {round(price, 2)}원)",
+        "available_cash": available_cash
+    }
+
+
+ROLLUP_GROUPS = ("ticker", "date", "date_ticker")
+
+# trade_daily_rollup에 거래 한 건을 더하는 UPSERT (SQLite / MySQL)
+_ROLLUP_UPSERT_SQLITE = """
+    INSERT INTO trade_daily_rollup (account_id, trade_date, ticker, name,
+        buy_count, buy_qty, buy_notional, sell_count, sell_qty, sell_notional)
+    VALUES (?, DATE('now'), ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(account_id, trade_date, ticker) DO UPDATE SET
+        name = excluded.name,
+        buy_count = buy_count + excluded.buy_count,
+        buy_qty = buy_qty + excluded.buy_qty,
+        buy_notional = buy_notional + excluded.buy_notional,
+        sell_count = sell_count + excluded.sell_count,
+        sell_qty = sell_qty + excluded.sell_qty,
+        sell_notional = sell_notional + excluded.sell_notional
+"""
+_ROLLUP_UPSERT_MYSQL = """
+    INSERT INTO trade_daily_rollup (account_id, trade_date, ticker, name,
+        buy_count, buy_qty, buy_notional, sell_count, sell_qty, sell_notional)
+    VALUES (%s, CURRENT_DATE, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        name = VALUES(name),
+        buy_count = buy_count + VALUES(buy_count),
+        buy_qty = buy_qty + VALUES(buy_qty),
+        buy_notional = buy_notional + VALUES(buy_notional),
+        sell_count = sell_count + VALUES(sell_count),
+        sell_qty = sell_qty + VALUES(sell_qty),
+        sell_notional = sell_notional + VALUES(sell_notional)
+"""
+
+
+def rollup_params(account_id: int, trade_type: str, ticker: str, name: str, qty: int, price: int) -> tuple:
+    notional = qty * int(round(price))
+    if trade_type == "buy":
+        return (account_id, ticker, name, 1, qty, notional, 0, 0, 0)
+    return (account_id, ticker, name, 0, 0, 0, 1, qty, notional)
+
+
+def rollup_summary_query(group_by: str, placeholder: str) -> str:
+    """trade_daily_rollup 기간 집계 쿼리.
+
+    결과 행: (trade_date, ticker, name, buy_count, buy_qty, buy_notional, sell_count, sell_qty, sell_notional)
+    묶지 않는 컬럼은 NULL입니다.
+    """
+    by_date = group_by in ("date", "date_ticker")
+    by_ticker = group_by in ("ticker", "date_ticker")
+    keys = [k for k, used in (("trade_date", by_date), ("ticker", by_ticker)) if used]
+    return f"""
+        SELECT {"trade_date" if by_date else "NULL"}, {"ticker" if by_ticker else "NULL"},
+            {"MAX(name)" if by_ticker else "NULL"},
+            SUM(buy_count), SUM(buy_qty), SUM(buy_notional),
+            SUM(sell_count), SUM(sell_qty), SUM(sell_notional)
+        FROM trade_daily_rollup
+        WHERE account_id = {placeholder} AND trade_date >= {placeholder} AND trade_date <= {placeholder}
+        GROUP BY {", ".join(keys)}
+        ORDER BY {"trade_date, " if by_date else ""}SUM(buy_notional) + SUM(sell_notional) DESC
+    """
+
+
+def month_range(oldest: str, before: date) -> Tuple[str, str]:
+    """`oldest` 거래가 속한 달의 [시작, 끝) 구간. 끝은 `before`를 넘지 않습니다."""
+    year, month = int(oldest[:4]), int(oldest[5:7])
+    next_month = date(year + month // 12, month % 12 + 1, 1)
+    return date(year, month, 1).isoformat(), min(next_month, before).isoformat()
+
+
+class TradeStore:
+    """거래 저장소 인터페이스"""
+
+    async def get_account(self, account_id: int) -> Optional[AccountRow]:
+        """계좌 인증 정보 (계좌별 비밀번호 해시, 설정되지 않았으면 None). 계좌가 없으면 None"""
+        raise NotImplementedError
+
+    async def create_account(self, account_name: str, password: str, cash_balance: int) -> int:
+        """계좌를 만들고 번호를 반환합니다. 비밀번호는 해시로 저장합니다."""
+        raise NotImplementedError
+
+    async def buy(self, account_id: int, ticker: str, name: str, qty: int, price: int) -> dict:
+        """매수를 반영하고 {"message", "available_cash"}를 반환합니다. 잔고 부족 시 HTTPException(400)"""
+        raise NotImplementedError
+
+    async def sell(self, account_id: int, ticker: str, name: str, qty: int, price: int) -> dict:
+        """매도를 반영하고 {"message", "available_cash"}를 반환합니다. 수량 부족 시 HTTPException(400)"""
+        raise NotImplementedError
+
+    async def apply_trades(self, fills: List[TradeFill]) -> List[Tuple[bool, Any]]:
+        """여러 체결을 순서대로 반영합니다. 체결별 (성공 여부, 결과 또는 예외)를 반환합니다.
+
+        기본 구현은 한 건씩 buy/sell을 호출합니다.
+        """
+        outcomes = []
+        for trade_type, account_id, ticker, name, qty, price in fills:
+            method = self.buy if trade_type == "buy" else self.sell
+            try:
+                outcomes.append((True, await method(account_id, ticker, name, qty, price)))
+            except HTTPException as e:
+                outcomes.append((False, e))
+        return outcomes
+
+    async def get_balance(self, account_id: int) -> Tuple[int, List[PortfolioRow]]:
+        """(현금 잔고, 보유 종목 목록)"""
+        raise NotImplementedError
+
+    async def get_trades(self, account_id: int, start_date: Optional[date], end_date: Optional[date]) -> List[TradeRow]:
+        """기간 내 거래 내역 (최신순)"""
+        raise NotImplementedError
+
+    async def get_trade_summary(self, account_id: int, start_date: date, end_date: date, group_by: str) -> List[tuple]:
+        """trade_daily_rollup에서 기간 내 거래 집계를 `group_by`(ticker, date, date_ticker)별로 반환합니다."""
+        raise NotImplementedError
+
+    async def archive_trades(self, before: date) -> Dict[str, int]:
+        """`before` 이전 거래를 월별 아카이브 파일로 옮기고 trade_history에서 지웁니다. 월별 이동 건수를 반환합니다."""
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+# ---------------------------------------------------------------------------
+# SQLite
+# ---------------------------------------------------------------------------
+
+def execute_buy(conn: sqlite3.Connection, account_id: int, ticker: str, name: str, qty: int, price: int) -> dict:
+    """열린 쓰기 트랜잭션 안에서 매수를 반영합니다. 커밋은 호출한 쪽에서 합니다.
+
+    Raises:
+        HTTPException: 잔고가 부족한 경우
+    """
+    cost = qty * price
+    cursor = conn.cursor()
+
+    # 현재 잔고 확인
+    cursor.execute("SELECT cash_balance FROM accounts WHERE account_id = ?", (account_id,))
+    row = cursor.fetchone()
+    cash_balance = row[0]
+
+    if cost > cash_balance:
+        raise insufficient_cash(cash_balance, cost)
+
+    # 잔고 업데이트
+    new_balance = cash_balance - int(cost)
+    cursor.execute("UPDATE accounts SET cash_balance = ?, updated_at = CURRENT_TIMESTAMP WHERE account_id = ?", (new_balance, account_id))
+
+    # 포트폴리오 확인 및 업데이트
+    cursor.execute("SELECT qty, avg_price FROM portfolio WHERE account_id = ? AND ticker = ?", (account_id, ticker))
+    existing = cursor.fetchone()
+
+    if existing:
+        existing_qty, existing_avg = existing[0], existing[1]
+        total_qty = existing_qty + qty
+        avg_price = weighted_avg_price(existing_qty, existing_avg, qty, price)
+        cursor.execute("""
+            UPDATE portfolio
+            SET qty = ?, avg_price = ?, name = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE account_id = ? AND ticker = ?
+        """, (total_qty, int(round(avg_price)), name, account_id, ticker))
+    else:
+        avg_price = price
+        cursor.execute("""
+            INSERT INTO portfolio (account_id, ticker, name, qty, avg_price)
+            VALUES (?, ?, ?, ?, ?)
+        """, (account_id, ticker, name, qty, int(round(price))))
+
+    # 거래 내역 저장
+    cursor.execute("""
+        INSERT INTO trade_history (account_id, trade_type, ticker, name, qty, price, avg_price)
+        VALUES (?, 'buy', ?, ?, ?, ?, ?)
+    """, (account_id, ticker, name, qty, int(round(price)), int(round(avg_price))))
+    cursor.execute(_ROLLUP_UPSERT_SQLITE, rollup_params(account_id, "buy", ticker, name, qty, price))
+
+    return trade_result("buy", name, qty, price, new_balance)
+
+
+def execute_sell(conn: sqlite3.Connection, account_id: int, ticker: str, name: str, qty: int, price: int) -> dict:
+    """열린 쓰기 트랜잭션 안에서 매도를 반영합니다. 커밋은 호출한 쪽에서 합니다.
+
+    Raises:
+        HTTPException: 보유 수량이 부족한 경우
+    """
+    revenue = qty * price
+    cursor = conn.cursor()
+
+    # 보유 수량 확인
+    cursor.execute("SELECT qty, avg_price FROM portfolio WHERE account_id = ? AND ticker = ?", (account_id, ticker))
+    existing = cursor.fetchone()
+
+    if not existing or existing[0] < qty:
+        raise insufficient_qty(existing[0] if existing else 0, qty)
+
+    current_qty, current_avg_price = existing[0], existing[1]
+    new_qty = current_qty - qty
+
+    # 잔고 업데이트
+    cursor.execute("UPDATE accounts SET cash_balance = cash_balance + ?, updated_at = CURRENT_TIMESTAMP WHERE account_id = ?", (int(revenue), account_id))
+
+    # 포트폴리오 업데이트
+    if new_qty == 0:
+        cursor.execute("DELETE FROM portfolio WHERE account_id = ? AND ticker = ?", (account_id, ticker))
+    else:
+        cursor.execute("""
+            UPDATE portfolio
+            SET qty = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE account_id = ? AND ticker = ?
+        """, (new_qty, account_id, ticker))
+
+    # 거래 내역 저장
+    cursor.execute("""
+        INSERT INTO trade_history (account_id, trade_type, ticker, name, qty, price, avg_price)
+        VALUES (?, 'sell', ?, ?, ?, ?, ?)
+    """, (account_id, ticker, name, qty, int(round(price)), int(round(current_avg_price))))
+    cursor.execute(_ROLLUP_UPSERT_SQLITE, rollup_params(account_id, "sell", ticker, name, qty, price))
+
+    # 업데이트된 잔고 조회
+    cursor.execute("SELECT cash_balance FROM accounts WHERE account_id = ?", (account_id,))
+    new_balance = cursor.fetchone()[0]
+
+    return trade_result("sell", name, qty, price, new_balance)
+
+
+class SQLiteTradeStore(TradeStore):
+    """SQLite 저장소.
+
+    계좌는 `shard_count`개의 파일에 나눠 저장됩니다. (1번 계좌는 항상 `db_file`)
+    sync 모드에서는 계좌별 잠금 아래 주문마다 커밋하고, batch 모드에서는 샤드별 큐로 그룹 커밋합니다.
+    """
+
+    def __init__(
+        self,
+        db_file: Path,
+        shard_count: int = 1,
+        ingest_mode: str = "sync",
+        batch_max_size: int = 64,
+        batch_max_wait: float = 0.002,
+        archive_dir: Optional[Path] = None,
+    ):
+        self.db_file = Path(db_file)
+        self.shard_count = max(1, shard_count)
+        self.ingest_mode = ingest_mode
+        self.batch_max_size = batch_max_size
+        self.batch_max_wait = batch_max_wait
+        # 오래된 거래를 옮겨 둘 디렉터리 (기본: DB 파일 옆의 <이름>_archive/)
+        self.archive_dir = Path(archive_dir) if archive_dir else self.db_file.with_name(f"{self.db_file.stem}_archive")
+        self._archives: Dict[int, TradeArchive] = {}
+        # 계좌별 쓰기 잠금. 같은 계좌의 주문은 순서대로, 다른 계좌의 주문은 동시에 처리됩니다.
+        self._account_locks: Dict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._order_queues: Dict[int, OrderIngestQueue] = {}
+        self.ensure_schema()
+
+    def shard_index(self, account_id: int) -> int:
+        """계좌 번호가 속한 샤드 번호를 반환합니다. 1번 계좌는 항상 샤드 0입니다."""
+        return (account_id - 1) % self.shard_count
+
+    def shard_file(self, index: int) -> Path:
+        """샤드 번호에 해당하는 SQLite 파일 경로"""
+        if index == 0:
+            return self.db_file
+        return self.db_file.with_name(f"{self.db_file.stem}.shard{index}{self.db_file.suffix}")
+
+    def archive(self, index: int) -> TradeArchive:
+        """샤드의 거래 아카이브. 샤드 0은 archive_dir, 샤드 k는 archive_dir.shard{k}를 씁니다."""
+        if index not in self._archives:
+            directory = self.archive_dir if index == 0 else self.archive_dir.with_name(f"{self.archive_dir.name}.shard{index}")
+            self._archives[index] = TradeArchive(directory)
+        return self._archives[index]
+
+    def ensure_schema(self):
+        """모든 샤드 파일에 테이블이 있는지 확인하고, 없는 컬럼은 추가합니다."""
+        for index in range(self.shard_count):
+            conn = sqlite3.connect(self.shard_file(index))
+            try:
+                cursor = conn.cursor()
+                create_tables(cursor)
+                columns = {row[1] for row in cursor.execute("PRAGMA table_info(accounts)")}
+                if "password" not in columns:
+                    cursor.execute("ALTER TABLE accounts ADD COLUMN password TEXT")
+                conn.commit()
+                # 서로 다른 연결의 읽기와 쓰기가 막히지 않도록 WAL 모드 사용
+                cursor.execute("PRAGMA journal_mode=WAL")
+                conn.commit()
+            finally:
+                conn.close()
+
+    @contextmanager
+    def get_db(self, account_id: int = 1):
+        """계좌가 속한 샤드의 SQLite 연결을 관리하는 컨텍스트 매니저"""
+        conn = sqlite3.connect(self.shard_file(self.shard_index(account_id)), timeout=30)
+        conn.row_factory = sqlite3.Row  # 딕셔너리처럼 접근 가능
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def write_transaction(self, account_id: int):
+        """쓰기 트랜잭션. 시작 시점에 쓰기 잠금을 잡아 잔고 조회와 갱신 사이에 끼어들 수 없게 합니다."""
+        with self.get_db(account_id) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    @asynccontextmanager
+    async def account_lock(self, account_id: int):
+        async with self._account_locks[account_id]:
+            yield
+
+    def get_order_queue(self, index: int) -> OrderIngestQueue:
+        """샤드의 주문 큐를 반환합니다. 샤드마다 writer가 하나뿐이므로 주문은 큐 순서대로 반영됩니다."""
+        if index not in self._order_queues:
+            path = self.shard_file(index)
+            self._order_queues[index] = OrderIngestQueue(
+                lambda: sqlite3.connect(path, timeout=30, check_same_thread=False),
+                max_batch_size=self.batch_max_size,
+                max_wait=self.batch_max_wait,
+            )
+        return self._order_queues[index]
+
+    async def close(self):
+        """샤드별 주문 큐의 writer를 멈추고 연결을 닫습니다. (큐에 남은 주문은 먼저 반영)"""
+        await asyncio.gather(*(queue.close() for queue in self._order_queues.values()))
+
+    def _run_trade(self, executor, account_id: int, ticker: str, name: str, qty: int, price: int) -> dict:
+        with self.write_transaction(account_id) as conn:
+            return executor(conn, account_id, ticker, name, qty, price)
+
+    async def submit_trade(self, executor, account_id: int, ticker: str, name: str, qty: int, price: int) -> dict:
+        """거래를 실행합니다.
+
+        sync 모드에서는 계좌 잠금을 잡은 뒤 스레드 풀에서 주문마다 커밋하고,
+        batch 모드에서는 샤드의 주문 큐에 넣어 다른 주문과 함께 커밋합니다.
+        """
+        if self.ingest_mode == "batch":
+            queue = self.get_order_queue(self.shard_index(account_id))
+            return await queue.submit(partial(executor, account_id=account_id, ticker=ticker, name=name, qty=qty, price=price))
+
+        async with self.account_lock(account_id):
+            return await run_in_threadpool(self._run_trade, executor, account_id, ticker, name, qty, price)
+
+    async def buy(self, account_id: int, ticker: str, name: str, qty: int, price: int) -> dict:
+        return await self.submit_trade(execute_buy, account_id, ticker, name, qty, price)
+
+    async def sell(self, account_id: int, ticker: str, name: str, qty: int, price: int) -> dict:
+        return await self.submit_trade(execute_sell, account_id, ticker, name, qty, price)
+
+    def _apply_shard_trades(self, index: int, fills: List[TradeFill]) -> List[Tuple[bool, Any]]:
+        jobs = [
+            partial(execute_buy if trade_type == "buy" else execute_sell,
+                    account_id=account_id, ticker=ticker, name=name, qty=qty, price=price)
+            for trade_type, account_id, ticker, name, qty, price in fills
+        ]
+        conn = sqlite3.connect(self.shard_file(index), timeout=30)
+        try:
+            return apply_jobs(conn, jobs)
+        finally:
+            conn.close()
+
+    async def apply_trades(self, fills: List[TradeFill]) -> List[Tuple[bool, Any]]:
+        """체결을 샤드별로 묶어 샤드마다 한 트랜잭션으로 반영합니다."""
+        by_shard: Dict[int, List[int]] = defaultdict(list)
+        for position, fill in enumerate(fills):
+            by_shard[self.shard_index(fill[1])].append(position)
+
+        outcomes: List[Tuple[bool, Any]] = [None] * len(fills)
+
+        async def apply(index: int, positions: List[int]):
+            accounts = {fills[p][1] for p in positions}
+            # 같은 계좌의 개별 주문과 섞이지 않도록 관련 계좌 잠금을 번호순으로 잡습니다.
+            async with AsyncExitStack() as stack:
+                for account_id in sorted(accounts):
+                    await stack.enter_async_context(self.account_lock(account_id))
+                results = await run_in_threadpool(self._apply_shard_trades, index, [fills[p] for p in positions])
+            for p, outcome in zip(positions, results):
+                outcomes[p] = outcome
+
+        await asyncio.gather(*(apply(index, positions) for index, positions in by_shard.items()))
+        return outcomes
+
+    def _fetch_account(self, account_id: int) -> Optional[AccountRow]:
+        with self.get_db(account_id) as conn:
+            return conn.execute("SELECT password FROM accounts WHERE account_id = ?", (account_id,)).fetchone()
+
+    async def get_account(self, account_id: int) -> Optional[AccountRow]:
+        return await run_in_threadpool(self._fetch_account, account_id)
+
+    def _create_account(self, account_name: str, password: str, cash_balance: int) -> int:
+        # 해시 계산은 느리므로 쓰기 잠금을 잡기 전에 합니다.
+        password_hash = hash_password(password)
+        # 계좌 수가 가장 적은 샤드에 배정하고, 그 샤드에 속하는 다음 계좌 번호를 고릅니다.
+        counts = []
+        for index in range(self.shard_count):
+            with self.get_db(index + 1) as conn:
+                counts.append(conn.execute("SELECT COUNT(*) FROM accounts").fetchone()[0])
+        index = counts.index(min(counts))
+
+        with self.write_transaction(index + 1) as conn:
+            max_id = conn.execute("SELECT COALESCE(MAX(account_id), 0) FROM accounts").fetchone()[0]
+            account_id = max_id + 1
+            while self.shard_index(account_id) != index:
+                account_id += 1
+            conn.execute(
+                "INSERT INTO accounts (account_id, account_name, cash_balance, password) VALUES (?, ?, ?, ?)",
+                (account_id, account_name, cash_balance, password_hash),
+            )
+        return account_id
+
+    async def create_account(self, account_name: str, password: str, cash_balance: int) -> int:
+        return await run_in_threadpool(self._create_account, account_name, password, cash_balance)
+
+    def _get_balance(self, account_id: int) -> Tuple[int, List[PortfolioRow]]:
+        with self.get_db(account_id) as conn:
+            cursor = conn.cursor()
+
+            # 현재 잔고 조회
+            cursor.execute("SELECT cash_balance FROM accounts WHERE account_id = ?", (account_id,))
+            cash_balance = cursor.fetchone()[0]
+
+            # 포트폴리오 조회
+            cursor.execute("SELECT ticker, name, qty, avg_price FROM portfolio WHERE account_id = ?", (account_id,))
+            rows = [tuple(row) for row in cursor.fetchall()]
+        return cash_balance, rows
+
+    async def get_balance(self, account_id: int) -> Tuple[int, List[PortfolioRow]]:
+        return await run_in_threadpool(self._get_balance, account_id)
+
+    def _get_trades(self, account_id: int, start_date: Optional[date], end_date: Optional[date]) -> List[TradeRow]:
+        with self.get_db(account_id) as conn:
+            cursor = conn.cursor()
+
+            query = "SELECT id, trade_type, ticker, name, qty, price, avg_price, trade_datetime FROM trade_history WHERE account_id = ?"
+            params: List[Any] = [account_id]
+
+            # DATE(컬럼) 대신 범위 조건을 써서 (account_id, trade_datetime) 인덱스를 탈 수 있게 합니다.
+            if start_date:
+                query += " AND trade_datetime >= ?"
+                params.append(start_date.isoformat())
+
+            if end_date:
+                query += " AND trade_datetime < ?"
+                params.append((end_date + timedelta(days=1)).isoformat())
+
+            query += " ORDER BY trade_datetime DESC"
+
+            cursor.execute(query, params)
+            hot = cursor.fetchall()
+
+        rows = [tuple(row)[1:] for row in hot]
+        # 기간이 아카이브된 구간에 걸칠 때만 아카이브 파일을 엽니다.
+        archive = self.archive(self.shard_index(account_id))
+        archived_until = archive.archived_until()
+        if archived_until is None or (start_date and start_date.isoformat() > archived_until[:10]):
+            return rows
+        return merge_trades(rows, {row[0] for row in hot}, archive.read(account_id, start_date, end_date))
+
+    async def get_trades(self, account_id: int, start_date: Optional[date], end_date: Optional[date]) -> List[TradeRow]:
+        return await run_in_threadpool(self._get_trades, account_id, start_date, end_date)
+
+    def _get_trade_summary(self, account_id: int, start_date: date, end_date: date, group_by: str) -> List[tuple]:
+        with self.get_db(account_id) as conn:
+            rows = conn.execute(
+                rollup_summary_query(group_by, "?"),
+                (account_id, start_date.isoformat(), end_date.isoformat()),
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+    async def get_trade_summary(self, account_id: int, start_date: date, end_date: date, group_by: str) -> List[tuple]:
+        return await run_in_threadpool(self._get_trade_summary, account_id, start_date, end_date, group_by)
+
+    def _archive_shard(self, index: int, before: date) -> Dict[str, int]:
+        """샤드 하나의 오래된 거래를 한 달씩 아카이브에 쓰고, 쓴 뒤에 원본에서 지웁니다."""
+        archive = self.archive(index)
+        moved = {}
+        conn = sqlite3.connect(self.shard_file(index), timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            while True:
+                oldest = conn.execute(
+                    "SELECT MIN(trade_datetime) FROM trade_history WHERE trade_datetime < ?", (before.isoformat(),)
+                ).fetchone()[0]
+                if oldest is None:
+                    break
+                month_start, month_end = month_range(oldest, before)
+                rows = conn.execute(
+                    f"SELECT {', '.join(ARCHIVE_COLUMNS)} FROM trade_history WHERE trade_datetime >= ? AND trade_datetime < ?",
+                    (month_start, month_end),
+                ).fetchall()
+                archive.write(dict(row) for row in rows)
+                max_id = max(row["id"] for row in rows)
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute(
+                    "DELETE FROM trade_history WHERE trade_datetime >= ? AND trade_datetime < ? AND id <= ?",
+                    (month_start, month_end, max_id),
+                )
+                conn.commit()
+                moved[oldest[:7]] = moved.get(oldest[:7], 0) + len(rows)
+        finally:
+            conn.close()
+        return moved
+
+    async def archive_trades(self, before: date) -> Dict[str, int]:
+        moved: Dict[str, int] = defaultdict(int)
+        for index in range(self.shard_count):
+            for month, count in (await run_in_threadpool(self._archive_shard, index, before)).items():
+                moved[month] += count
+        return dict(moved)
+
+
+# ---------------------------------------------------------------------------
+# MySQL
+# ---------------------------------------------------------------------------
+
+class MySQLTradeStore(TradeStore):
+    """aiomysql 커넥션 풀을 사용하는 MySQL 저장소.
+
+    같은 계좌의 주문은 accounts 행의 `SELECT ... FOR UPDATE` 잠금으로 직렬화되고,
+    다른 계좌의 주문은 풀의 서로 다른 연결에서 동시에 실행됩니다.
+    """
+
+    def __init__(self, config: Dict[str, Any], pool_size: int = 10, archive_dir: Optional[Path] = None):
+        self.config = config
+        self.archive = TradeArchive(Path(archive_dir) if archive_dir else Path(__file__).parent / "trade_archive")
+        self.pool_size = max(1, pool_size)
+        self._pool = None
+        self._pool_lock = asyncio.Lock()
+
+    async def _get_pool(self):
+        if self._pool is None:
+            async with self._pool_lock:
+                if self._pool is None:
+                    import aiomysql  # MySQL 백엔드를 쓸 때만 필요
+
+                    self._pool = await aiomysql.create_pool(
+                        minsize=1,
+                        maxsize=self.pool_size,
+                        autocommit=False,
+                        **self.config,
+                    )
+        return self._pool
+
+    @asynccontextmanager
+    async def _transaction(self):
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            await conn.begin()
+            try:
+                async with conn.cursor() as cursor:
+                    yield cursor
+            except BaseException:
+                await conn.rollback()
+                raise
+            await conn.commit()
+
+    @asynccontextmanager
+    async def _cursor(self):
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                yield cursor
+            # 읽기 전용이어도 REPEATABLE READ 스냅샷을 풀에 남기지 않도록 트랜잭션을 끝냅니다.
+            await conn.commit()
+
+    async def get_account(self, account_id: int) -> Optional[AccountRow]:
+        async with self._cursor() as cursor:
+            await cursor.execute("SELECT password FROM accounts WHERE account_id = %s", (account_id,))
+            row = await cursor.fetchone()
+        return tuple(row) if row else None
+
+    async def create_account(self, account_name: str, password: str, cash_balance: int) -> int:
+        password_hash = await run_in_threadpool(hash_password, password)
+        async with self._transaction() as cursor:
+            await cursor.execute(
+                "INSERT INTO accounts (account_name, cash_balance, password) VALUES (%s, %s, %s)",
+                (account_name, cash_balance, password_hash),
+            )
+            return cursor.lastrowid
+
+    async def buy(self, account_id: int, ticker: str, name: str, qty: int, price: int) -> dict:
+        cost = qty * price
+        async with self._transaction() as cursor:
+            # 계좌 행을 잠가 같은 계좌의 주문을 직렬화
+            await cursor.execute("SELECT cash_balance FROM accounts WHERE account_id = %s FOR UPDATE", (account_id,))
+            cash_balance = (await cursor.fetchone())[0]
+
+            if cost > cash_balance:
+                raise insufficient_cash(cash_balance, cost)
+
+            new_balance = cash_balance - int(cost)
+            await cursor.execute("UPDATE accounts SET cash_balance = %s WHERE account_id = %s", (new_balance, account_id))
+
+            await cursor.execute("SELECT qty, avg_price FROM portfolio WHERE account_id = %s AND ticker = %s", (account_id, ticker))
+            existing = await cursor.fetchone()
+
+            if existing:
+                existing_qty, existing_avg = existing[0], existing[1]
+                total_qty = existing_qty + qty
+                avg_price = weighted_avg_price(existing_qty, existing_avg, qty, price)
+                await cursor.execute("""
+                    UPDATE portfolio SET qty = %s, avg_price = %s, name = %s
+                    WHERE account_id = %s AND ticker = %s
+                """, (total_qty, int(round(avg_price)), name, account_id, ticker))
+            else:
+                avg_price = price
+                await cursor.execute("""
+                    INSERT INTO portfolio (account_id, ticker, name, qty, avg_price)
+                    VALUES (%s, %s, %s, %s, %s)
+                """, (account_id, ticker, name, qty, int(round(price))))
+
+            await cursor.execute("""
+                INSERT INTO trade_history (account_id, trade_type, ticker, name, qty, price, avg_price)
+                VALUES (%s, 'buy', %s, %s, %s, %s, %s)
+            """, (account_id, ticker, name, qty, int(round(price)), int(round(avg_price))))
+            await cursor.execute(_ROLLUP_UPSERT_MYSQL, rollup_params(account_id, "buy", ticker, name, qty, price))
+
+        return trade_result("buy", name, qty, price, new_balance)
+
+    async def sell(self, account_id: int, ticker: str, name: str, qty: int, price: int) -> dict:
+        revenue = qty * price
+        async with self._transaction() as cursor:
+            await cursor.execute("SELECT cash_balance FROM accounts WHERE account_id = %s FOR UPDATE", (account_id,))
+            cash_balance = (await cursor.fetchone())[0]
+
+            await cursor.execute("SELECT qty, avg_price FROM portfolio WHERE account_id = %s AND ticker = %s", (account_id, ticker))
+            existing = await cursor.fetchone()
+
+            if not existing or existing[0] < qty:
+                raise insufficient_qty(existing[0] if existing else 0, qty)
+
+            current_qty, current_avg_price = existing[0], existing[1]
+            new_qty = current_qty - qty
+            new_balance = cash_balance + int(revenue)
+
+            await cursor.execute("UPDATE accounts SET cash_balance = %s WHERE account_id = %s", (new_balance, account_id))
+
+            if new_qty == 0:
+                await cursor.execute("DELETE FROM portfolio WHERE account_id = %s AND ticker = %s", (account_id, ticker))
+            else:
+                await cursor.execute(
+                    "UPDATE portfolio SET qty = %s WHERE account_id = %s AND ticker = %s",
+                    (new_qty, account_id, ticker),
+                )
+
+            await cursor.execute("""
+                INSERT INTO trade_history (account_id, trade_type, ticker, name, qty, price, avg_price)
+                VALUES (%s, 'sell', %s, %s, %s, %s, %s)
+            """, (account_id, ticker, name, qty, int(round(price)), int(round(current_avg_price))))
+            await cursor.execute(_ROLLUP_UPSERT_MYSQL, rollup_params(account_id, "sell", ticker, name, qty, price))
+
+        return trade_result("sell", name, qty, price, new_balance)
+
+    async def get_balance(self, account_id: int) -> Tuple[int, List[PortfolioRow]]:
+        async with self._cursor() as cursor:
+            await cursor.execute("SELECT cash_balance FROM accounts WHERE account_id = %s", (account_id,))
+            cash_balance = (await cursor.fetchone())[0]
+            await cursor.execute("SELECT ticker, name, qty, avg_price FROM portfolio WHERE account_id = %s", (account_id,))
+            rows = [tuple(row) for row in await cursor.fetchall()]
+        return int(cash_balance), rows
+
+    async def get_trades(self, account_id: int, start_date: Optional[date], end_date: Optional[date]) -> List[TradeRow]:
+        query = "SELECT id, trade_type, ticker, name, qty, price, avg_price, trade_datetime FROM trade_history WHERE account_id = %s"
+        params: List[Any] = [account_id]
+
+        # DATE(컬럼) 대신 범위 조건을 써서 trade_datetime 인덱스를 탈 수 있게 합니다.
+        if start_date:
+            query += " AND trade_datetime >= %s"
+            params.append(start_date.isoformat())
+
+        if end_date:
+            query += " AND trade_datetime < %s + INTERVAL 1 DAY"
+            params.append(end_date.isoformat())
+
+        query += " ORDER BY trade_datetime DESC"
+
+        async with self._cursor() as cursor:
+            await cursor.execute(query, params)
+            rows = await cursor.fetchall()
+
+        result = [
+            (*row[1:7], row[7].strftime("%Y-%m-%d %H:%M:%S") if isinstance(row[7], datetime) else str(row[7]))
+            for row in rows
+        ]
+        archived_until = self.archive.archived_until()
+        if archived_until is None or (start_date and start_date.isoformat() > archived_until[:10]):
+            return result
+        archived = await run_in_threadpool(self.archive.read, account_id, start_date, end_date)
+        return merge_trades(result, {row[0] for row in rows}, archived)
+
+    async def get_trade_summary(self, account_id: int, start_date: date, end_date: date, group_by: str) -> List[tuple]:
+        async with self._cursor() as cursor:
+            await cursor.execute(
+                rollup_summary_query(group_by, "%s"),
+                (account_id, start_date.isoformat(), end_date.isoformat()),
+            )
+            rows = await cursor.fetchall()
+        # MySQL은 DATE를 date로, SUM을 Decimal로 돌려주므로 SQLite와 같은 형태로 맞춥니다.
+        return [
+            (row[0].isoformat() if row[0] is not None else None, row[1], row[2], *(int(v) for v in row[3:]))
+            for row in rows
+        ]
+
+    async def archive_trades(self, before: date) -> Dict[str, int]:
+        moved = {}
+        columns = ", ".join(ARCHIVE_COLUMNS)
+        while True:
+            async with self._cursor() as cursor:
+                await cursor.execute("SELECT MIN(trade_datetime) FROM trade_history WHERE trade_datetime < %s", (before.isoformat(),))
+                oldest = (await cursor.fetchone())[0]
+                if oldest is None:
+                    break
+                month_start, month_end = month_range(oldest.strftime("%Y-%m-%d"), before)
+                await cursor.execute(
+                    f"SELECT {columns} FROM trade_history WHERE trade_datetime >= %s AND trade_datetime < %s",
+                    (month_start, month_end),
+                )
+                rows = [dict(zip(ARCHIVE_COLUMNS, row)) for row in await cursor.fetchall()]
+            for row in rows:
+                row["trade_datetime"] = row["trade_datetime"].strftime("%Y-%m-%d %H:%M:%S")
+            await run_in_threadpool(self.archive.write, rows)
+
+            max_id = max(row["id"] for row in rows)
+            async with self._transaction() as cursor:
+                await cursor.execute(
+                    "DELETE FROM trade_history WHERE trade_datetime >= %s AND trade_datetime < %s AND id <= %s",
+                    (month_start, month_end, max_id),
+                )
+            moved[month_start[:7]] = moved.get(month_start[:7], 0) + len(rows)
+        return moved
+
+    async def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            await self._pool.wait_closed()
+            self._pool = None
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# 저장소 루트의 모듈(storage, stock_api 등)을 테스트에서 import할 수 있게 합니다.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
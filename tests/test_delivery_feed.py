@@ -0,0 +1,58 @@
+"""
+배송 상태 캐시(DeliveryFeed) 크기 제한 테스트
+백엔드 스트림에는 연결하지 않고, 스트림 이벤트를 직접 넣어 확인합니다.
+"""
+import asyncio
+
+from mcp_server import DeliveryFeed
+
+
+class Session:
+    def __init__(self):
+        self.updated = []
+
+    async def send_resource_updated(self, uri):
+        self.updated.append(str(uri))
+
+
+def status_event(order_id: str, status: str = "배송중") -> dict:
+    return {"order_id": order_id, "status": status}
+
+
+def test_cache_evicts_least_recently_used():
+    feed = DeliveryFeed("http://backend", cache_size=3)
+
+    async def run():
+        for order_id in "abc":
+            feed._remember(order_id, status_event(order_id))
+        feed._orders.move_to_end("a")  # a를 최근에 조회함
+        await feed._handle("status", status_event("b", "배송완료"))
+        feed._remember("d", status_event("d"))
+
+    asyncio.run(run())
+    assert list(feed._orders) == ["a", "b", "d"]
+    assert feed._orders["b"]["status"] == "배송완료"
+    assert feed.stats["evictions"] == 1
+
+
+def test_cache_keeps_subscribed_and_pending_orders():
+    feed = DeliveryFeed("http://backend", cache_size=2)
+    session = Session()
+    feed._subscribers["a"].add(session)
+    feed._pending["b"] = 1
+
+    async def run():
+        await feed._handle("status", status_event("a"))
+        await feed._handle("status", status_event("b"))
+        for order_id in "cde":
+            feed._remember(order_id, status_event(order_id))
+
+    asyncio.run(run())
+    assert set(feed._orders) == {"a", "b"}
+    assert session.updated == ["delivery://a"]
+
+    # 구독을 끊은 주문은 다시 LRU 대상이 됩니다.
+    feed.unsubscribe("a", session)
+    del feed._pending["b"]
+    feed._remember("f", status_event("f"))
+    assert len(feed._orders) == 2 and "f" in feed._orders
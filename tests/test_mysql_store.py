@@ -0,0 +1,297 @@
+"""
+MySQLTradeStore 스모크 테스트
+
+MYSQL_TEST_HOST(및 MYSQL_TEST_USER, MYSQL_TEST_PASSWORD, MYSQL_TEST_PORT, MYSQL_TEST_DB)를 지정하면
+실제 MySQL/MariaDB에서 실행합니다. 테스트 DB의 테이블은 init_db.sql로 만들고 매 테스트마다 비웁니다.
+
+지정하지 않으면 aiomysql.create_pool을 SQLite 기반 가짜 풀로 바꿔 실행합니다. 가짜 풀은 저장소가 쓰는
+MySQL 문법(%s, FOR UPDATE, INTERVAL, ON DUPLICATE KEY UPDATE)을 SQLite로 옮기고, 결과 타입을
+MySQL 드라이버와 같게(DATETIME → datetime, DATE → date, SUM → Decimal) 돌려줍니다.
+"""
+import asyncio
+import os
+import re
+import sqlite3
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+
+import storage
+from storage import MySQLTradeStore, check_password
+
+REAL_MYSQL = bool(os.getenv("MYSQL_TEST_HOST"))
+
+_SQLITE_SCHEMA = """
+CREATE TABLE accounts (
+    account_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    account_name TEXT DEFAULT 'main',
+    cash_balance INTEGER NOT NULL DEFAULT 10000000,
+    password TEXT
+);
+CREATE TABLE portfolio (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    account_id INTEGER NOT NULL DEFAULT 1,
+    ticker TEXT NOT NULL,
+    name TEXT,
+    qty INTEGER NOT NULL,
+    avg_price INTEGER NOT NULL,
+    UNIQUE (account_id, ticker)
+);
+CREATE TABLE trade_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    account_id INTEGER NOT NULL DEFAULT 1,
+    trade_type TEXT NOT NULL CHECK (trade_type IN ('buy', 'sell')),
+    ticker TEXT NOT NULL,
+    name TEXT,
+    qty INTEGER NOT NULL,
+    price INTEGER NOT NULL,
+    avg_price INTEGER,
+    trade_datetime TEXT DEFAULT (datetime('now', 'localtime'))
+);
+CREATE TABLE trade_daily_rollup (
+    account_id INTEGER NOT NULL,
+    trade_date TEXT NOT NULL,
+    ticker TEXT NOT NULL,
+    name TEXT,
+    buy_count INTEGER NOT NULL DEFAULT 0,
+    buy_qty INTEGER NOT NULL DEFAULT 0,
+    buy_notional INTEGER NOT NULL DEFAULT 0,
+    sell_count INTEGER NOT NULL DEFAULT 0,
+    sell_qty INTEGER NOT NULL DEFAULT 0,
+    sell_notional INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (account_id, trade_date, ticker)
+);
+"""
+
+# ON DUPLICATE KEY UPDATE를 ON CONFLICT로 옮길 때 쓰는 테이블별 고유 키
+_UNIQUE_KEYS = {"trade_daily_rollup": "account_id, trade_date, ticker"}
+_DATETIME = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}$")
+_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def to_sqlite(query: str) -> str:
+    query = query.replace(" FOR UPDATE", "")
+    query = query.replace("%s + INTERVAL 1 DAY", "date(%s, '+1 day')")
+    query = query.replace("CURRENT_DATE", "date('now', 'localtime')")
+    match = re.search(r"INSERT INTO (\w+)", query)
+    if "ON DUPLICATE KEY UPDATE" in query:
+        query = query.replace("ON DUPLICATE KEY UPDATE", f"ON CONFLICT ({_UNIQUE_KEYS[match.group(1)]}) DO UPDATE SET")
+        query = re.sub(r"VALUES\((\w+)\)", r"excluded.\1", query)
+    return query.replace("%s", "?")
+
+
+def to_mysql_value(value, is_sum: bool):
+    if isinstance(value, str):
+        if _DATETIME.match(value):
+            return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+        if _DATE.match(value):
+            return date.fromisoformat(value)
+    if is_sum and isinstance(value, int):
+        return Decimal(value)
+    return value
+
+
+class FakeCursor:
+    def __init__(self, conn: sqlite3.Connection):
+        self._conn = conn
+        self._cursor = conn.cursor()
+        self._sums: set = set()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self._cursor.close()
+
+    async def execute(self, query: str, params=()):
+        self._cursor.execute(to_sqlite(query), tuple(params))
+        # SELECT 목록에서 SUM(...) 컬럼 위치 (MySQL은 Decimal로 돌려줌)
+        select = re.search(r"SELECT(.*?)FROM", query, re.S)
+        columns = select.group(1).split(",") if select else []
+        self._sums = {i for i, c in enumerate(columns) if "SUM(" in c}
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    def _convert(self, row):
+        return tuple(to_mysql_value(v, i in self._sums) for i, v in enumerate(row))
+
+    async def fetchone(self):
+        row = self._cursor.fetchone()
+        return self._convert(row) if row is not None else None
+
+    async def fetchall(self):
+        return [self._convert(row) for row in self._cursor.fetchall()]
+
+
+class FakeConnection:
+    def __init__(self, db_file: Path):
+        self._conn = sqlite3.connect(db_file, isolation_level=None, timeout=30)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._conn.in_transaction:
+            self._conn.rollback()
+
+    async def begin(self):
+        # FOR UPDATE 대신 쓰기 잠금을 먼저 잡아 같은 계좌 주문을 직렬화합니다.
+        self._conn.execute("BEGIN IMMEDIATE")
+
+    async def commit(self):
+        if self._conn.in_transaction:
+            self._conn.commit()
+
+    async def rollback(self):
+        self._conn.rollback()
+
+    def cursor(self):
+        return FakeCursor(self._conn)
+
+
+class FakePool:
+    def __init__(self, db_file: Path):
+        self._db_file = db_file
+
+    def acquire(self):
+        return FakeConnection(self._db_file)
+
+    def close(self):
+        pass
+
+    async def wait_closed(self):
+        pass
+
+
+def _mysql_config():
+    return {
+        "host": os.environ["MYSQL_TEST_HOST"],
+        "user": os.getenv("MYSQL_TEST_USER", "root"),
+        "password": os.getenv("MYSQL_TEST_PASSWORD", ""),
+        "port": int(os.getenv("MYSQL_TEST_PORT", "3306")),
+        "db": os.getenv("MYSQL_TEST_DB", "stock_trading_test"),
+    }
+
+
+async def _reset_mysql(config):
+    import aiomysql
+
+    schema = (Path(storage.__file__).parent / "init_db.sql").read_text(encoding="utf-8")
+    schema = "\n".join(line for line in schema.splitlines() if not line.lstrip().startswith("--"))
+    statements = [s.strip() for s in schema.split(";") if s.strip().upper().startswith("CREATE TABLE")]
+    conn = await aiomysql.connect(autocommit=True, **config)
+    try:
+        async with conn.cursor() as cursor:
+            for statement in statements:
+                await cursor.execute(statement)
+            await cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+            for table in ("trade_daily_rollup", "trade_history", "portfolio", "accounts"):
+                await cursor.execute(f"TRUNCATE TABLE {table}")
+            await cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    if REAL_MYSQL:
+        config = _mysql_config()
+        asyncio.run(_reset_mysql(config))
+    else:
+        import aiomysql
+
+        db_file = tmp_path / "mysql.db"
+        conn = sqlite3.connect(db_file)
+        conn.executescript(_SQLITE_SCHEMA)
+        conn.close()
+
+        async def create_pool(**kwargs):
+            return FakePool(db_file)
+
+        monkeypatch.setattr(aiomysql, "create_pool", create_pool)
+        config = {}
+    store = MySQLTradeStore(config, archive_dir=tmp_path / "archive")
+    yield store
+    asyncio.run(store.close())
+
+
+async def _insert_trade(store, account_id, trade_type, ticker, qty, price, when):
+    async with store._transaction() as cursor:
+        await cursor.execute(
+            "INSERT INTO trade_history (account_id, trade_type, ticker, name, qty, price, avg_price, trade_datetime)"
+            " VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+            (account_id, trade_type, ticker, "삼성전자", qty, price, price, when),
+        )
+
+
+def test_account_and_trades(store):
+    async def run():
+        account_id = await store.create_account("test", "pw", 100_000)
+        assert await store.get_account(account_id + 1000) is None
+        (stored,) = await store.get_account(account_id)
+        assert stored != "pw" and check_password("pw", stored) and not check_password("pw2", stored)
+
+        await store.buy(account_id, "005930", "삼성전자", 10, 1_000)
+        await store.buy(account_id, "005930", "삼성전자", 10, 2_000)
+        result = await store.sell(account_id, "005930", "삼성전자", 5, 3_000)
+        assert result["available_cash"] == 100_000 - 10_000 - 20_000 + 15_000
+
+        cash, portfolio = await store.get_balance(account_id)
+        assert cash == 85_000
+        assert portfolio == [("005930", "삼성전자", 15, 1_500)]
+
+        # 잔고·수량 부족은 400이고 잔고를 바꾸지 않습니다.
+        with pytest.raises(HTTPException) as e:
+            await store.buy(account_id, "005930", "삼성전자", 1_000, 1_000)
+        assert e.value.status_code == 400
+        with pytest.raises(HTTPException) as e:
+            await store.sell(account_id, "005930", "삼성전자", 16, 1_000)
+        assert e.value.status_code == 400
+        assert (await store.get_balance(account_id))[0] == 85_000
+
+        today = date.today()
+        trades = await store.get_trades(account_id, None, None)
+        # 같은 초에 들어온 거래끼리는 순서가 정해져 있지 않습니다.
+        assert sorted((t[0], t[3], t[4]) for t in trades) == [("buy", 10, 1_000), ("buy", 10, 2_000), ("sell", 5, 3_000)]
+        assert all(isinstance(t[6], str) and t[6][:10] == today.isoformat() for t in trades)
+        assert len(await store.get_trades(account_id, today, today)) == 3
+        assert await store.get_trades(account_id, today + timedelta(days=1), None) == []
+
+        summary = await store.get_trade_summary(account_id, today - timedelta(days=1), today, "ticker")
+        assert summary == [(None, "005930", "삼성전자", 2, 20, 30_000, 1, 5, 15_000)]
+        by_date = await store.get_trade_summary(account_id, today - timedelta(days=1), today, "date")
+        assert by_date == [(today.isoformat(), None, None, 2, 20, 30_000, 1, 5, 15_000)]
+
+    asyncio.run(run())
+
+
+def test_archive_trades(store):
+    async def run():
+        account_id = await store.create_account("test", "pw", 100_000)
+        await _insert_trade(store, account_id, "buy", "005930", 1, 1_000, "2024-01-15 10:00:00")
+        await _insert_trade(store, account_id, "sell", "005930", 1, 1_100, "2024-02-20 11:00:00")
+        await _insert_trade(store, account_id, "buy", "000660", 2, 5_000, "2024-03-05 09:30:00")
+        await store.buy(account_id, "005930", "삼성전자", 1, 1_000)
+
+        moved = await store.archive_trades(date(2024, 3, 1))
+        assert moved == {"2024-01": 1, "2024-02": 1}
+        assert store.archive.verify() == []
+        assert await store.archive_trades(date(2024, 3, 1)) == {}
+
+        # 원본 테이블에는 보존 기간 안의 거래만 남습니다.
+        async with store._cursor() as cursor:
+            await cursor.execute("SELECT COUNT(*) FROM trade_history WHERE account_id = %s", (account_id,))
+            assert (await cursor.fetchone())[0] == 2
+
+        # 아카이브 구간을 포함하면 원본과 아카이브를 최신순으로 합쳐 돌려줍니다.
+        trades = await store.get_trades(account_id, date(2024, 1, 1), None)
+        assert [t[6][:10] for t in trades][-3:] == ["2024-03-05", "2024-02-20", "2024-01-15"]
+        assert len(trades) == 4
+        assert [t[6] for t in await store.get_trades(account_id, date(2024, 2, 1), date(2024, 2, 29))] == ["2024-02-20 11:00:00"]
+
+    asyncio.run(run())
@@ -0,0 +1,63 @@
+"""
+주문 그룹 커밋 큐(OrderIngestQueue) 종료 테스트
+"""
+import asyncio
+import sqlite3
+
+from order_queue import OrderIngestQueue
+
+
+def make_queue(db_file, connections):
+    def connect():
+        conn = sqlite3.connect(db_file, timeout=30, check_same_thread=False)
+        connections.append(conn)
+        return conn
+
+    return OrderIngestQueue(connect, max_batch_size=8, max_wait=0.01)
+
+
+def insert(value):
+    def job(conn):
+        conn.execute("INSERT INTO t (v) VALUES (?)", (value,))
+        return value
+    return job
+
+
+def count(db_file) -> int:
+    with sqlite3.connect(db_file) as conn:
+        return conn.execute("SELECT COUNT(*) FROM t").fetchone()[0]
+
+
+def test_close_drains_queue_and_closes_connection(tmp_path):
+    db_file = tmp_path / "q.db"
+    with sqlite3.connect(db_file) as conn:
+        conn.execute("CREATE TABLE t (v INTEGER)")
+    connections = []
+    queue = make_queue(db_file, connections)
+
+    async def run():
+        pending = [asyncio.ensure_future(queue.submit(insert(i))) for i in range(30)]
+        await asyncio.sleep(0)
+        await queue.close()
+        assert sorted(await asyncio.gather(*pending)) == list(range(30))
+        assert queue._task is None and queue._conn is None
+
+        # 닫은 뒤 들어온 주문은 새 writer와 연결로 처리합니다.
+        assert await queue.submit(insert(99)) == 99
+        await queue.close()
+
+    asyncio.run(run())
+    assert count(db_file) == 31
+    assert len(connections) == 2
+    for conn in connections:
+        try:
+            conn.execute("SELECT 1")
+        except sqlite3.ProgrammingError:
+            continue
+        raise AssertionError("연결이 닫히지 않았습니다.")
+
+
+def test_close_without_orders(tmp_path):
+    queue = make_queue(tmp_path / "q.db", [])
+    asyncio.run(queue.close())
+    assert queue._task is None and queue._conn is None
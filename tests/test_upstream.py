@@ -0,0 +1,295 @@
+"""
+업스트림 보호 장치(UpstreamGuard) 테스트
+
+서킷 브레이커 상태 전이, 대기열 부하 차단, 그리고 업스트림 장애(연결 실패·타임아웃·5xx)와
+데이터 오류(없는 종목·빈 응답)의 구분을 확인합니다. 실제 시세 서버는 호출하지 않습니다.
+"""
+import asyncio
+import threading
+import time
+
+import pandas as pd
+import pytest
+import requests
+from fastapi import HTTPException
+
+import market_data
+import price_feed
+from upstream import CLOSED, HALF_OPEN, OPEN, UpstreamGuard, UpstreamUnavailable, is_outage
+
+
+def http_error(status: int) -> requests.HTTPError:
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f"{status} Error", response=response)
+
+
+def raiser(exc: BaseException):
+    def func(*args):
+        raise exc
+    return func
+
+
+def ok(*args):
+    return "ok"
+
+
+def make_guard(**kwargs) -> UpstreamGuard:
+    options = {"max_concurrency": 2, "max_queue": 2, "timeout": 1.0, "failure_threshold": 3, "reset_timeout": 0.1}
+    return UpstreamGuard("test", **{**options, **kwargs})
+
+
+@pytest.fixture
+def fdr(monkeypatch):
+    """fdr.DataReader를 바꿔 끼우고, 모듈 전역 보호 장치·캐시를 테스트마다 새로 만듭니다."""
+    import FinanceDataReader
+
+    guard = make_guard()
+    monkeypatch.setattr(price_feed, "price_guard", guard)
+    monkeypatch.setattr(market_data, "price_guard", guard)
+    monkeypatch.setattr(price_feed, "_last_quotes", {})
+    market_data.clear_history_cache()
+
+    class Reader:
+        guard = None
+        result = None
+
+        def __call__(self, ticker, start=None):
+            if isinstance(self.result, BaseException):
+                raise self.result
+            return self.result
+
+    reader = Reader()
+    reader.guard = guard
+    monkeypatch.setattr(FinanceDataReader, "DataReader", reader)
+    yield reader
+    market_data.clear_history_cache()
+
+
+# ---------------------------------------------------------------------------
+# 장애 / 데이터 오류 구분
+# ---------------------------------------------------------------------------
+
+@pytest.mark.parametrize("exc, expected", [
+    (requests.ConnectionError("connection refused"), True),
+    (requests.Timeout("read timed out"), True),
+    (TimeoutError(), True),
+    (http_error(500), True),
+    (http_error(503), True),
+    (http_error(429), True),
+    (http_error(404), False),
+    (http_error(400), False),
+    (requests.exceptions.JSONDecodeError("Expecting value", "", 0), False),
+    (ValueError("No data"), False),
+    (KeyError("chart"), False),
+    (IndexError("list index out of range"), False),
+])
+def test_is_outage(exc, expected):
+    assert is_outage(exc) is expected
+
+
+def test_data_errors_do_not_open_breaker():
+    guard = make_guard(failure_threshold=2)
+
+    async def run():
+        for _ in range(5):
+            with pytest.raises(requests.HTTPError):
+                await guard.call(raiser(http_error(404)))
+            with pytest.raises(KeyError):
+                await guard.call(raiser(KeyError("chart")))
+        assert guard.state == CLOSED
+        assert guard.stats["failed"] == 0
+        assert guard.stats["data_errors"] == 10
+        assert await guard.call(ok) == "ok"
+
+    asyncio.run(run())
+
+
+def test_http_exception_passes_through():
+    guard = make_guard(failure_threshold=1)
+
+    async def run():
+        with pytest.raises(HTTPException) as e:
+            await guard.call(raiser(HTTPException(status_code=404, detail="없음")))
+        assert e.value.status_code == 404
+        assert guard.state == CLOSED
+
+    asyncio.run(run())
+
+
+# ---------------------------------------------------------------------------
+# 서킷 브레이커
+# ---------------------------------------------------------------------------
+
+def test_breaker_opens_after_consecutive_outages():
+    guard = make_guard(failure_threshold=3, reset_timeout=30)
+
+    async def run():
+        for _ in range(2):
+            with pytest.raises(UpstreamUnavailable):
+                await guard.call(raiser(requests.ConnectionError("refused")))
+        assert guard.state == CLOSED
+        with pytest.raises(UpstreamUnavailable) as e:
+            await guard.call(raiser(http_error(502)))
+        assert guard.state == OPEN
+        assert e.value.status_code == 503
+        assert e.value.headers["Retry-After"] == "30"
+        assert isinstance(e.value.__cause__, requests.HTTPError)
+
+        # 열린 동안에는 업스트림을 호출하지 않고 바로 503
+        called = []
+        with pytest.raises(UpstreamUnavailable):
+            await guard.call(lambda: called.append(1))
+        assert called == []
+        assert guard.stats["rejected_open"] == 1
+
+    asyncio.run(run())
+
+
+def test_success_resets_failure_count():
+    guard = make_guard(failure_threshold=2)
+
+    async def run():
+        with pytest.raises(UpstreamUnavailable):
+            await guard.call(raiser(requests.ConnectionError()))
+        await guard.call(ok)
+        with pytest.raises(UpstreamUnavailable):
+            await guard.call(raiser(requests.ConnectionError()))
+        assert guard.state == CLOSED
+
+    asyncio.run(run())
+
+
+def test_half_open_probe_closes_or_reopens():
+    guard = make_guard(failure_threshold=1, reset_timeout=0.05)
+
+    async def run():
+        with pytest.raises(UpstreamUnavailable):
+            await guard.call(raiser(requests.ConnectionError()))
+        assert guard.state == OPEN
+
+        # 시험 호출 실패 → 다시 열림
+        await asyncio.sleep(0.06)
+        with pytest.raises(UpstreamUnavailable):
+            await guard.call(raiser(http_error(503)))
+        assert guard.state == OPEN
+
+        # 시험 호출 중에는 다른 요청을 막고, 성공하면 닫힘
+        await asyncio.sleep(0.06)
+        release = threading.Event()
+        probe = asyncio.ensure_future(guard.call(release.wait))
+        await asyncio.sleep(0.01)
+        assert guard.state == HALF_OPEN
+        with pytest.raises(UpstreamUnavailable):
+            await guard.call(ok)
+        release.set()
+        assert await probe is True
+        assert guard.state == CLOSED
+
+    asyncio.run(run())
+
+
+def test_timeout_counts_as_failure():
+    guard = make_guard(timeout=0.05, failure_threshold=1)
+
+    async def run():
+        with pytest.raises(UpstreamUnavailable):
+            await guard.call(time.sleep, 0.2)
+        assert guard.stats["timed_out"] == 1
+        assert guard.state == OPEN
+
+    asyncio.run(run())
+
+
+# ---------------------------------------------------------------------------
+# 부하 차단
+# ---------------------------------------------------------------------------
+
+def test_queue_full_sheds_immediately():
+    guard = make_guard(max_concurrency=1, max_queue=1)
+
+    async def run():
+        release = threading.Event()
+        running = asyncio.ensure_future(guard.call(release.wait))
+        await asyncio.sleep(0.01)
+        queued = asyncio.ensure_future(guard.call(ok))
+        await asyncio.sleep(0.01)
+        assert guard.in_flight == 1 and guard.waiting == 1
+
+        with pytest.raises(UpstreamUnavailable) as e:
+            await guard.call(ok)
+        assert e.value.headers["Retry-After"] == "1"
+        assert guard.stats["shed"] == 1
+
+        release.set()
+        assert await running is True
+        assert await queued == "ok"
+        # 부하 차단은 업스트림 실패가 아니므로 브레이커에 영향이 없습니다.
+        assert guard.state == CLOSED and guard.consecutive_failures == 0
+
+    asyncio.run(run())
+
+
+def test_slot_wait_timeout_sheds():
+    guard = make_guard(max_concurrency=1, max_queue=4, timeout=0.05)
+
+    async def run():
+        release = threading.Event()
+        running = asyncio.ensure_future(guard.call(release.wait))
+        await asyncio.sleep(0.01)
+        with pytest.raises(UpstreamUnavailable):
+            await guard.call(ok)
+        assert guard.stats["shed"] == 1
+        release.set()
+        with pytest.raises(UpstreamUnavailable):
+            await running  # 실행 중이던 호출은 타임아웃으로 끝남
+        while guard.in_flight:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+
+
+# ---------------------------------------------------------------------------
+# 시세 조회: 없는 종목은 데이터 없음, 장애는 503 또는 예전 시세
+# ---------------------------------------------------------------------------
+
+def test_unknown_ticker_is_not_found_not_outage(fdr):
+    fdr.result = http_error(404)
+
+    async def run():
+        for _ in range(10):
+            assert await price_feed.get_quote("999999") is None
+            assert (await market_data.load_history("999999", 30)).empty
+        assert fdr.guard.state == CLOSED
+        assert fdr.guard.stats["failed"] == 0
+
+    asyncio.run(run())
+
+
+def test_empty_or_broken_payload_is_not_found(fdr):
+    async def run():
+        fdr.result = pd.DataFrame()
+        assert await price_feed.get_quote("999999") is None
+        fdr.result = KeyError("chart")
+        assert await price_feed.get_quote("999999") is None
+        assert (await market_data.load_history("999999", 30)).empty
+        assert fdr.guard.state == CLOSED
+
+    asyncio.run(run())
+
+
+def test_outage_falls_back_to_stale_quote(fdr):
+    fdr.result = pd.DataFrame({"Close": [70000]}, index=pd.to_datetime(["2025-01-02"]))
+
+    async def run():
+        assert (await price_feed.get_quote("005930"))["close"] == 70000
+        fdr.result = requests.ConnectionError("refused")
+        quote = await price_feed.get_quote("005930")
+        assert quote["close"] == 70000 and quote["stale"] is True
+        with pytest.raises(UpstreamUnavailable):
+            await price_feed.get_quote("005930", allow_stale=False)
+        with pytest.raises(UpstreamUnavailable):
+            await market_data.load_history("005930", 30)
+        assert fdr.guard.stats["failed"] == 3
+
+    asyncio.run(run())
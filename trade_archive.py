@@ -0,0 +1,262 @@
+"""
+오래된 거래 내역 아카이브
+trade_history에서 보존 기간이 지난 거래를 월별 압축 파일(NDJSON)로 옮기고, 파일마다 매니페스트를 남깁니다.
+
+디렉터리 구조:
+    trades_2025-07.ndjson.zst   (zstandard가 없으면 .ndjson.gz)
+    trades_2025-07.json         매니페스트: 행 수, 계좌별 행 수, 기간, 체크섬
+
+조회 시에는 매니페스트만 보고 기간과 계좌가 겹치는 월 파일만 엽니다.
+"""
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+try:
+    import zstandard
+except ImportError:  # zstandard가 없으면 표준 라이브러리 gzip으로 압축합니다.
+    zstandard = None
+
+# 아카이브 파일의 한 행에 담는 trade_history 컬럼 (id는 중복 제거용)
+ARCHIVE_COLUMNS = ("id", "account_id", "trade_type", "ticker", "name", "qty", "price", "avg_price", "trade_datetime")
+
+CODEC_SUFFIX = {"zstd": ".ndjson.zst", "gzip": ".ndjson.gz"}
+
+logger = logging.getLogger(__name__)
+
+
+def _compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd로 압축된 아카이브를 읽으려면 zstandard 패키지가 필요합니다.")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return gzip.decompress(data)
+
+
+def _write_atomic(path: Path, data: bytes):
+    """임시 파일에 쓰고 fsync 후 이름을 바꿔, 읽는 쪽이 반쯤 쓰인 파일을 보지 않게 합니다."""
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _month_bounds(month: str):
+    year, mon = map(int, month.split("-"))
+    first = date(year, mon, 1)
+    last = date(year + mon // 12, mon % 12 + 1, 1)
+    return first, last  # [first, last)
+
+
+class TradeArchive:
+    """월별 거래 아카이브 디렉터리 하나를 관리합니다. (SQLite 샤드 또는 MySQL 저장소당 하나)"""
+
+    def __init__(self, directory: Path, codec: Optional[str] = None):
+        self.directory = Path(directory)
+        self.codec = codec or ("zstd" if zstandard is not None else "gzip")
+        self._manifests: Dict[str, dict] = {}
+        self._loaded_mtime: Optional[int] = None
+
+    # ------------------------------------------------------------------
+    # 매니페스트
+    # ------------------------------------------------------------------
+
+    def manifests(self) -> Dict[str, dict]:
+        """월 → 매니페스트. 다른 프로세스(보존 작업)가 파일을 바꾸면 다시 읽습니다."""
+        try:
+            mtime = self.directory.stat().st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        if mtime != self._loaded_mtime:
+            manifests = {}
+            for path in self.directory.glob("trades_*.json"):
+                with open(path, encoding="utf-8") as f:
+                    manifest = json.load(f)
+                manifests[manifest["month"]] = manifest
+            self._manifests = manifests
+            self._loaded_mtime = mtime
+        return self._manifests
+
+    def archived_until(self) -> Optional[str]:
+        """아카이브에 들어 있는 가장 늦은 거래 시각. 비어 있으면 None"""
+        manifests = self.manifests()
+        return max((m["max_datetime"] for m in manifests.values()), default=None)
+
+    def partitions_for(self, account_id: int, start_date: Optional[date], end_date: Optional[date]) -> List[dict]:
+        """기간과 계좌가 겹치는 월 파티션의 매니페스트 (최신 월 먼저)"""
+        selected = []
+        for month, manifest in self.manifests().items():
+            if str(account_id) not in manifest["accounts"]:
+                continue
+            first, last = _month_bounds(month)
+            if start_date and last <= start_date:
+                continue
+            if end_date and first > end_date:
+                continue
+            if start_date and manifest["max_datetime"][:10] < start_date.isoformat():
+                continue
+            if end_date and manifest["min_datetime"][:10] > end_date.isoformat():
+                continue
+            selected.append(manifest)
+        return sorted(selected, key=lambda m: m["month"], reverse=True)
+
+    # ------------------------------------------------------------------
+    # 읽기 / 쓰기
+    # ------------------------------------------------------------------
+
+    def _read_partition(self, manifest: dict) -> List[dict]:
+        with open(self.directory / manifest["file"], "rb") as f:
+            raw = _decompress(f.read(), manifest["codec"])
+        return [json.loads(line) for line in raw.splitlines() if line]
+
+    def read(self, account_id: int, start_date: Optional[date], end_date: Optional[date]) -> List[dict]:
+        """기간 내 계좌의 아카이브 거래 (최신순)"""
+        start = start_date.isoformat() if start_date else None
+        end = end_date.isoformat() if end_date else None
+        rows = []
+        for manifest in self.partitions_for(account_id, start_date, end_date):
+            for row in self._read_partition(manifest):
+                if row["account_id"] != account_id:
+                    continue
+                day = row["trade_datetime"][:10]
+                if (start and day < start) or (end and day > end):
+                    continue
+                rows.append(row)
+        rows.sort(key=lambda r: (r["trade_datetime"], r["id"]), reverse=True)
+        return rows
+
+    def write(self, rows: Iterable[dict]) -> Dict[str, int]:
+        """거래들을 월별 파티션에 추가하고, 월별로 새로 추가된 행 수를 반환합니다.
+
+        이미 같은 월 파일이 있으면 기존 행과 합쳐 다시 씁니다. 같은 id의 행은 한 번만 남기므로,
+        아카이브 후 원본 삭제 전에 중단되어 같은 거래를 다시 옮겨도 중복되지 않습니다.
+        데이터 파일을 먼저 교체한 뒤 매니페스트를 씁니다.
+        """
+        by_month: Dict[str, List[dict]] = defaultdict(list)
+        for row in rows:
+            by_month[row["trade_datetime"][:7]].append(row)
+        if not by_month:
+            return {}
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        existing = self.manifests()
+        added = {}
+        for month, new_rows in sorted(by_month.items()):
+            merged: Dict[int, dict] = {}
+            old_manifest = existing.get(month)
+            if old_manifest is not None:
+                for row in self._read_partition(old_manifest):
+                    merged[row["id"]] = row
+            before = len(merged)
+            for row in new_rows:
+                merged[row["id"]] = row
+            added[month] = len(merged) - before
+
+            ordered = sorted(merged.values(), key=lambda r: (r["account_id"], r["trade_datetime"], r["id"]))
+            payload = b"".join(
+                json.dumps(row, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+                for row in ordered
+            )
+            data = _compress(payload, self.codec)
+            file_name = f"trades_{month}{CODEC_SUFFIX[self.codec]}"
+            _write_atomic(self.directory / file_name, data)
+
+            accounts: Dict[str, int] = defaultdict(int)
+            for row in ordered:
+                accounts[str(row["account_id"])] += 1
+            manifest = {
+                "month": month,
+                "file": file_name,
+                "codec": self.codec,
+                "rows": len(ordered),
+                "accounts": dict(accounts),
+                "min_datetime": min(r["trade_datetime"] for r in ordered),
+                "max_datetime": max(r["trade_datetime"] for r in ordered),
+                "max_id": max(merged),
+                "bytes": len(data),
+                "sha256": hashlib.sha256(data).hexdigest(),
+                "updated_at": datetime.now().isoformat(timespec="seconds"),
+            }
+            _write_atomic(
+                self.directory / f"trades_{month}.json",
+                json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8"),
+            )
+            # 코덱이 바뀌었으면 예전 형식의 파일을 지웁니다.
+            if old_manifest is not None and old_manifest["file"] != file_name:
+                (self.directory / old_manifest["file"]).unlink(missing_ok=True)
+        self._loaded_mtime = None
+        return added
+
+    def verify(self) -> List[str]:
+        """체크섬이 맞지 않거나 없는 파티션 파일 목록"""
+        broken = []
+        for manifest in self.manifests().values():
+            path = self.directory / manifest["file"]
+            if not path.exists() or hashlib.sha256(path.read_bytes()).hexdigest() != manifest["sha256"]:
+                broken.append(manifest["file"])
+        return broken
+
+
+def to_trade_row(row: dict) -> tuple:
+    """아카이브 행을 저장소의 TradeRow 형태로 바꿉니다."""
+    return tuple(row[c] for c in ARCHIVE_COLUMNS[2:])
+
+
+def merge_trades(hot_rows: List[tuple], hot_ids: Set[int], archived: List[dict]) -> List[tuple]:
+    """원본 테이블 행과 아카이브 행을 최신순으로 합칩니다.
+
+    아카이브를 쓴 뒤 원본을 지우기 전에 조회하면 같은 거래가 양쪽에 있으므로 원본 쪽만 남깁니다.
+    아카이브 행은 모두 원본 행보다 오래됐으므로 이어 붙이기만 하면 순서가 유지됩니다.
+    """
+    return hot_rows + [to_trade_row(row) for row in archived if row["id"] not in hot_ids]
+
+
+async def run_retention(store, retention_days: int, interval: float):
+    """보존 기간이 지난 거래를 주기적으로 아카이브합니다. (stock_api lifespan에서 실행)"""
+    while True:
+        try:
+            moved = await store.archive_trades(date.today() - timedelta(days=retention_days))
+            if moved:
+                logger.info("거래 아카이브: %s", moved)
+        except Exception:
+            logger.exception("거래 아카이브 실패")
+        await asyncio.sleep(interval)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="오래된 거래 내역을 월별 압축 파일로 옮깁니다.")
+    parser.add_argument("--days", type=int, default=365, help="보존 기간(일). 이보다 오래된 거래를 옮김 (기본 365)")
+    args = parser.parse_args(argv)
+
+    from stock_api import store  # STORAGE_BACKEND 등 서버와 같은 환경변수 설정을 사용
+
+    async def run():
+        try:
+            return await store.archive_trades(date.today() - timedelta(days=args.days))
+        finally:
+            await store.close()
+
+    moved = asyncio.run(run())
+    for month, count in sorted(moved.items()):
+        print(f"{month}: {count}건")
+    print(f"✓ 총 {sum(moved.values())}건 아카이브 완료")
+
+
+if __name__ == "__main__":
+    main()
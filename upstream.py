@@ -0,0 +1,236 @@
+"""
+업스트림(FinanceDataReader) 호출 보호
+업스트림마다 동시 호출 수·대기열 길이를 제한하고, 호출에 타임아웃을 걸고, 연속 실패 시 서킷 브레이커를 엽니다.
+
+- 대기열이 가득 차거나 브레이커가 열려 있으면 기다리지 않고 503(Retry-After)을 반환합니다.
+- 연결 실패, 타임아웃, 5xx 응답만 업스트림 장애로 셉니다. 없는 종목(4xx)이나 빈·깨진 응답은 데이터 오류로,
+  브레이커에 영향을 주지 않고 호출자에게 그대로 전달합니다. (호출자는 "데이터 없음"으로 처리)
+- fdr 호출은 취소할 수 없으므로, 타임아웃이 나도 스레드가 끝날 때까지 동시 호출 슬롯을 잡아 둡니다.
+  멈춘 호출이 쌓여 서버 스레드 풀을 모두 차지하는 대신 해당 업스트림의 슬롯만 소진됩니다.
+"""
+import asyncio
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException
+
+# 업스트림별 동시 호출 수, 슬롯을 기다릴 수 있는 요청 수, 호출 타임아웃(초)
+UPSTREAM_MAX_CONCURRENCY = int(os.getenv("UPSTREAM_MAX_CONCURRENCY", "8"))
+UPSTREAM_MAX_QUEUE = int(os.getenv("UPSTREAM_MAX_QUEUE", "32"))
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "10"))
+
+# 연속 실패가 이 횟수에 이르면 브레이커를 열고, 열린 뒤 이 시간(초)이 지나면 시험 호출을 한 번 허용합니다.
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+def is_outage(exc: BaseException) -> bool:
+    """업스트림 장애(연결 실패, 타임아웃, 5xx·429 응답)인지 판별합니다.
+
+    없는 종목에 대한 4xx 응답, 빈 응답이나 파싱 오류는 업스트림이 정상 동작한 결과이므로 False입니다.
+    """
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None) or getattr(exc, "code", None)  # requests / urllib
+    if isinstance(status, int):
+        return status >= 500 or status == 429
+    if isinstance(exc, ValueError):
+        # JSON·CSV 파싱 실패 (requests의 JSONDecodeError는 OSError이기도 하므로 먼저 확인)
+        return False
+    # requests 예외(RequestException)와 urllib URLError, 소켓 오류는 모두 OSError입니다.
+    return isinstance(exc, OSError)
+
+
+class UpstreamUnavailable(HTTPException):
+    """업스트림을 지금 호출할 수 없음 (브레이커 열림, 대기열 가득 참, 타임아웃, 업스트림 장애)"""
+
+    def __init__(self, upstream: str, reason: str, retry_after: float):
+        self.upstream = upstream
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(
+            status_code=503,
+            detail=f"시세 데이터 서버({upstream})를 사용할 수 없습니다: {reason}. {self.retry_after}초 후 다시 시도하세요.",
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+
+class UpstreamGuard:
+    """업스트림 하나에 대한 동시 호출 제한, 대기열 제한, 타임아웃, 서킷 브레이커"""
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int = UPSTREAM_MAX_CONCURRENCY,
+        max_queue: int = UPSTREAM_MAX_QUEUE,
+        timeout: float = UPSTREAM_TIMEOUT,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = BREAKER_RESET_TIMEOUT,
+    ):
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.stats = {"calls": 0, "succeeded": 0, "failed": 0, "timed_out": 0, "data_errors": 0, "rejected_open": 0, "shed": 0}
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix=f"upstream-{name}")
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # ------------------------------------------------------------------
+    # 서킷 브레이커
+    # ------------------------------------------------------------------
+
+    def _admit(self):
+        """브레이커 상태를 보고 호출을 허용할지 정합니다. 허용하면 시험 호출 여부를 반환합니다."""
+        if self.state == OPEN:
+            remaining = self.opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                self.stats["rejected_open"] += 1
+                raise UpstreamUnavailable(self.name, "연속 실패로 호출 차단 중", remaining)
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            if self._probing:
+                self.stats["rejected_open"] += 1
+                raise UpstreamUnavailable(self.name, "복구 확인 중", 1)
+            self._probing = True
+            return True
+        return False
+
+    def _on_success(self, probe: bool):
+        self.stats["succeeded"] += 1
+        self.consecutive_failures = 0
+        if probe:
+            self._probing = False
+        self.state = CLOSED
+
+    def _on_failure(self, probe: bool):
+        self.stats["failed"] += 1
+        self.consecutive_failures += 1
+        if probe:
+            self._probing = False
+        if probe or self.consecutive_failures >= self.failure_threshold:
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def _release_probe(self, probe: bool):
+        # 슬롯을 얻지 못해 시험 호출을 하지 못한 경우, 다음 요청이 시험할 수 있게 합니다.
+        if probe:
+            self._probing = False
+
+    # ------------------------------------------------------------------
+    # 호출
+    # ------------------------------------------------------------------
+
+    def _ensure_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._loop is not loop:
+            self._loop = loop
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+            self.in_flight = 0
+        return self._slots
+
+    async def call(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """`func`를 업스트림 전용 스레드에서 실행합니다.
+
+        Raises:
+            UpstreamUnavailable: 브레이커가 열려 있거나, 대기열이 가득 찼거나, 타임아웃·업스트림 장애가 난 경우 (503)
+            Exception: `func`가 올린 HTTPException과 데이터 오류(`is_outage`가 False)는 그대로 전달
+        """
+        probe = self._admit()
+        slots = self._ensure_slots()
+
+        # 슬롯이 없으면 대기열 자리가 있을 때만 기다립니다. (부하 차단)
+        if slots.locked() and self.waiting >= self.max_queue:
+            self._release_probe(probe)
+            self.stats["shed"] += 1
+            raise UpstreamUnavailable(self.name, "요청이 너무 많음", 1)
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self._release_probe(probe)
+            self.stats["shed"] += 1
+            raise UpstreamUnavailable(self.name, "처리 대기 시간 초과", 1)
+        except BaseException:
+            self._release_probe(probe)
+            raise
+        finally:
+            self.waiting -= 1
+
+        self.stats["calls"] += 1
+        self.in_flight += 1
+        future = asyncio.get_running_loop().run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+        def release(_):
+            # 타임아웃 뒤에도 실제 스레드가 끝나야 슬롯을 돌려줍니다.
+            self.in_flight -= 1
+            slots.release()
+
+        future.add_done_callback(release)
+        try:
+            result = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.stats["timed_out"] += 1
+            self._on_failure(probe)
+            raise UpstreamUnavailable(self.name, f"{self.timeout:g}초 안에 응답 없음", self.reset_timeout if self.state == OPEN else 1)
+        except HTTPException:
+            # 404 등 업스트림이 정상 응답한 결과는 실패로 세지 않습니다.
+            self._on_success(probe)
+            raise
+        except asyncio.CancelledError:
+            # 요청이 취소된 것이므로 업스트림 실패로 세지 않습니다.
+            self._release_probe(probe)
+            raise
+        except Exception as e:
+            if not is_outage(e):
+                # 없는 종목 등 데이터 오류. 업스트림은 응답했으므로 실패로 세지 않습니다.
+                self.stats["data_errors"] += 1
+                self._on_success(probe)
+                raise
+            # 업스트림 장애는 503으로 알려 호출자가 예전 시세 등으로 대신할 수 있게 합니다.
+            self._on_failure(probe)
+            raise UpstreamUnavailable(self.name, f"호출 실패 ({type(e).__name__})", self.reset_timeout if self.state == OPEN else 1) from e
+        self._on_success(probe)
+        return result
+
+    def status(self) -> Dict[str, Any]:
+        """운영 확인용 상태"""
+        retry_after = None
+        if self.state == OPEN:
+            retry_after = max(0.0, round(self.opened_at + self.reset_timeout - time.monotonic(), 1))
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "retry_after": retry_after,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "timeout": self.timeout,
+            **self.stats,
+        }
+
+
+# 업스트림별 보호 장치: 일봉 시세(fdr.DataReader)와 종목 목록(fdr.StockListing)
+price_guard = UpstreamGuard("price")
+listing_guard = UpstreamGuard("listing")
+
+
+def upstream_status() -> Dict[str, Dict[str, Any]]:
+    return {guard.name: guard.status() for guard in (price_guard, listing_guard)}